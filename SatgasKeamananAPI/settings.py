@@ -8,6 +8,8 @@ from pathlib import Path
 import os
 from datetime import timedelta
 
+from .database import database_config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -47,6 +49,7 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
 
     'django.middleware.security.SecurityMiddleware',
+    'core.metrics.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -73,13 +76,27 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'SatgasKeamananAPI.wsgi.application'
+# Stream alarm SSE (/dashboard/alarm/stream/) hanya dilayani di bawah ASGI, mis.
+# `uvicorn SatgasKeamananAPI.asgi:application`; di bawah WSGI panel memakai polling
+ASGI_APPLICATION = 'SatgasKeamananAPI.asgi.application'
 
 
 # Database
+# Database dipilih dari DATABASE_URL (lihat database.py); default SQLite dengan WAL
 DATABASES = {
+    'default': database_config(os.environ.get('DATABASE_URL'), BASE_DIR / 'db.sqlite3'),
+}
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Test DB berupa file (bukan shared in-memory) agar test konkuren tidak kena table lock
+    DATABASES['default']['TEST'] = {'NAME': BASE_DIR / 'test_db.sqlite3'}
+
+
+# Cache (statistik dashboard, cooldown alarm). Di produksi dengan banyak
+# worker, ganti dengan backend bersama (Redis/Memcached/DatabaseCache).
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'satgas-default',
     }
 }
 
@@ -123,23 +140,78 @@ CORS_ALLOW_ALL_ORIGINS = True # HANYA untuk development
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Media hanya disajikan ke pemilik/admin (core/media.py). Di produksi serahkan
+# pengiriman file ke web server, mis. nginx:
+#   location /protected-media/ { internal; alias /path/ke/media/; }
+MEDIA_ACCEL_REDIRECT_PREFIX = None  # '/protected-media/'
+MEDIA_X_SENDFILE = False  # True untuk Apache mod_xsendfile / lighttpd
+
+# Media disimpan berdasarkan hash isi di subdirektori bertingkat (core/storage.py).
+# File lama dipindahkan dengan `manage.py migrate_media_storage`.
+STORAGES = {
+    'default': {'BACKEND': 'core.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
 AUTH_USER_MODEL = 'core.User'
 
+# Pemrosesan foto upload (resize, strip EXIF, thumbnail) di thread pool
+IMAGE_PROCESSING_ASYNC = True
+IMAGE_PROCESSING_WORKERS = 2
+
+# Push notification alarm (antrean diproses `manage.py run_notification_worker`)
+# Ganti dengan transport FCM di production; default hanya menulis ke log
+NOTIFICATION_TRANSPORT = 'core.notifications.LoggingTransport'
+NOTIFICATION_BATCH_SIZE = 500
+NOTIFICATION_MAX_ATTEMPTS = 5
+
+# Eskalasi alarm yang belum ditanggapi (`manage.py run_alarm_escalation`, core/escalation.py):
+# (detik sejak alarm dipicu, aksi); alarm aktif ditutup sebagai 'expired' setelah ALARM_EXPIRE_AFTER
+ALARM_ESCALATION_STEPS = [
+    (120, 'renotify'),
+    (300, 'raise_severity'),
+    (600, 'page_supervisors'),
+]
+ALARM_EXPIRE_AFTER = 4 * 3600
+
+# Pelacakan posisi langsung (core/tracking.py): riwayat disimpan paling sering
+# tiap LIVE_TRACK_SAMPLE_SECONDS per petugas, ditulis massal tiap LIVE_TRACK_FLUSH_SECONDS;
+# antrean yang belum tertulis dibatasi LIVE_TRACK_MAX_PENDING titik
+LIVE_TRACK_SAMPLE_SECONDS = 60
+LIVE_TRACK_FLUSH_SECONDS = 10
+LIVE_TRACK_BACKGROUND_FLUSH = True
+LIVE_TRACK_MAX_PENDING = 50_000
+
+# Stream alarm (core/alarm_stream.py): event dibaca dari tabel AlarmEvent tiap
+# ALARM_STREAM_POLL_SECONDS oleh satu thread per proses ASGI
+ALARM_STREAM_POLL_SECONDS = 1.0
+ALARM_STREAM_BACKGROUND_POLL = True
+
+# Instrumentasi request (core/metrics.py), dibaca di /api/admin/metrics/
+REQUEST_METRICS_WINDOW = 1000  # jumlah request terakhir per endpoint untuk persentil
+REQUEST_METRICS_SLOW_QUERY_MS = 100
+REQUEST_METRICS_MAX_QUERIES = 50
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWT dengan klaim peran: tanpa query user per request (core/authentication.py)
+        'core.authentication.RoleClaimsJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication', # Tambahkan Session Auth agar Web Admin bisa login
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
-    )
+    ),
+    # Keyset pagination untuk semua list endpoint (?cursor=..., ?page_size=...)
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.TimestampCursorPagination',
+    'PAGE_SIZE': 20,
 }
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
-    'UPDATE_LAST_LOGIN': True,
+    # last_login diperbarui paling sering tiap 15 menit oleh EmailTokenObtainPairSerializer
+    'UPDATE_LAST_LOGIN': False,
 }
 
 # Konfigurasi Login Web Admin
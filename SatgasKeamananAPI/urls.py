@@ -2,12 +2,12 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
 
-# Import JWT views
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView, # Digunakan untuk login (mendapatkan token pertama)
-    TokenRefreshView,    # Digunakan untuk memperbarui access token
+# Import views JWT (token membawa klaim peran, lihat core/authentication.py) dan media
+from core.views import (
+    EmailTokenObtainPairView, # Digunakan untuk login (mendapatkan token pertama)
+    RoleTokenRefreshView,     # Digunakan untuk memperbarui access token
+    ProtectedMediaView,
 )
 
 urlpatterns = [
@@ -19,13 +19,15 @@ urlpatterns = [
     path('', include('core.web_urls')),
 
     # 3. JWT Authentication Endpoints (Untuk Android)
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/', EmailTokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/refresh/', RoleTokenRefreshView.as_view(), name='token_refresh'),
 
     # 4. Aplikasi Core API (Untuk Android)
     path('api/', include('core.urls')),
 ]
 
-# Konfigurasi Media Files (Foto Upload)
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Konfigurasi Media Files (Foto Upload): selalu lewat cek hak akses, isi file
+# dikirim web server jika MEDIA_ACCEL_REDIRECT_PREFIX / MEDIA_X_SENDFILE diset
+urlpatterns += [
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", ProtectedMediaView.as_view(), name='protected-media'),
+]
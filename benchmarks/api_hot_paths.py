@@ -0,0 +1,169 @@
+"""
+Benchmark endpoint utama (latensi, jumlah query, memori) terhadap SQLite lokal
+berisi data sintetis bervolume realistis. Hasil dicetak sebagai JSON.
+
+    python benchmarks/api_hot_paths.py                       # ~1.3 juta presensi, 1 juta laporan
+    python benchmarks/api_hot_paths.py --petugas 300 --presensi 50000 --laporan 20000
+    python benchmarks/api_hot_paths.py --output bench.json
+
+Setiap endpoint dipanggil `--repeat` kali setelah satu kali pemanasan.
+`queries` dihitung dari satu request, `peak_memory_kb` dari tracemalloc pada
+request terpisah agar tidak memengaruhi angka latensi.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from seed import seed, setup_django
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def build_clients():
+    from django.test import Client
+    from rest_framework.test import APIClient
+    from core.models import User
+
+    admin = User.objects.create_user(
+        email='admin@bench.local', password='bench', is_admin=True, is_petugas=False
+    )
+    api = APIClient()
+    api.force_authenticate(admin)
+    web = Client()
+    web.force_login(admin)
+    return api, web
+
+
+def deep_cursor_url(api, path, pages):
+    """Ikuti link `next` sebanyak `pages` kali untuk mengukur halaman yang dalam."""
+    url = path
+    for _ in range(pages):
+        next_url = api.get(url).data.get('next')
+        if not next_url:
+            break
+        url = next_url
+    return url
+
+
+def measure(name, request, repeat, before_each=None):
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    if before_each:
+        before_each()
+    response = request()  # pemanasan
+
+    timings = []
+    for _ in range(repeat):
+        if before_each:
+            before_each()
+        started = time.perf_counter()
+        response = request()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    if before_each:
+        before_each()
+    # request_started ikut mereset connection.queries; kosongkan dulu agar hitungan utuh
+    reset_queries()
+    with CaptureQueriesContext(connection) as ctx:
+        request()
+
+    if before_each:
+        before_each()
+    tracemalloc.start()
+    request()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    content = b'' if getattr(response, 'streaming', False) else response.content
+    return {
+        'endpoint': name,
+        'status_code': response.status_code,
+        'response_bytes': len(content),
+        'queries': len(ctx.captured_queries),
+        'latency_ms': {
+            'min': round(min(timings), 3),
+            'median': round(statistics.median(timings), 3),
+            'p95': round(percentile(timings, 0.95), 3),
+            'max': round(max(timings), 3),
+        },
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run(args):
+    from django.core.cache import cache
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+    started = time.perf_counter()
+    dataset = seed(
+        args.presensi, args.petugas, args.days,
+        laporan_rows=args.laporan, alarm_rows=args.alarms
+    )
+    dataset['seed_seconds'] = round(time.perf_counter() - started, 1)
+
+    api, web = build_clients()
+    from core.models import EmergencyAlarm
+    alarm_id = EmergencyAlarm.objects.order_by('-timestamp').values_list('id', flat=True).first()
+    deep_presensi = deep_cursor_url(api, '/api/admin/presensi/?page_size=100', args.deep_pages)
+    deep_laporan = deep_cursor_url(api, '/api/admin/laporan/?page_size=100', args.deep_pages)
+
+    cases = [
+        ('GET /api/admin/laporan/harian/', lambda: api.get('/api/admin/laporan/harian/'), None),
+        ('GET /api/admin/dashboard/stats/ (cold)', lambda: api.get('/api/admin/dashboard/stats/'), cache.clear),
+        ('GET /api/admin/dashboard/stats/ (warm)', lambda: api.get('/api/admin/dashboard/stats/'), None),
+        ('GET /api/alarm/?status=active', lambda: api.get('/api/alarm/?status=active'), None),
+        ('GET /api/alarm/<id>/nearby/', lambda: api.get(f'/api/alarm/{alarm_id}/nearby/'), None),
+        ('GET /api/admin/presensi/ (first page)', lambda: api.get('/api/admin/presensi/'), None),
+        (f'GET /api/admin/presensi/ (page {args.deep_pages + 1}, size 100)', lambda: api.get(deep_presensi), None),
+        ('GET /api/admin/laporan/ (first page)', lambda: api.get('/api/admin/laporan/'), None),
+        (f'GET /api/admin/laporan/ (page {args.deep_pages + 1}, size 100)', lambda: api.get(deep_laporan), None),
+        ('GET /api/admin/laporan/?q=pintu gerbang', lambda: api.get('/api/admin/laporan/', {'q': 'pintu gerbang'}), None),
+        ('GET /api/admin/petugas/ (first page)', lambda: api.get('/api/admin/petugas/'), None),
+        ('GET /dashboard/rekap-harian/', lambda: web.get('/dashboard/rekap-harian/'), None),
+    ]
+
+    results = []
+    for name, request, before_each in cases:
+        results.append(measure(name, request, args.repeat, before_each))
+        print(f"{name}: {results[-1]['latency_ms']['median']} ms", file=sys.stderr)
+
+    return {'dataset': dataset, 'repeat': args.repeat, 'results': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--petugas', type=int, default=2000)
+    parser.add_argument('--presensi', type=int, default=1_300_000)
+    parser.add_argument('--laporan', type=int, default=1_000_000)
+    parser.add_argument('--alarms', type=int, default=500)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--deep-pages', type=int, default=50, help="Kedalaman halaman cursor yang diukur.")
+    parser.add_argument('--output', help="Tulis JSON ke file (default stdout).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(os.path.join(tmp, 'bench.sqlite3'))
+        report = run(args)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
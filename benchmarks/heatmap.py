@@ -0,0 +1,84 @@
+"""
+Ukur GET /api/admin/analytics/heatmap/ untuk rentang satu tahun (core/analytics.py)
+pada SQLite sementara berisi data sintetis: hitung langsung dari tabel mentah
+vs dari rollup per hari yang sudah tersimpan.
+
+    python benchmarks/heatmap.py --laporan 1000000
+    python benchmarks/heatmap.py --laporan 200000 --json > heatmap.json
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+
+from seed import seed, setup_django
+
+CASES = {
+    'semua': {},
+    'laporan_high': {'categories': ['laporan'], 'priorities': ['high']},
+    'senin_jam_22': {'weekday': 0, 'hour': 22},
+    'presisi_5': {'precision': 5},
+}
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {'median_ms': round(statistics.median(timings), 3), 'total': result['total'], 'cells': result['cell_count']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--laporan', type=int, default=1_000_000)
+    parser.add_argument('--alarm', type=int, default=20_000)
+    parser.add_argument('--petugas', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help="Cetak hasil sebagai JSON.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(os.path.join(tmp, 'bench.sqlite3'))
+
+        from django.core.management import call_command
+        from django.utils import timezone
+        from core.analytics import incident_heatmap, raw_counts, ensure_rollups
+        from core.models import IncidentDayRollup
+
+        call_command('migrate', verbosity=0)
+        seed(args.petugas, args.petugas, 365, laporan_rows=args.laporan, alarm_rows=args.alarm)
+
+        end = timezone.localdate()
+        start = end - timedelta(days=364)
+        report = {'laporan': args.laporan, 'alarm': args.alarm, 'start': start.isoformat(), 'end': end.isoformat()}
+
+        # Tanpa rollup: seluruh baris mentah dibaca dan di-bin
+        report['raw'] = measure(lambda: {'total': int(raw_counts(start, end + timedelta(days=1)).hours.sum()),
+                                         'cell_count': None}, 1)
+        started = time.perf_counter()
+        ensure_rollups(start, end)
+        report['build_rollup_seconds'] = round(time.perf_counter() - started, 2)
+        report['rollup_rows'] = IncidentDayRollup.objects.count()
+        report['cases'] = {
+            name: measure(lambda params=params: incident_heatmap(start, end, **params), args.repeat)
+            for name, params in CASES.items()
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Laporan {args.laporan}, alarm {args.alarm}, rentang {report['start']} s/d {report['end']}")
+    print(f"Tabel mentah (tanpa rollup): {report['raw']['median_ms']} ms, {report['raw']['total']} insiden")
+    print(f"Bangun rollup: {report['build_rollup_seconds']} detik, {report['rollup_rows']} baris")
+    for name, result in report['cases'].items():
+        print(f"  {name}: {result['median_ms']} ms ({result['total']} insiden, {result['cells']} sel)")
+
+
+if __name__ == '__main__':
+    main()
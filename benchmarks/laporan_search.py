@@ -0,0 +1,83 @@
+"""
+Bandingkan pencarian teks laporan: `LIKE '%...%'` (scan seluruh tabel) vs index
+FTS5 (core/search.py, migrasi core 0015) pada SQLite sementara berisi data sintetis.
+
+    python benchmarks/laporan_search.py --laporan 1000000
+    python benchmarks/laporan_search.py --laporan 200000 --json > search.json
+
+Setiap query mengambil satu halaman (20 baris) seperti GET /api/admin/laporan/?q=...
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from seed import seed, setup_django
+
+QUERIES = ['pintu gerbang', 'cctv', '"alarm kebakaran"', 'gudang pagar', 'kebo', '777777', 'tidakada']
+PAGE_SIZE = 20
+
+
+def build_queries(text):
+    from django.db.models import Q
+    from core.models import Laporan
+    from core.search import parse_query, search_laporan
+
+    base = Laporan.objects.select_related('petugas')
+    like = base
+    for words, _ in parse_query(text):
+        phrase = ' '.join(words)
+        like = like.filter(Q(note__icontains=phrase) | Q(location_note__icontains=phrase))
+    return {
+        'like': like.order_by('-timestamp')[:PAGE_SIZE],
+        'fts': search_laporan(base, text)[:PAGE_SIZE],
+    }
+
+
+def measure(queryset, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = list(queryset.all())
+        timings.append((time.perf_counter() - started) * 1000)
+    return {'rows': len(rows), 'median_ms': round(statistics.median(timings), 3), 'plan': queryset.explain()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--laporan', type=int, default=1_000_000)
+    parser.add_argument('--petugas', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help="Cetak hasil sebagai JSON.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(os.path.join(tmp, 'bench.sqlite3'))
+
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0)
+
+        started = time.perf_counter()
+        seed(args.petugas, args.petugas, 1, laporan_rows=args.laporan, alarm_rows=0)
+        report = {'laporan': args.laporan, 'seed_seconds': round(time.perf_counter() - started, 1), 'queries': {}}
+        for text in QUERIES:
+            report['queries'][text] = {
+                name: measure(queryset, args.repeat) for name, queryset in build_queries(text).items()
+            }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Baris Laporan: {args.laporan} (seed + index {report['seed_seconds']} detik)")
+    for text, result in report['queries'].items():
+        like, fts = result['like'], result['fts']
+        print(f"\n== {text}: LIKE {like['median_ms']} ms -> FTS5 {fts['median_ms']} ms ({fts['rows']} baris)")
+        for label, plan in (('LIKE', like['plan']), ('FTS5', fts['plan'])):
+            print(f"  {label}: " + plan.replace('\n', '\n' + ' ' * 8))
+
+
+if __name__ == '__main__':
+    main()
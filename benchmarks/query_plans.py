@@ -0,0 +1,115 @@
+"""
+Bandingkan query plan & latensi query utama sebelum dan sesudah index komposit
+(Meta.indexes, migrasi core 0006) pada database SQLite sementara berisi data sintetis.
+
+    python benchmarks/query_plans.py --rows 1000000
+    python benchmarks/query_plans.py --rows 200000 --json > plans.json
+
+"Sebelum" memakai bentuk query lama (`timestamp__date=...`) dengan index dihapus;
+"sesudah" memakai range `filter_on_date` dengan index komposit.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+
+from seed import seed, setup_django
+
+
+def build_queries(petugas_id, target_date, use_range):
+    from core.models import Presensi, Laporan, EmergencyAlarm
+    from core.rekap import filter_on_date
+
+    def on_date(queryset):
+        if use_range:
+            return filter_on_date(queryset, target_date)
+        return queryset.filter(timestamp__date=target_date)
+
+    return {
+        'presensi_duplikat_harian': on_date(
+            Presensi.objects.filter(petugas_id=petugas_id)
+        ).values('pk')[:1],
+        'presensi_list_tanggal': on_date(Presensi.objects.all()).order_by('-timestamp')[:20],
+        'dashboard_hadir': on_date(
+            Presensi.objects.filter(status_validasi='hadir')
+        ).values('petugas').distinct(),
+        'laporan_terbuka': Laporan.objects.filter(status='lapor').order_by('-timestamp')[:5],
+        'alarm_aktif': EmergencyAlarm.objects.filter(status='active').order_by('-timestamp')[:20],
+    }
+
+
+def set_indexes(enabled):
+    from django.db import connection
+    from core.models import Presensi, Laporan, EmergencyAlarm
+
+    with connection.schema_editor() as editor:
+        for model in (Presensi, Laporan, EmergencyAlarm):
+            for index in model._meta.indexes:
+                if enabled:
+                    editor.add_index(model, index)
+                else:
+                    editor.remove_index(model, index)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def measure(queries, repeat):
+    results = {}
+    for name, queryset in queries.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = {
+            'plan': queryset.explain(),
+            'median_ms': round(statistics.median(timings), 3),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Jumlah baris Presensi (Laporan = rows/2).")
+    parser.add_argument('--petugas', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help="Cetak hasil sebagai JSON.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(os.path.join(tmp, 'bench.sqlite3'))
+
+        from django.core.management import call_command
+        from django.utils import timezone
+
+        call_command('migrate', verbosity=0)
+        petugas_id = seed(args.rows, args.petugas, args.days)['first_petugas_id']
+        target_date = timezone.localdate() - timedelta(days=args.days // 2)
+
+        set_indexes(False)
+        report = {
+            'rows': args.rows,
+            'before': measure(build_queries(petugas_id, target_date, use_range=False), args.repeat),
+        }
+
+        set_indexes(True)
+        report['after'] = measure(build_queries(petugas_id, target_date, use_range=True), args.repeat)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Baris Presensi: {args.rows}")
+    for name in report['before']:
+        before, after = report['before'][name], report['after'][name]
+        print(f"\n== {name}: {before['median_ms']} ms -> {after['median_ms']} ms")
+        for label, plan in (('sebelum', before['plan']), ('sesudah', after['plan'])):
+            print(f"  {label}: " + plan.replace('\n', '\n' + ' ' * 11))
+
+
+if __name__ == '__main__':
+    main()
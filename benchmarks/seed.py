@@ -0,0 +1,142 @@
+"""
+Pengisi data sintetis untuk skrip benchmark (SQL mentah, jutaan baris dalam hitungan detik).
+
+Dipakai setelah `django.setup()` pada database sementara; kolom yang belum ada
+pada versi migrasi yang sedang aktif (mis. `tanggal`) otomatis dilewati.
+"""
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'SatgasKeamananAPI.settings')
+
+BATCH_SIZE = 50_000
+
+# Kosakata catatan laporan agar pencarian teks punya selektivitas realistis
+LAPORAN_NOTES = [
+    'Pintu gerbang belakang tidak terkunci', 'Lampu parkir mati', 'Orang mencurigakan di area parkir',
+    'Pagar rusak dekat gudang', 'CCTV lobi tidak menyala', 'Kendaraan parkir sembarangan',
+    'Laporan rutin', 'Tamu tanpa kartu identitas', 'Kebocoran air di toilet lantai dua',
+    'Alarm kebakaran berbunyi tanpa sebab', 'Sampah menumpuk di pintu samping', 'Portal palang macet',
+]
+LAPORAN_LOCATIONS = ['Gerbang utama', 'Gerbang belakang', 'Parkir basement', 'Lobi', 'Gudang', 'Pos 1', 'Pos 2']
+
+
+def setup_django(db_path):
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = db_path
+
+    import django
+    django.setup()
+
+
+def _columns(cursor, table):
+    from django.db import connection
+    return {column.name for column in connection.introspection.get_table_description(cursor, table)}
+
+
+def _insert(cursor, table, rows):
+    """Insert list of dict; hanya kolom yang ada di tabel saat ini."""
+    if not rows:
+        return
+    available = _columns(cursor, table)
+    columns = [c for c in rows[0] if c in available]
+    placeholders = ', '.join(['%s'] * len(columns))
+    cursor.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+        [[row[c] for c in columns] for row in rows]
+    )
+
+
+def seed(presensi_rows, petugas_count, days, laporan_rows=None, alarm_rows=None, seed_value=42):
+    """
+    Isi petugas, presensi (maks. satu per petugas per hari), laporan dan alarm.
+    Mengembalikan dict ringkasan jumlah baris dan rentang id petugas.
+    """
+    from django.conf import settings
+    from django.db import connection, transaction
+    from core.geo import encode
+
+    rng = random.Random(seed_value)
+    local_tz = ZoneInfo(settings.TIME_ZONE)
+    days = max(days, -(-presensi_rows // max(petugas_count, 1)))
+    laporan_rows = presensi_rows // 2 if laporan_rows is None else laporan_rows
+    alarm_rows = max(presensi_rows // 1000, 100) if alarm_rows is None else alarm_rows
+
+    now = datetime.now(dt_timezone.utc)
+    start = now - timedelta(days=days)
+    span = int((now - start).total_seconds())
+
+    def random_ts():
+        return start + timedelta(seconds=rng.randrange(span))
+
+    def random_point():
+        latitude, longitude = -6.2 + rng.uniform(-0.05, 0.05), 106.8 + rng.uniform(-0.05, 0.05)
+        return {'latitude': latitude, 'longitude': longitude, 'geohash': encode(latitude, longitude)}
+
+    def fmt(value):
+        return value.replace(tzinfo=None).isoformat(sep=' ')
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        _insert(cursor, 'core_user', [{
+            'password': '!', 'is_superuser': 0, 'first_name': f'Petugas{i}', 'last_name': '',
+            'is_staff': 0, 'is_active': 1, 'date_joined': fmt(random_ts()),
+            'email': f'petugas{i}@bench.local', 'is_admin': 0, 'is_petugas': 1,
+        } for i in range(petugas_count)])
+        cursor.execute("SELECT MIN(id), MAX(id) FROM core_user")
+        first_id, last_id = cursor.fetchone()
+        petugas_ids = list(range(first_id, last_id + 1))
+
+        # Presensi: tiap hari sebagian petugas hadir (sesuai constraint satu presensi/hari)
+        per_day = min(petugas_count, -(-presensi_rows // days))
+        remaining = presensi_rows
+        batch = []
+        for day in range(days):
+            if remaining <= 0:
+                break
+            local_day = (now - timedelta(days=day)).astimezone(local_tz).date()
+            morning = datetime.combine(local_day, datetime.min.time(), local_tz) + timedelta(hours=6)
+            for petugas_id in rng.sample(petugas_ids, min(per_day, remaining)):
+                ts = (morning + timedelta(seconds=rng.randrange(4 * 3600))).astimezone(dt_timezone.utc)
+                batch.append({
+                    'petugas_id': petugas_id, 'timestamp': fmt(ts), 'tanggal': local_day.isoformat(),
+                    **random_point(), 'location_note': 'Pos', 'note': 'Presensi Harian', 'selfie_photo': 'presensi_photos/x.jpg',
+                    'status_validasi': rng.choice(['hadir'] * 8 + ['tidak_hadir', 'diluar_lokasi']),
+                    'validasi_manual': 0,
+                })
+            remaining -= min(per_day, remaining)
+            if len(batch) >= BATCH_SIZE:
+                _insert(cursor, 'core_presensi', batch)
+                batch = []
+        _insert(cursor, 'core_presensi', batch)
+
+        for offset in range(0, laporan_rows, BATCH_SIZE):
+            _insert(cursor, 'core_laporan', [{
+                'petugas_id': rng.choice(petugas_ids), 'timestamp': fmt(random_ts()), **random_point(),
+                'location_note': rng.choice(LAPORAN_LOCATIONS), 'note': f'{rng.choice(LAPORAN_NOTES)} #{rng.randrange(10**6)}',
+                'photo': 'laporan_photos/x.jpg',
+                'status': rng.choice(['lapor', 'ditanggapi'] + ['selesai'] * 8),
+                'priority': rng.choice(['low', 'medium', 'high']),
+            } for _ in range(min(BATCH_SIZE, laporan_rows - offset))])
+
+        _insert(cursor, 'core_emergencyalarm', [{
+            'petugas_id': rng.choice(petugas_ids), 'timestamp': fmt(random_ts()), 'category': 'maling',
+            **random_point(),
+            'status': rng.choice(['active'] + ['handled'] * 20), 'severity': 'normal', 'escalation_level': 0,
+        } for _ in range(alarm_rows)])
+
+        cursor.execute("ANALYZE")
+
+    return {
+        'petugas': petugas_count,
+        'presensi': presensi_rows - max(remaining, 0),
+        'laporan': laporan_rows,
+        'alarm': alarm_rows,
+        'days': days,
+        'first_petugas_id': first_id,
+    }
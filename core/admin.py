@@ -1,7 +1,17 @@
 # core/admin.py
 from django.contrib import admin
-from .models import User, Presensi, Laporan
+from .models import (
+    User, Presensi, Laporan, PostLocation, DeviceToken, NotificationJob, LocationTrack,
+    Shift, ShiftSchedule, ShiftException,
+)
 
 admin.site.register(User)
 admin.site.register(Presensi)
-admin.site.register(Laporan)
\ No newline at end of file
+admin.site.register(Laporan)
+admin.site.register(PostLocation)
+admin.site.register(DeviceToken)
+admin.site.register(NotificationJob)
+admin.site.register(LocationTrack)
+admin.site.register(Shift)
+admin.site.register(ShiftSchedule)
+admin.site.register(ShiftException)
@@ -0,0 +1,250 @@
+# core/alarm_stream.py
+"""
+Siaran perubahan alarm ke panel admin lewat Server-Sent Events.
+
+Event disimpan ke tabel AlarmEvent setelah transaksi commit, dari proses mana
+pun (worker web, scheduler eskalasi, management command). Setiap proses yang
+melayani stream menjalankan satu thread poller yang membaca event baru
+berdasarkan id (paling lama ALARM_STREAM_POLL_SECONDS) lalu meneruskannya ke
+koneksi stream yang terbuka di proses itu. Id event sekaligus Last-Event-ID
+client, sehingga koneksi yang tersambung ulang ke worker mana pun mendapat
+event yang terlewat dari database.
+
+Endpoint stream butuh server ASGI (SatgasKeamananAPI.asgi, mis. uvicorn/daphne):
+di bawah WSGI satu koneksi akan menahan satu thread worker selamanya, jadi
+request WSGI ditolak dan panel kembali ke polling bersyarat ke /api/alarm/.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from .models import AlarmEvent, EmergencyAlarm
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+DEFAULT_POLL_SECONDS = 1.0
+# Event lebih tua dari ini dihapus; client yang tertinggal lebih jauh menerima snapshot
+EVENT_RETENTION = timedelta(days=1)
+PRUNE_EVERY = 500
+# Id yang terlewat (transaksi lain belum commit) ditunggu selama ini, paling banyak sejumlah ini
+GAP_SECONDS = 10
+MAX_GAPS = 100
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class AlarmBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        # Id event terakhir yang sudah diteruskan; None = belum ada stream (lihat start_from)
+        self._cursor = None
+        # id yang dilewati -> batas waktu (monotonic) menunggunya muncul
+        self._gaps = {}
+        self._poller = None
+
+    def reset(self):
+        with self._lock:
+            self._cursor, self._gaps = None, {}
+
+    def publish(self, event_type, data):
+        """Simpan event; diteruskan ke stream oleh poller di setiap proses."""
+        event = AlarmEvent.objects.create(event_type=event_type, data=data)
+        if event.pk % PRUNE_EVERY == 0:
+            AlarmEvent.objects.filter(created_at__lt=timezone.now() - EVENT_RETENTION).delete()
+        return event.pk, event_type, data
+
+    def latest_event_id(self):
+        return AlarmEvent.objects.aggregate(last=Max('pk'))['last'] or 0
+
+    def replay(self, last_event_id):
+        """
+        Event setelah `last_event_id`, atau None jika tidak bisa dipastikan
+        lengkap (id di luar rentang yang tersimpan) sehingga client perlu snapshot.
+        """
+        if last_event_id is None:
+            return None
+        bounds = AlarmEvent.objects.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['last'] is None or not bounds['first'] - 1 <= last_event_id <= bounds['last']:
+            return None
+        return list(
+            AlarmEvent.objects.filter(pk__gt=last_event_id).order_by('pk')
+            .values_list('pk', 'event_type', 'data')
+        )
+
+    def poll(self):
+        """Baca event baru dari database dan teruskan ke subscriber proses ini."""
+        with self._lock:
+            cursor, gaps = self._cursor, dict(self._gaps)
+        if cursor is None:
+            return 0
+
+        now = time.monotonic()
+        gaps = {pk: until for pk, until in gaps.items() if until > now}
+        events = list(
+            AlarmEvent.objects.filter(Q(pk__gt=cursor) | Q(pk__in=list(gaps)))
+            .order_by('pk').values_list('pk', 'event_type', 'data')
+        )
+        for pk, _, _ in events:
+            gaps.pop(pk, None)
+            if pk > cursor:
+                # Id di antaranya bisa milik transaksi yang commit belakangan
+                gaps.update((missing, now + GAP_SECONDS) for missing in range(max(cursor + 1, pk - MAX_GAPS), pk))
+                cursor = pk
+        if len(gaps) > MAX_GAPS:
+            gaps = dict(sorted(gaps.items())[-MAX_GAPS:])
+
+        with self._lock:
+            self._cursor, self._gaps = cursor, gaps
+            subscribers = list(self._subscribers)
+        for event in events:
+            for token in subscribers:
+                loop, queue = token
+                try:
+                    loop.call_soon_threadsafe(queue.put_nowait, event)
+                except RuntimeError:
+                    # Event loop milik koneksi sudah ditutup
+                    self.unsubscribe(token)
+        return len(events)
+
+    def subscribe(self):
+        token = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.add(token)
+        self._ensure_poller()
+        return token
+
+    def start_from(self, event_id):
+        """
+        Stream baru sudah mendapat event sampai `event_id`; jika poller belum
+        berjalan, ia mulai dari situ. Poller yang sudah berjalan tidak dimundurkan:
+        event yang ia teruskan setelah subscribe() sudah masuk antrean stream ini.
+        """
+        with self._lock:
+            if self._cursor is None:
+                self._cursor = event_id
+
+    def unsubscribe(self, token):
+        with self._lock:
+            self._subscribers.discard(token)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def _ensure_poller(self):
+        if self._poller is not None or not _setting('ALARM_STREAM_BACKGROUND_POLL', True):
+            return
+        with self._lock:
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._run_poller, name='alarm-stream-poller', daemon=True)
+                self._poller.start()
+
+    def _run_poller(self):
+        while True:
+            time.sleep(_setting('ALARM_STREAM_POLL_SECONDS', DEFAULT_POLL_SECONDS))
+            with self._lock:
+                idle = not self._subscribers
+                if idle:
+                    # Tanpa penonton tidak perlu membaca; stream berikutnya memberi titik awal
+                    self._cursor, self._gaps = None, {}
+            if idle:
+                continue
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Gagal membaca event alarm")
+            finally:
+                close_old_connections()
+
+
+broker = AlarmBroker()
+
+
+def serialize_alarm(alarm):
+    return {
+        'id': alarm.id,
+        'category': alarm.category,
+        'status': alarm.status,
+        'severity': alarm.severity,
+        'escalation_level': alarm.escalation_level,
+        'petugas_name': alarm.petugas.first_name,
+        'timestamp': alarm.timestamp.isoformat() if alarm.timestamp else None,
+        'resolved_at': alarm.resolved_at.isoformat() if alarm.resolved_at else None,
+    }
+
+
+def publish_alarm_change(alarm, transition):
+    """Terbitkan perubahan alarm setelah transaksi yang sedang berjalan commit."""
+    data = dict(serialize_alarm(alarm), transition=transition)
+    transaction.on_commit(lambda: broker.publish('alarm', data))
+
+
+def format_event(event_id, event_type, data):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+@sync_to_async
+def active_alarm_snapshot():
+    # Id dibaca lebih dulu: event yang terbit selama snapshot dikirim ulang, bukan hilang
+    last_id = broker.latest_event_id()
+    alarms = EmergencyAlarm.objects.select_related('petugas').filter(
+        status='active'
+    ).order_by('-timestamp')
+    return last_id, [serialize_alarm(alarm) for alarm in alarms]
+
+
+def parse_last_event_id(value):
+    try:
+        return int(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+async def alarm_event_stream(last_event_id=None, heartbeat=HEARTBEAT_SECONDS):
+    token = broker.subscribe()
+    _, queue = token
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+
+        missed = await sync_to_async(broker.replay)(last_event_id)
+        if missed is None:
+            snapshot_id, alarms = await active_alarm_snapshot()
+            broker.start_from(snapshot_id)
+            yield format_event(snapshot_id, 'snapshot', alarms)
+            sent = set()
+        else:
+            broker.start_from(missed[-1][0] if missed else last_event_id)
+            for event in missed:
+                yield format_event(*event)
+            # Event yang sudah dikirim dari riwayat bisa masuk antrean lagi lewat poller
+            sent = {event[0] for event in missed}
+
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if event[0] not in sent:
+                yield format_event(*event)
+    finally:
+        broker.unsubscribe(token)
@@ -0,0 +1,299 @@
+# core/analytics.py
+"""
+Heatmap hotspot insiden: laporan dan alarm dikelompokkan per sel geohash,
+hari dalam minggu dan jam.
+
+Hari yang sudah lewat dibaca dari rollup per hari (IncidentDayRollup: satu
+baris per hari/kategori/prioritas berisi record NumPy sel + 24 hitungan per
+jam, sehingga setahun hanya ~1-2 ribu baris), dihitung sekali saat pertama
+diminta atau lewat `manage.py rebuild_incident_rollups`.
+Hari ini selalu dihitung dari tabel mentah. Perubahan data hari yang sudah
+lewat menghapus penanda harinya (IncidentRollupDay) sehingga dihitung ulang.
+
+Binning dan agregasi memakai NumPy: kunci (hari, sel, grup) dipetakan ke indeks
+integer lalu dijumlahkan dengan bincount, tanpa loop Python per insiden.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+
+import numpy as np
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .geo import decode
+from .models import Laporan, EmergencyAlarm, IncidentDayRollup, IncidentRollupDay
+from .rekap import day_bounds, local_date
+
+CELL_PRECISION = 6  # ~1.2 x 0.6 km
+MIN_PRECISION = 3
+LAPORAN_CATEGORY = 'laporan'
+HOURS, WEEKDAYS = 24, 7
+CELL_DTYPE = f'S{CELL_PRECISION}'
+# Isi IncidentDayRollup.cells
+ROLLUP_DTYPE = np.dtype([('cell', CELL_DTYPE), ('hours', '<u4', (HOURS,))])
+MAX_RANGE_DAYS = 366
+DEFAULT_CELL_LIMIT = 100
+MAX_CELL_LIMIT = 1000
+
+ROLLUP_BATCH_SIZE = 2000
+ROLLUP_CHUNK_DAYS = 31
+
+# Kolom NumPy sejajar: hari (ordinal tanggal lokal), sel, kategori, prioritas, hours[n, 24]
+CellCounts = namedtuple('CellCounts', ['days', 'cells', 'categories', 'priorities', 'hours'])
+
+
+def _empty():
+    return CellCounts(
+        np.empty(0, dtype=np.int64), np.empty(0, dtype=CELL_DTYPE),
+        np.empty(0, dtype='U50'), np.empty(0, dtype='U20'), np.empty((0, HOURS), dtype=np.int64),
+    )
+
+
+def _concat(parts):
+    parts = [part for part in parts if len(part.days)]
+    if not parts:
+        return _empty()
+    return CellCounts(*(np.concatenate(column) for column in zip(*parts)))
+
+
+def _date_range(start_date, end_date):
+    return [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days)]
+
+
+# ============================================
+# BINNING DARI TABEL MENTAH
+# ============================================
+
+def bin_incidents(days, timestamps, cells, categories, priorities):
+    """
+    Kelompokkan insiden mentah menjadi CellCounts. `days` adalah tanggal lokal
+    berurutan yang mencakup semua `timestamps` (epoch detik).
+    """
+    if not len(timestamps):
+        return _empty()
+    bounds = np.array([day_bounds(day)[0].timestamp() for day in days] + [day_bounds(days[-1])[1].timestamp()])
+    epoch = np.asarray(timestamps, dtype=np.float64)
+    day_index = np.searchsorted(bounds, epoch, side='right') - 1
+    # Jam lokal dari awal hari (aman untuk zona dengan DST)
+    hour = np.clip(((epoch - bounds[day_index]) // 3600).astype(np.int64), 0, HOURS - 1)
+
+    cell_values, cell_index = np.unique(np.asarray(cells, dtype=CELL_DTYPE), return_inverse=True)
+    group_values, group_index = np.unique(
+        np.char.add(np.char.add(np.asarray(categories, dtype='U50'), '|'), np.asarray(priorities, dtype='U20')),
+        return_inverse=True,
+    )
+    key = (day_index * len(cell_values) + cell_index) * len(group_values) + group_index
+    keys, row = np.unique(key, return_inverse=True)
+    hours = np.bincount(row * HOURS + hour, minlength=len(keys) * HOURS).reshape(len(keys), HOURS)
+
+    day_index, rest = np.divmod(keys, len(cell_values) * len(group_values))
+    cell_index, group_index = np.divmod(rest, len(group_values))
+    category, priority = np.char.partition(group_values[group_index], '|')[:, [0, 2]].T
+    ordinals = np.array([day.toordinal() for day in days], dtype=np.int64)
+    return CellCounts(ordinals[day_index], cell_values[cell_index], category, priority, hours)
+
+
+def raw_counts(start_date, end_date):
+    """CellCounts hari [start_date, end_date) langsung dari Laporan dan EmergencyAlarm."""
+    start, end = day_bounds(start_date)[0], day_bounds(end_date)[0]
+    timestamps, cells, categories, priorities = [], [], [], []
+    sources = [
+        (Laporan.objects.values_list('timestamp', 'geohash', 'priority'), True),
+        (EmergencyAlarm.objects.values_list('timestamp', 'geohash', 'category'), False),
+    ]
+    for queryset, is_laporan in sources:
+        rows = queryset.filter(timestamp__gte=start, timestamp__lt=end, geohash__isnull=False)
+        for timestamp, geohash, value in rows.iterator(chunk_size=10000):
+            timestamps.append(timestamp.timestamp())
+            cells.append(geohash)
+            categories.append(LAPORAN_CATEGORY if is_laporan else value)
+            priorities.append(value if is_laporan else '')
+    return bin_incidents(_date_range(start_date, end_date), timestamps, cells, categories, priorities)
+
+
+# ============================================
+# ROLLUP PER HARI
+# ============================================
+
+def build_rollups(start_date, end_date):
+    """Hitung ulang dan simpan rollup hari [start_date, end_date); kembalikan jumlah baris."""
+    counts = raw_counts(start_date, end_date)
+    rollups = []
+    # bin_incidents mengurutkan kunci (hari, sel, grup): kelompokkan per (hari, grup)
+    order = np.lexsort((counts.cells, counts.priorities, counts.categories, counts.days))
+    counts = CellCounts(*(column[order] for column in counts))
+    groups = np.stack([counts.days.astype('U'), counts.categories, counts.priorities], axis=1)
+    boundaries = np.flatnonzero((groups[1:] != groups[:-1]).any(axis=1)) + 1
+    for begin, end in zip([0, *boundaries.tolist()], [*boundaries.tolist(), len(counts.days)]):
+        if begin == end:
+            break
+        records = np.empty(end - begin, dtype=ROLLUP_DTYPE)
+        records['cell'] = counts.cells[begin:end]
+        records['hours'] = counts.hours[begin:end]
+        rollups.append(IncidentDayRollup(
+            date=date.fromordinal(int(counts.days[begin])),
+            category=str(counts.categories[begin]), priority=str(counts.priorities[begin]),
+            cells=records.tobytes(), total=int(counts.hours[begin:end].sum()),
+        ))
+    with transaction.atomic():
+        IncidentDayRollup.objects.filter(date__gte=start_date, date__lt=end_date).delete()
+        IncidentDayRollup.objects.bulk_create(rollups, batch_size=ROLLUP_BATCH_SIZE)
+        IncidentRollupDay.objects.filter(date__gte=start_date, date__lt=end_date).delete()
+        IncidentRollupDay.objects.bulk_create(
+            [IncidentRollupDay(date=day) for day in _date_range(start_date, end_date)],
+            batch_size=ROLLUP_BATCH_SIZE,
+        )
+    return len(rollups)
+
+
+def chunked(start_date, end_date, days=ROLLUP_CHUNK_DAYS):
+    """Pecah [start_date, end_date) agar baris mentah yang dimuat sekaligus tetap terbatas."""
+    while start_date < end_date:
+        chunk_end = min(start_date + timedelta(days=days), end_date)
+        yield start_date, chunk_end
+        start_date = chunk_end
+
+
+def _missing_runs(start_date, end_date):
+    """Rentang hari berurutan dalam [start_date, end_date) yang belum punya rollup."""
+    done = set(IncidentRollupDay.objects.filter(
+        date__gte=start_date, date__lt=end_date
+    ).values_list('date', flat=True))
+    runs, run_start = [], None
+    for day in _date_range(start_date, end_date) + [end_date]:
+        missing = day < end_date and day not in done
+        if missing and run_start is None:
+            run_start = day
+        elif not missing and run_start is not None:
+            runs.append((run_start, day))
+            run_start = None
+    return runs
+
+
+def ensure_rollups(start_date, end_date):
+    """
+    Lengkapi rollup [start_date, end_date) (hari yang sudah lewat saja). Jika
+    proses lain sedang menulis rollup hari yang sama (IntegrityError pada
+    constraint unik), potongan itu dihitung tanpa disimpan. Mengembalikan
+    daftar (chunk_start, chunk_end, CellCounts) potongan tersebut.
+    """
+    end_date = min(end_date, timezone.localdate())
+    runs = _missing_runs(start_date, end_date) if start_date < end_date else []
+    fallback = []
+    for run_start, run_end in runs:
+        for chunk_start, chunk_end in chunked(run_start, run_end):
+            try:
+                build_rollups(chunk_start, chunk_end)
+            except IntegrityError:
+                fallback.append((chunk_start, chunk_end, raw_counts(chunk_start, chunk_end)))
+    return fallback
+
+
+def load_rollups(start_date, end_date, categories=None, priorities=None, exclude=()):
+    """`exclude`: rentang (start, end) yang sudah dihitung dari tabel mentah."""
+    queryset = IncidentDayRollup.objects.filter(date__gte=start_date, date__lt=end_date)
+    for skip_start, skip_end in exclude:
+        queryset = queryset.exclude(date__gte=skip_start, date__lt=skip_end)
+    if categories:
+        queryset = queryset.filter(category__in=categories)
+    if priorities:
+        queryset = queryset.filter(priority__in=priorities)
+    rows = list(queryset.values_list('date', 'category', 'priority', 'cells'))
+    if not rows:
+        return _empty()
+    days, category, priority, blobs = zip(*rows)
+    records = [np.frombuffer(blob, dtype=ROLLUP_DTYPE) for blob in blobs]
+    sizes = [len(part) for part in records]
+    records = np.concatenate(records)
+    return CellCounts(
+        np.repeat([day.toordinal() for day in days], sizes).astype(np.int64),
+        records['cell'],
+        np.repeat(np.asarray(category, dtype='U50'), sizes),
+        np.repeat(np.asarray(priority, dtype='U20'), sizes),
+        records['hours'].astype(np.int64),
+    )
+
+
+def invalidate_rollup_day(timestamp):
+    """Dipanggil saat insiden berubah/dihapus; hari ini tidak punya rollup tersimpan."""
+    day = local_date(timestamp)
+    if day < timezone.localdate():
+        IncidentRollupDay.objects.filter(date=day).delete()
+
+
+# ============================================
+# HEATMAP
+# ============================================
+
+def incident_heatmap(start_date, end_date, categories=None, priorities=None,
+                     precision=CELL_PRECISION, weekday=None, hour=None, limit=DEFAULT_CELL_LIMIT):
+    """
+    Heatmap [start_date, end_date] (inklusif). `weekday` (0 = Senin) dan `hour`
+    mempersempit hitungan ke satu hari/jam tertentu.
+    """
+    today = timezone.localdate()
+    end_exclusive = end_date + timedelta(days=1)
+    stored_end = min(end_exclusive, today)
+
+    parts = []
+    if start_date < stored_end:
+        fallback = ensure_rollups(start_date, stored_end)
+        parts.extend(counts for _, _, counts in fallback)
+        # Rollup yang commit belakangan dari proses lain tidak ikut terhitung dua kali
+        skipped = [(chunk_start, chunk_end) for chunk_start, chunk_end, _ in fallback]
+        parts.append(load_rollups(start_date, stored_end, categories, priorities, exclude=skipped))
+    if start_date <= today < end_exclusive:
+        parts.append(raw_counts(today, today + timedelta(days=1)))
+    counts = _concat(parts)
+
+    mask = np.ones(len(counts.days), dtype=bool)
+    if categories:
+        mask &= np.isin(counts.categories, list(categories))
+    if priorities:
+        mask &= np.isin(counts.priorities, list(priorities))
+    weekdays = (counts.days + 6) % WEEKDAYS  # date.toordinal(): 1 = Senin
+    if weekday is not None:
+        mask &= weekdays == weekday
+    hours, weekdays, cells = counts.hours[mask], weekdays[mask], counts.cells[mask]
+    if hour is not None:
+        selected = np.zeros(HOURS, dtype=bool)
+        selected[hour] = True
+        hours = hours * selected
+
+    # Matriks hari x jam seluruh area
+    matrix = np.zeros((WEEKDAYS, HOURS), dtype=np.int64)
+    np.add.at(matrix, weekdays, hours)
+
+    # Per sel pada presisi yang diminta (prefix geohash)
+    cell_values, cell_index = np.unique(cells.astype(f'S{precision}'), return_inverse=True)
+    cell_hours = np.zeros((len(cell_values), HOURS), dtype=np.int64)
+    np.add.at(cell_hours, cell_index, hours)
+    cell_weekdays = np.bincount(
+        cell_index * WEEKDAYS + weekdays, weights=hours.sum(axis=1), minlength=len(cell_values) * WEEKDAYS
+    ).reshape(len(cell_values), WEEKDAYS).astype(np.int64)
+    cell_totals = cell_hours.sum(axis=1)
+
+    nonzero = np.flatnonzero(cell_totals)
+    top = nonzero[np.argsort(-cell_totals[nonzero], kind='stable')[:limit]]
+    result_cells = []
+    for index in top.tolist():
+        cell = cell_values[index].decode()
+        latitude, longitude = decode(cell)
+        result_cells.append({
+            'cell': cell,
+            'latitude': round(latitude, 6),
+            'longitude': round(longitude, 6),
+            'count': int(cell_totals[index]),
+            'hours': cell_hours[index].tolist(),
+            'weekdays': cell_weekdays[index].tolist(),
+        })
+
+    return {
+        'start': start_date,
+        'end': end_date,
+        'precision': precision,
+        'total': int(matrix.sum()),
+        'cell_count': len(nonzero),
+        'matrix': matrix.tolist(),
+        'cells': result_cells,
+    }
@@ -0,0 +1,131 @@
+# core/authentication.py
+"""
+Autentikasi JWT tanpa query user per request.
+
+Token dari /api/token/ membawa klaim peran (is_admin, is_petugas). Untuk
+request API, user dibangun dari klaim tersebut sebagai TokenUser; field lain
+(nama, foto, dst.) baru dimuat dari database jika view membutuhkannya.
+
+Karena tabel user tidak dicek lagi, user yang dinonaktifkan, dihapus, diganti
+perannya atau passwordnya dicatat di tabel TokenRevocation selama umur access
+token: token yang terbit (klaim iat, resolusi detik) sebelum detik pencabutan
+ditolak dan client harus refresh (refresh selalu membaca ulang user dari
+database). Setiap proses menyimpan salinan tabel itu di memori dan memuatnya
+ulang tiap REVOCATION_REFRESH_SECONDS, sehingga request biasa tetap tanpa
+query dan pencabutan dari proses lain berlaku paling lambat setelah interval itu.
+
+TokenUser tidak menulis balik status aktif & peran dari klaim; view yang
+mengubah user sebaiknya tetap memuat User asli dari database.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User, TokenUser, TokenRevocation
+
+ROLE_CLAIMS = ('is_admin', 'is_petugas')
+
+# Perubahan field ini membuat token yang sudah terbit tidak berlaku
+ACCESS_FIELDS = ('is_active', 'is_admin', 'is_petugas', 'password')
+
+LAST_LOGIN_INTERVAL = timedelta(minutes=15)
+
+# Jeda maksimum sebelum pencabutan dari proses lain terlihat di proses ini
+REVOCATION_REFRESH_SECONDS = 5
+
+
+def add_role_claims(token, user):
+    for claim in ROLE_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+class RevocationList:
+    """
+    {user_id: detik pencabutan (epoch)} dari TokenRevocation yang masih berlaku.
+    Kunci berupa string, sama seperti klaim user_id di token.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revoked = {}
+        self._loaded_at = None
+
+    def reset(self):
+        with self._lock:
+            self._revoked = {}
+            self._loaded_at = None
+
+    def add(self, user_id, revoked_at):
+        with self._lock:
+            self._revoked[str(user_id)] = revoked_at
+
+    def get(self, user_id):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at >= REVOCATION_REFRESH_SECONDS:
+            self._reload()
+        return self._revoked.get(str(user_id))
+
+    def _reload(self):
+        started = time.monotonic()
+        since = timezone.now() - api_settings.ACCESS_TOKEN_LIFETIME
+        rows = TokenRevocation.objects.filter(revoked_at__gte=since).values_list('user_id', 'revoked_at')
+        revoked = {str(user_id): int(revoked_at.timestamp()) for user_id, revoked_at in rows}
+        with self._lock:
+            # Pencabutan lokal yang tercatat selama query tetap dipakai
+            for user_id, revoked_at in self._revoked.items():
+                if revoked_at >= since.timestamp() and revoked_at > revoked.get(user_id, 0):
+                    revoked[user_id] = revoked_at
+            self._revoked = revoked
+            self._loaded_at = started
+
+
+revocations = RevocationList()
+
+
+def revoke_user_tokens(user_id):
+    # Dibulatkan ke detik seperti klaim iat: token yang terbit pada detik yang sama
+    # (login/refresh tepat setelah pencabutan) tetap berlaku
+    now = timezone.now().replace(microsecond=0)
+    TokenRevocation.objects.update_or_create(user_id=user_id, defaults={'revoked_at': now})
+    # Cukup selama umur access token; token yang lebih tua sudah kedaluwarsa sendiri
+    TokenRevocation.objects.filter(revoked_at__lt=now - api_settings.ACCESS_TOKEN_LIFETIME).delete()
+    revocations.add(user_id, int(now.timestamp()))
+
+
+def is_token_revoked(token):
+    revoked_at = revocations.get(token[api_settings.USER_ID_CLAIM])
+    return revoked_at is not None and token.get('iat', 0) < revoked_at
+
+
+def token_user(token):
+    """TokenUser dari klaim; hanya id, status aktif dan peran yang terisi."""
+    names = ['id', 'is_active', *ROLE_CLAIMS]
+    values = [token[api_settings.USER_ID_CLAIM], True, *(token[claim] for claim in ROLE_CLAIMS)]
+    return TokenUser.from_db('default', names, values)
+
+
+class RoleClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token or any(
+            claim not in validated_token for claim in ROLE_CLAIMS
+        ):
+            # Token lama tanpa klaim peran: cara biasa (ambil dari database)
+            return super().get_user(validated_token)
+
+        if is_token_revoked(validated_token):
+            raise AuthenticationFailed("Token tidak berlaku lagi, silakan refresh.", code='token_revoked')
+        return token_user(validated_token)
+
+
+def record_login(user, now=None):
+    """Pengganti UPDATE_LAST_LOGIN: last_login cukup diperbarui sesekali, tanpa save() penuh."""
+    now = now or timezone.now()
+    if user.last_login is None or now - user.last_login >= LAST_LOGIN_INTERVAL:
+        User.objects.filter(pk=user.pk).update(last_login=now)
+        user.last_login = now
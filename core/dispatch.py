@@ -0,0 +1,54 @@
+# core/dispatch.py
+"""
+Pencarian petugas dan laporan terdekat untuk penanganan alarm darurat.
+Lihat geo.py untuk prefilter geohash + haversine.
+"""
+from datetime import timedelta
+
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .geo import nearest, within_radius
+from .models import Presensi, Laporan
+
+NEARBY_OFFICER_LIMIT = 5
+NEARBY_LAPORAN_LIMIT = 20
+
+# Radius pencarian petugas diperlebar bertahap sampai cukup kandidat
+INITIAL_RADIUS_KM = 1.0
+MAX_RADIUS_KM = 50.0
+LAPORAN_RADIUS_KM = 2.0
+
+# Hanya posisi presensi yang masih relevan
+CHECKIN_WINDOW = timedelta(hours=24)
+LAPORAN_WINDOW = timedelta(days=7)
+
+
+def latest_checkins(since, exclude_petugas=None):
+    """Presensi terakhir tiap petugas aktif sejak `since` (yang dibatalkan admin tidak dihitung)."""
+    newer = Presensi.objects.filter(petugas=OuterRef('petugas'), timestamp__gt=OuterRef('timestamp'))
+    queryset = (
+        Presensi.objects.select_related('petugas')
+        .filter(timestamp__gte=since, petugas__is_active=True)
+        .exclude(status_validasi='tidak_hadir')
+        .filter(~Exists(newer))
+    )
+    if exclude_petugas is not None:
+        queryset = queryset.exclude(petugas=exclude_petugas)
+    return queryset
+
+
+def nearest_officers(latitude, longitude, limit=NEARBY_OFFICER_LIMIT, since=None,
+                     exclude_petugas=None, max_radius_km=MAX_RADIUS_KM):
+    """Mengembalikan (list (distance_km, presensi), radius_km terakhir)."""
+    since = since or timezone.now() - CHECKIN_WINDOW
+    return nearest(
+        latest_checkins(since, exclude_petugas), latitude, longitude,
+        limit, INITIAL_RADIUS_KM, max_radius_km
+    )
+
+
+def laporan_nearby(latitude, longitude, radius_km=LAPORAN_RADIUS_KM, since=None, limit=NEARBY_LAPORAN_LIMIT):
+    since = since or timezone.now() - LAPORAN_WINDOW
+    queryset = Laporan.objects.select_related('petugas').filter(timestamp__gte=since)
+    return within_radius(queryset, latitude, longitude, radius_km, limit=limit)
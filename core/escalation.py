@@ -0,0 +1,292 @@
+# core/escalation.py
+"""
+Eskalasi alarm darurat yang belum ditanggapi.
+
+Setiap alarm aktif menyimpan tenggat langkah berikutnya di
+`next_escalation_at`. Scheduler (`manage.py run_alarm_escalation`) memegang
+antrean prioritas (heap) berisi (tenggat, alarm_id) dan hanya membaca baris
+alarm yang tenggatnya sudah lewat; alarm baru diambil dengan `pk > terakhir`,
+dan seluruh alarm aktif dimuat ulang lewat index (status, next_escalation_at)
+tiap RESYNC_INTERVAL untuk menangkap perubahan dari proses lain. Tidak ada
+scan tabel alarm per tick.
+
+Langkah diatur lewat setting (detik sejak alarm dipicu):
+
+    ALARM_ESCALATION_STEPS = [(120, 'renotify'), (300, 'raise_severity'), (600, 'page_supervisors')]
+    ALARM_EXPIRE_AFTER = 4 * 3600
+
+Alarm yang sudah di-acknowledge admin tidak dieskalasi lagi, tetapi tetap
+kedaluwarsa (status 'expired') jika tidak diselesaikan sampai ALARM_EXPIRE_AFTER.
+Waktu diambil dari objek clock; test memakai FakeClock.
+"""
+import heapq
+import logging
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .alarm_stream import publish_alarm_change
+from .models import EmergencyAlarm, NotificationJob
+from .notifications import alarm_message
+from .stats import invalidate_dashboard_stats
+
+logger = logging.getLogger(__name__)
+
+ALARM_ESCALATED = 'alarm_escalated'
+ALARM_PAGE = 'alarm_page'
+
+DEFAULT_STEPS = [(120, 'renotify'), (300, 'raise_severity'), (600, 'page_supervisors')]
+DEFAULT_EXPIRE_AFTER = 4 * 3600
+RESYNC_INTERVAL = timedelta(minutes=5)
+
+SEVERITY_ORDER = [value for value, _label in EmergencyAlarm.SEVERITY_CHOICES]
+
+EscalationStep = namedtuple('EscalationStep', ['after', 'action'])
+
+
+class SystemClock:
+    def now(self):
+        return timezone.now()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class FakeClock:
+    """Clock untuk test: waktu hanya maju lewat advance()/sleep()."""
+
+    def __init__(self, start=None):
+        self.current = start or timezone.now()
+
+    def now(self):
+        return self.current
+
+    def advance(self, **kwargs):
+        self.current += timedelta(**kwargs)
+
+    def sleep(self, seconds):
+        self.current += timedelta(seconds=seconds)
+
+
+# ============================================
+# KEBIJAKAN
+# ============================================
+
+def escalation_policy():
+    """(langkah urut waktu, batas kedaluwarsa) dari setting."""
+    steps = []
+    for after, action in getattr(settings, 'ALARM_ESCALATION_STEPS', DEFAULT_STEPS):
+        if action not in ACTIONS:
+            raise ImproperlyConfigured(f"Aksi eskalasi tidak dikenal: {action!r}")
+        steps.append(EscalationStep(timedelta(seconds=after), action))
+    steps.sort(key=lambda step: step.after)
+    expire_after = timedelta(seconds=getattr(settings, 'ALARM_EXPIRE_AFTER', DEFAULT_EXPIRE_AFTER))
+    return steps, expire_after
+
+
+def escalation_deadline(alarm, policy=None):
+    """Tenggat berikutnya untuk state alarm saat ini; None jika tidak perlu dipantau."""
+    if alarm.status != 'active':
+        return None
+    steps, expire_after = policy or escalation_policy()
+    expire_at = alarm.timestamp + expire_after
+    if alarm.acknowledged_at is None and alarm.escalation_level < len(steps):
+        return min(alarm.timestamp + steps[alarm.escalation_level].after, expire_at)
+    return expire_at
+
+
+def initial_deadline(now=None):
+    """Tenggat alarm yang baru dipicu (timestamp belum ada sebelum disimpan)."""
+    steps, expire_after = escalation_policy()
+    return (now or timezone.now()) + (steps[0].after if steps else expire_after)
+
+
+def acknowledge_alarm(alarm, user, now=None):
+    """Hentikan eskalasi; alarm tetap kedaluwarsa jika tidak diselesaikan."""
+    alarm.acknowledged_at = now or timezone.now()
+    alarm.acknowledged_by = user
+    alarm.next_escalation_at = escalation_deadline(alarm)
+
+
+# ============================================
+# AKSI
+# ============================================
+
+def _escalation_message(alarm, title):
+    message = alarm_message(alarm)
+    message['title'] = f"{title}: {alarm.get_category_display()}"
+    message['data'].update(type=ALARM_ESCALATED, severity=alarm.severity, level=alarm.escalation_level)
+    return message
+
+
+def renotify(alarm):
+    NotificationJob.objects.create(
+        kind=ALARM_ESCALATED, alarm=alarm,
+        payload={'message': _escalation_message(alarm, "ALARM BELUM DITANGANI")},
+    )
+
+
+def raise_severity(alarm):
+    index = SEVERITY_ORDER.index(alarm.severity) if alarm.severity in SEVERITY_ORDER else 0
+    alarm.severity = SEVERITY_ORDER[min(index + 1, len(SEVERITY_ORDER) - 1)]
+    EmergencyAlarm.objects.filter(pk=alarm.pk).update(severity=alarm.severity)
+
+
+def page_supervisors(alarm):
+    # Hanya perangkat admin (lihat recipient_tokens)
+    NotificationJob.objects.create(
+        kind=ALARM_PAGE, alarm=alarm,
+        payload={'message': _escalation_message(alarm, "ESKALASI ALARM"), 'audience': 'admin'},
+    )
+
+
+ACTIONS = {
+    'renotify': renotify,
+    'raise_severity': raise_severity,
+    'page_supervisors': page_supervisors,
+}
+
+
+# ============================================
+# SCHEDULER
+# ============================================
+
+class EscalationScheduler:
+    def __init__(self, clock=None, policy=None):
+        self.clock = clock or SystemClock()
+        self.policy = policy or escalation_policy()
+        self._heap = []
+        # alarm_id -> tenggat yang berlaku; entri heap lain untuk alarm itu diabaikan
+        self._deadlines = {}
+        self._last_id = 0
+        self._synced_at = None
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def schedule(self, alarm_id, deadline):
+        if deadline is None:
+            self._deadlines.pop(alarm_id, None)
+            return
+        if self._deadlines.get(alarm_id) != deadline:
+            self._deadlines[alarm_id] = deadline
+            heapq.heappush(self._heap, (deadline, alarm_id))
+
+    def next_deadline(self):
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def sync(self):
+        """Muat ulang semua alarm aktif yang punya tenggat (lewat index)."""
+        # Dibaca lebih dulu: alarm yang dibuat selama sync tetap terambil pull_new()
+        last_id = EmergencyAlarm.objects.aggregate(last=Max('pk'))['last'] or 0
+        rows = EmergencyAlarm.objects.filter(
+            status='active', next_escalation_at__isnull=False
+        ).values_list('pk', 'next_escalation_at')
+        self._heap, self._deadlines = [], {}
+        for pk, deadline in rows:
+            self.schedule(pk, deadline)
+        self._last_id = max(self._last_id, last_id)
+        self._synced_at = self.clock.now()
+
+    def pull_new(self):
+        """Alarm yang dibuat proses lain sejak pemeriksaan terakhir."""
+        rows = EmergencyAlarm.objects.filter(pk__gt=self._last_id).values_list(
+            'pk', 'status', 'next_escalation_at'
+        ).order_by('pk')
+        for pk, status, deadline in rows:
+            self._last_id = pk
+            if status == 'active':
+                self.schedule(pk, deadline)
+
+    def tick(self):
+        """Proses semua tenggat yang sudah lewat; kembalikan jumlah langkah yang dijalankan."""
+        now = self.clock.now()
+        if self._synced_at is None or now - self._synced_at >= RESYNC_INTERVAL:
+            self.sync()
+        else:
+            self.pull_new()
+
+        applied = 0
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None or deadline > now:
+                break
+            _, pk = heapq.heappop(self._heap)
+            del self._deadlines[pk]
+            if self.escalate(pk, now):
+                applied += 1
+        return applied
+
+    def escalate(self, pk, now):
+        alarm = EmergencyAlarm.objects.select_related('petugas').filter(pk=pk).first()
+        if alarm is None or alarm.status != 'active':
+            return False
+        if alarm.next_escalation_at is None or alarm.next_escalation_at > now:
+            # Diubah proses lain (mis. acknowledge): ikuti tenggat di database
+            self.schedule(pk, alarm.next_escalation_at)
+            return False
+
+        steps, expire_after = self.policy
+        previous = {'escalation_level': alarm.escalation_level, 'next_escalation_at': alarm.next_escalation_at}
+        if now >= alarm.timestamp + expire_after:
+            action = 'expire'
+            alarm.status = 'expired'
+            alarm.resolved_at = now
+        elif alarm.acknowledged_at is None and alarm.escalation_level < len(steps):
+            action = steps[alarm.escalation_level].action
+            alarm.escalation_level += 1
+            alarm.escalated_at = now
+        else:
+            # Kebijakan berubah sejak tenggat dihitung
+            action = None
+        alarm.next_escalation_at = escalation_deadline(alarm, self.policy)
+
+        with transaction.atomic():
+            # UPDATE bersyarat: aman jika ada lebih dari satu scheduler
+            updated = EmergencyAlarm.objects.filter(pk=pk, status='active', **previous).update(
+                status=alarm.status, resolved_at=alarm.resolved_at, escalation_level=alarm.escalation_level,
+                escalated_at=alarm.escalated_at, next_escalation_at=alarm.next_escalation_at,
+            )
+            if updated and action:
+                if action in ACTIONS:
+                    ACTIONS[action](alarm)
+                # queryset.update() tanpa signal: statistik dashboard (active_alarms) diinvalidasi
+                # sendiri; event stream lewat tabel AlarmEvent sampai ke proses web
+                invalidate_dashboard_stats()
+                publish_alarm_change(alarm, 'expired' if action == 'expire' else 'escalated')
+
+        if not updated:
+            alarm.refresh_from_db(fields=['status', 'next_escalation_at'])
+            self.schedule(pk, alarm.next_escalation_at if alarm.status == 'active' else None)
+            return False
+        self.schedule(pk, alarm.next_escalation_at)
+        if action:
+            logger.info("Alarm %s: %s (level %s)", pk, action, alarm.escalation_level)
+        return bool(action)
+
+    def run(self, poll_interval=5.0, stop=None):
+        """Loop worker: tidur sampai tenggat terdekat, paling lama poll_interval."""
+        while not (stop and stop()):
+            try:
+                self.tick()
+            except Exception:
+                # Mis. database sempat tidak tersedia: catat, muat ulang jadwal dari
+                # database pada tick berikutnya (entri yang sudah di-pop tidak hilang)
+                logger.exception("Tick eskalasi alarm gagal")
+                self._synced_at = None
+                # Koneksi yang rusak ditutup agar dibuka ulang (tidak di dalam transaksi luar)
+                if not connection.in_atomic_block:
+                    close_old_connections()
+            wait = poll_interval
+            deadline = self.next_deadline()
+            if deadline is not None:
+                wait = min(wait, max((deadline - self.clock.now()).total_seconds(), 0))
+            self.clock.sleep(wait)
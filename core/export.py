@@ -0,0 +1,276 @@
+# core/export.py
+"""
+Export riwayat Presensi/Laporan/Alarm ke CSV atau XLSX secara streaming.
+
+Baris diambil dengan values_list().iterator(chunk_size) tanpa JOIN (nama
+petugas/pos diambil sekali ke dict kecil), lalu ditulis per potongan ke
+StreamingHttpResponse. Memori tetap konstan berapa pun rentang tanggalnya.
+"""
+import csv
+import io
+import re
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import User, Presensi, Laporan, EmergencyAlarm, PostLocation
+from .rekap import day_bounds
+
+CHUNK_SIZE = 2000
+
+# Jumlah baris yang dikumpulkan sebelum dikirim ke client
+ROWS_PER_WRITE = 500
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+class ExportError(Exception):
+    pass
+
+
+def _petugas_lookup():
+    return {pk: (name, email) for pk, name, email in User.objects.values_list('pk', 'first_name', 'email')}
+
+
+def _local_formatter():
+    # Zona waktu diambil sekali per export; timezone.localtime() per baris relatif mahal
+    tz = timezone.get_current_timezone()
+
+    def fmt(value):
+        return value.astimezone(tz).replace(tzinfo=None).isoformat(sep=' ', timespec='seconds') if value else ''
+    return fmt
+
+
+def _media(path):
+    return f'{settings.MEDIA_URL}{path}' if path else ''
+
+
+def _presensi_rows(queryset):
+    petugas = _petugas_lookup()
+    _local = _local_formatter()
+    posts = dict(PostLocation.objects.values_list('pk', 'name'))
+    rows = queryset.values_list(
+        'pk', 'timestamp', 'petugas_id', 'latitude', 'longitude', 'location_note', 'note',
+        'status_validasi', 'post_location_id', 'selfie_photo'
+    )
+    for pk, ts, petugas_id, lat, lon, location_note, note, status, post_id, photo in rows.iterator(chunk_size=CHUNK_SIZE):
+        name, email = petugas.get(petugas_id, ('', ''))
+        yield [pk, _local(ts), name, email, lat, lon, location_note, note, status, posts.get(post_id, ''), _media(photo)]
+
+
+def _laporan_rows(queryset):
+    petugas = _petugas_lookup()
+    _local = _local_formatter()
+    rows = queryset.values_list(
+        'pk', 'timestamp', 'petugas_id', 'latitude', 'longitude', 'location_note', 'note',
+        'status', 'priority', 'photo'
+    )
+    for pk, ts, petugas_id, lat, lon, location_note, note, status, priority, photo in rows.iterator(chunk_size=CHUNK_SIZE):
+        name, email = petugas.get(petugas_id, ('', ''))
+        yield [pk, _local(ts), name, email, lat, lon, location_note, note, status, priority, _media(photo)]
+
+
+def _alarm_rows(queryset):
+    petugas = _petugas_lookup()
+    _local = _local_formatter()
+    rows = queryset.values_list(
+        'pk', 'timestamp', 'petugas_id', 'category', 'description', 'latitude', 'longitude',
+        'status', 'resolved_at', 'resolved_by_id'
+    )
+    for pk, ts, petugas_id, category, description, lat, lon, status, resolved_at, resolved_by in rows.iterator(chunk_size=CHUNK_SIZE):
+        name, email = petugas.get(petugas_id, ('', ''))
+        yield [
+            pk, _local(ts), name, email, category, description or '', lat, lon, status,
+            _local(resolved_at), petugas.get(resolved_by, ('', ''))[1],
+        ]
+
+
+# kind -> (model, field status, header, generator baris)
+EXPORTS = {
+    'presensi': (Presensi, 'status_validasi', [
+        'ID', 'Waktu', 'Petugas', 'Email', 'Latitude', 'Longitude', 'Lokasi', 'Catatan',
+        'Status Validasi', 'Pos Jaga', 'Foto',
+    ], _presensi_rows),
+    'laporan': (Laporan, 'status', [
+        'ID', 'Waktu', 'Petugas', 'Email', 'Latitude', 'Longitude', 'Lokasi', 'Catatan',
+        'Status', 'Prioritas', 'Foto',
+    ], _laporan_rows),
+    'alarm': (EmergencyAlarm, 'status', [
+        'ID', 'Waktu', 'Petugas', 'Email', 'Kategori', 'Deskripsi', 'Latitude', 'Longitude',
+        'Status', 'Diselesaikan', 'Diselesaikan Oleh',
+    ], _alarm_rows),
+}
+
+
+def build_queryset(kind, params):
+    """Queryset terurut kronologis dari parameter `start`, `end` (YYYY-MM-DD) atau `date`, dan `status`."""
+    model, status_field, _, _ = EXPORTS[kind]
+    queryset = model.objects.order_by('timestamp', 'pk')
+
+    start_str = params.get('start') or params.get('date')
+    end_str = params.get('end') or params.get('date')
+    try:
+        # parse_date: None jika formatnya salah, ValueError jika tanggalnya mustahil (2024-02-30)
+        start_date = parse_date(start_str) if start_str else None
+        end_date = parse_date(end_str) if end_str else None
+    except ValueError:
+        start_date = end_date = None
+    if (start_str and not start_date) or (end_str and not end_date):
+        raise ExportError("Format tanggal salah. Gunakan YYYY-MM-DD")
+    if start_date and end_date and end_date < start_date:
+        raise ExportError("Tanggal akhir tidak boleh sebelum tanggal awal.")
+    if start_date:
+        queryset = queryset.filter(timestamp__gte=day_bounds(start_date)[0])
+    if end_date:
+        queryset = queryset.filter(timestamp__lt=day_bounds(end_date)[1])
+
+    status = params.get('status')
+    if status and status != 'all':
+        valid = [choice for choice, _ in model._meta.get_field(status_field).choices]
+        if status not in valid:
+            raise ExportError(f"Status harus salah satu dari: {', '.join(valid)}")
+        queryset = queryset.filter(**{status_field: status})
+
+    return queryset, start_date, end_date
+
+
+# Teks dari petugas yang diawali karakter ini dieksekusi Excel sebagai formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def stream_csv(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM agar Excel membaca UTF-8 dengan benar
+    buffer.write('\ufeff')
+    writer.writerow(header)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([
+            "'" + value if value.__class__ is str and value.startswith(FORMULA_PREFIXES) else value
+            for value in row
+        ])
+        if count % ROWS_PER_WRITE == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+class _ChunkSink:
+    """Tujuan tulis zipfile yang tidak bisa seek; isinya diambil per potongan."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+# Karakter kontrol tidak boleh ada di XML
+_ILLEGAL_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_ILLEGAL_XML.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def stream_xlsx(header, rows, sheet_name='Data'):
+    """XLSX minimal (satu sheet, inline string) ditulis langsung ke zip streaming."""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_name)}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        yield sink.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _xlsx_row(header)
+            ).encode('utf-8'))
+            batch = []
+            for row in rows:
+                batch.append(_xlsx_row(row))
+                if len(batch) >= ROWS_PER_WRITE:
+                    sheet.write(''.join(batch).encode('utf-8'))
+                    batch = []
+                    yield sink.drain()
+            sheet.write((''.join(batch) + '</sheetData></worksheet>').encode('utf-8'))
+    yield sink.drain()
+
+
+def export_response(kind, file_format, params):
+    """StreamingHttpResponse untuk `kind` (presensi/laporan/alarm) dan format csv/xlsx."""
+    if kind not in EXPORTS or file_format not in CONTENT_TYPES:
+        raise ExportError("Export tidak dikenal. Gunakan presensi/laporan/alarm dengan format csv atau xlsx.")
+
+    queryset, start_date, end_date = build_queryset(kind, params)
+    _, _, header, row_generator = EXPORTS[kind]
+    rows = row_generator(queryset)
+
+    if file_format == 'csv':
+        content = stream_csv(header, rows)
+    else:
+        content = stream_xlsx(header, rows, sheet_name=kind.title())
+
+    period = '_'.join(d.isoformat() for d in (start_date, end_date) if d) or 'semua'
+    if start_date and start_date == end_date:
+        period = start_date.isoformat()
+    response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[file_format])
+    response['Content-Disposition'] = f'attachment; filename="{kind}_{period}.{file_format}"'
+    response['Cache-Control'] = 'no-store'
+    return response
@@ -0,0 +1,224 @@
+# core/geo.py
+"""
+Indeks spasial ringan tanpa PostGIS: koordinat disimpan juga sebagai geohash
+(kolom ber-index). Pencarian radius = prefilter range geohash yang menutupi
+bounding box, lalu disaring dengan jarak haversine di Python.
+"""
+import math
+from decimal import Decimal
+
+from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Substr
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+EARTH_RADIUS_KM = 6371.0088
+STORED_PRECISION = 9  # ~5 m
+
+# Batas jumlah sel prefilter; makin kecil presisi, makin besar sel
+MAX_COVER_CELLS = 16
+
+
+def encode(latitude, longitude, precision=STORED_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, interval = (longitude, lon_range) if even else (latitude, lat_range)
+        mid = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def decode(cell):
+    """Titik tengah (latitude, longitude) sel geohash."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in cell:
+        value = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            mid = (interval[0] + interval[1]) / 2
+            if (value >> shift) & 1:
+                interval[0] = mid
+            else:
+                interval[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+
+def cell_size(precision):
+    """(tinggi derajat lintang, lebar derajat bujur) satu sel geohash."""
+    lat_bits = (5 * precision) // 2
+    lon_bits = 5 * precision - lat_bits
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, map(float, (lat1, lon1, lat2, lon2)))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    latitude, longitude = float(latitude), float(longitude)
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    dlon = min(180.0, math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)))
+    return (
+        max(-90.0, latitude - dlat), max(-180.0, longitude - dlon),
+        min(90.0, latitude + dlat), min(180.0, longitude + dlon),
+    )
+
+
+def cover_cells(latitude, longitude, radius_km):
+    """Prefix geohash (presisi seragam) yang bersama-sama menutupi bounding box radius."""
+    south, west, north, east = bounding_box(latitude, longitude, radius_km)
+
+    for precision in range(STORED_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = math.floor(north / height) - math.floor(south / height) + 1
+        cols = math.floor(east / width) - math.floor(west / width) + 1
+        if rows * cols <= MAX_COVER_CELLS:
+            break
+    return box_cells(south, west, north, east, precision)
+
+
+def box_cells(south, west, north, east, precision):
+    """Semua sel geohash berpresisi `precision` yang beririsan dengan kotak."""
+    height, width = cell_size(precision)
+    rows = math.floor(north / height) - math.floor(south / height) + 1
+    cols = math.floor(east / width) - math.floor(west / width) + 1
+
+    cells = set()
+    for row in range(rows):
+        lat = min(north, south + row * height)
+        for col in range(cols):
+            lon = min(east, west + col * width)
+            cells.add(encode(lat, lon, precision))
+        cells.add(encode(lat, east, precision))
+    for col in range(cols):
+        cells.add(encode(north, min(east, west + col * width), precision))
+    cells.add(encode(north, east, precision))
+    return sorted(cells)
+
+
+def geohash_range_filter(cells, field='geohash'):
+    """Q berupa gabungan range `[prefix, prefix + '~')` agar index geohash terpakai."""
+    condition = Q()
+    for prefix in cells:
+        condition |= Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + '~'})
+    return condition
+
+
+def _sorted_candidates(queryset, latitude, longitude, radius_km, field, use_index):
+    """List (distance_km, pk) terurut; hanya kolom koordinat yang diambil."""
+    cells = cover_cells(latitude, longitude, radius_km)
+    if use_index:
+        candidates = queryset.filter(geohash_range_filter(cells, field))
+    else:
+        candidates = queryset.annotate(
+            geohash_cell=Substr(field, 1, len(cells[0]))
+        ).filter(geohash_cell__in=cells)
+
+    # Sel geohash bisa jauh lebih besar dari radius; bbox memangkas baris di SQL
+    south, west, north, east = (Decimal(f'{value:.6f}') for value in bounding_box(latitude, longitude, radius_km))
+    step = Decimal('0.000001')
+    candidates = candidates.filter(
+        latitude__range=(south - step, north + step),
+        longitude__range=(west - step, east + step),
+    )
+
+    found = []
+    for pk, lat, lon in candidates.order_by().values_list('pk', 'latitude', 'longitude'):
+        distance = haversine_km(latitude, longitude, lat, lon)
+        if distance <= radius_km:
+            found.append((distance, pk))
+    found.sort()
+    return found
+
+
+def _load(queryset, found):
+    objects = queryset.in_bulk([pk for _, pk in found])
+    return [(distance, objects[pk]) for distance, pk in found if pk in objects]
+
+
+def within_radius(queryset, latitude, longitude, radius_km, limit=None, field='geohash', use_index=True):
+    """
+    Prefilter queryset dengan geohash + bounding box lalu saring dengan haversine.
+    Mengembalikan list (distance_km, obj) terurut dari yang terdekat; hanya
+    `limit` objek teratas yang dimuat penuh (termasuk select_related).
+
+    Sel dicocokkan sebagai range pada index geohash; untuk queryset yang juga
+    dibatasi waktu, index komposit (geohash, timestamp) menyaring baris lama
+    tanpa membaca tabel. `use_index=False` mencocokkan sel lewat substr(geohash)
+    (scan dari index lain) dan hanya dipakai sebagai pembanding benchmark.
+    """
+    found = _sorted_candidates(queryset, latitude, longitude, radius_km, field, use_index)
+    return _load(queryset, found[:limit] if limit else found)
+
+
+def nearest(queryset, latitude, longitude, limit, initial_radius_km, max_radius_km, field='geohash', use_index=True):
+    """
+    `limit` objek terdekat; radius diperlebar dua kali lipat sampai cukup.
+    Jika radius r sudah memuat `limit` kandidat, semua baris di luar r pasti
+    lebih jauh, sehingga hasilnya sama dengan mengurutkan seluruh data.
+    Mengembalikan (list (distance_km, obj), radius terakhir).
+    """
+    radius = min(initial_radius_km, max_radius_km)
+    while True:
+        found = _sorted_candidates(queryset, latitude, longitude, radius, field, use_index)
+        if len(found) >= limit or radius >= max_radius_km:
+            return _load(queryset, found[:limit]), radius
+        radius = min(radius * 2, max_radius_km)
+
+
+class GeohashField(models.CharField):
+    """Geohash yang dihitung otomatis dari field latitude/longitude saat disimpan (termasuk bulk_create)."""
+
+    def __init__(self, *args, latitude_field='latitude', longitude_field='longitude', **kwargs):
+        self.latitude_field = latitude_field
+        self.longitude_field = longitude_field
+        kwargs.setdefault('max_length', STORED_PRECISION)
+        kwargs.setdefault('editable', False)
+        kwargs.setdefault('blank', True)
+        kwargs.setdefault('null', True)
+        kwargs.setdefault('db_index', True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.latitude_field != 'latitude':
+            kwargs['latitude_field'] = self.latitude_field
+        if self.longitude_field != 'longitude':
+            kwargs['longitude_field'] = self.longitude_field
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        latitude = getattr(model_instance, self.latitude_field)
+        longitude = getattr(model_instance, self.longitude_field)
+        value = None
+        if latitude is not None and longitude is not None:
+            value = encode(latitude, longitude, self.max_length)
+        setattr(model_instance, self.attname, value)
+        return value
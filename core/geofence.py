@@ -0,0 +1,206 @@
+# core/geofence.py
+"""
+Validasi otomatis lokasi presensi terhadap pos jaga (PostLocation).
+
+Semua pos aktif dimuat sekali ke memori dan diindeks per sel geohash, sehingga
+klasifikasi satu presensi hanya berupa lookup dict + cek beberapa geofence,
+tanpa query. Versi index diturunkan dari database (jumlah & updated_at pos,
+jumlah & id terakhir penugasan) sehingga perubahan dari proses mana pun
+terlihat; versi itu di-cache FENCE_VERSION_TTL detik dan dibuang langsung oleh
+proses yang mengubah pos/penugasan (lihat signals.py).
+"""
+import threading
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+
+from .geo import bounding_box, box_cells, encode, haversine_km
+from .models import PostLocation, Presensi
+
+VERSION_KEY = 'geofence:version'
+# Paling lama selisih ini sebelum proses lain memakai pos/penugasan terbaru
+FENCE_VERSION_TTL = 5
+
+# ~1.2 x 0.6 km per sel; geofence pos biasanya hanya menyentuh 1-4 sel
+INDEX_PRECISION = 6
+
+
+def fence_version():
+    """Tanda tangan isi PostLocation + penugasan, langsung dari database."""
+    posts = PostLocation.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+    links = PostLocation.petugas.through.objects.aggregate(count=Count('id'), last=Max('id'))
+    updated = posts['updated'].timestamp() if posts['updated'] else 0
+    return f"{posts['count']}-{updated}-{links['count']}-{links['last']}"
+
+
+def get_fence_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = fence_version()
+        cache.set(VERSION_KEY, version, FENCE_VERSION_TTL)
+    return version
+
+
+def bump_fence_version():
+    cache.delete(VERSION_KEY)
+
+
+def invalidate_fence_index():
+    # Langsung (proses ini melihat perubahan dalam transaksi) dan sekali lagi setelah
+    # commit, agar index yang sempat dibangun dari data belum commit ikut dibuang
+    bump_fence_version()
+    transaction.on_commit(bump_fence_version)
+
+
+class Fence:
+    __slots__ = ('pk', 'latitude', 'longitude', 'radius_km', 'polygon', 'bbox')
+
+    def __init__(self, pk, latitude, longitude, radius_m=None, polygon=None):
+        self.pk = pk
+        self.latitude = float(latitude)
+        self.longitude = float(longitude)
+        self.polygon = [(float(lat), float(lon)) for lat, lon in polygon] if polygon else None
+        self.radius_km = (radius_m or 0) / 1000
+
+        if self.polygon:
+            lats = [lat for lat, _ in self.polygon]
+            lons = [lon for _, lon in self.polygon]
+            self.bbox = (min(lats), min(lons), max(lats), max(lons))
+        else:
+            self.bbox = bounding_box(self.latitude, self.longitude, self.radius_km)
+
+    def contains(self, latitude, longitude):
+        south, west, north, east = self.bbox
+        if not (south <= latitude <= north and west <= longitude <= east):
+            return False
+        if self.polygon:
+            return _point_in_polygon(latitude, longitude, self.polygon)
+        return haversine_km(self.latitude, self.longitude, latitude, longitude) <= self.radius_km
+
+
+def _point_in_polygon(latitude, longitude, polygon):
+    """Ray casting pada bidang lat/lon (cukup akurat untuk area sebesar pos jaga)."""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lon_i = polygon[i]
+        lat_j, lon_j = polygon[j]
+        if (lat_i > latitude) != (lat_j > latitude):
+            cross = lon_i + (latitude - lat_i) * (lon_j - lon_i) / (lat_j - lat_i)
+            if longitude < cross:
+                inside = not inside
+        j = i
+    return inside
+
+
+class FenceIndex:
+    def __init__(self, fences, assignments, version=None):
+        self.version = version
+        self.fences = {fence.pk: fence for fence in fences}
+        # petugas_id -> set id pos yang ditugaskan
+        self.assignments = assignments
+        self.cells = {}
+        for fence in fences:
+            for cell in box_cells(*fence.bbox, INDEX_PRECISION):
+                self.cells.setdefault(cell, []).append(fence)
+
+    @classmethod
+    def load(cls, version=None):
+        posts = PostLocation.objects.filter(is_active=True).values_list(
+            'pk', 'latitude', 'longitude', 'radius_m', 'polygon'
+        )
+        fences = [Fence(*post) for post in posts]
+
+        assignments = {}
+        through = PostLocation.petugas.through.objects.filter(postlocation__is_active=True)
+        for post_id, user_id in through.values_list('postlocation_id', 'user_id'):
+            assignments.setdefault(user_id, set()).add(post_id)
+        return cls(fences, assignments, version)
+
+    def matching(self, latitude, longitude):
+        latitude, longitude = float(latitude), float(longitude)
+        candidates = self.cells.get(encode(latitude, longitude, INDEX_PRECISION), ())
+        return [fence for fence in candidates if fence.contains(latitude, longitude)]
+
+    def classify(self, petugas_id, latitude, longitude):
+        """
+        (status_validasi, id pos) untuk satu titik presensi, atau None jika belum
+        ada pos aktif sama sekali (status dibiarkan seperti semula).
+        Petugas yang punya penugasan hanya dianggap hadir di pos tugasnya.
+        """
+        if not self.fences:
+            return None
+        matches = self.matching(latitude, longitude)
+        assigned = self.assignments.get(petugas_id)
+        if assigned:
+            matches = [fence for fence in matches if fence.pk in assigned]
+        if not matches:
+            return 'diluar_lokasi', None
+        nearest = min(
+            matches, key=lambda fence: haversine_km(fence.latitude, fence.longitude, latitude, longitude)
+        )
+        return 'hadir', nearest.pk
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_fence_index():
+    global _index
+    version = get_fence_version()
+    index = _index
+    if index is None or index.version != version:
+        with _index_lock:
+            if _index is None or _index.version != version:
+                _index = FenceIndex.load(version)
+            index = _index
+    return index
+
+
+def apply_geofence(presensi, index=None):
+    """Isi status_validasi & post_location presensi baru sebelum disimpan."""
+    result = (index or get_fence_index()).classify(presensi.petugas_id, presensi.latitude, presensi.longitude)
+    if result is not None:
+        presensi.status_validasi, presensi.post_location_id = result
+    return presensi
+
+
+def reevaluate_presensi(start_date=None, end_date=None, chunk_size=2000):
+    """
+    Klasifikasi ulang presensi historis (misalnya setelah geofence diubah).
+    Presensi yang dibatalkan atau sudah divalidasi manual oleh admin tidak disentuh.
+    Mengembalikan (jumlah diperiksa, jumlah berubah, set tanggal yang berubah).
+    """
+    from .rekap import day_bounds, local_date
+
+    index = FenceIndex.load()
+    queryset = Presensi.objects.filter(validasi_manual=False).exclude(status_validasi='tidak_hadir')
+    if start_date:
+        queryset = queryset.filter(timestamp__gte=day_bounds(start_date)[0])
+    if end_date:
+        queryset = queryset.filter(timestamp__lt=day_bounds(end_date)[1])
+    queryset = queryset.only(
+        'pk', 'petugas', 'timestamp', 'latitude', 'longitude', 'status_validasi', 'post_location'
+    ).order_by('pk')
+
+    checked = changed_count = 0
+    changed = []
+    changed_dates = set()
+    for presensi in queryset.iterator(chunk_size=chunk_size):
+        checked += 1
+        before = (presensi.status_validasi, presensi.post_location_id)
+        # Tanpa pos aktif sama sekali, hasil otomatis sebelumnya dikembalikan ke hadir
+        result = index.classify(presensi.petugas_id, presensi.latitude, presensi.longitude) or ('hadir', None)
+        if result != before:
+            presensi.status_validasi, presensi.post_location_id = result
+            changed.append(presensi)
+            changed_dates.add(local_date(presensi.timestamp))
+        if len(changed) >= chunk_size:
+            Presensi.objects.bulk_update(changed, ['status_validasi', 'post_location'])
+            changed_count += len(changed)
+            changed = []
+    Presensi.objects.bulk_update(changed, ['status_validasi', 'post_location'])
+    changed_count += len(changed)
+    return checked, changed_count, changed_dates
@@ -0,0 +1,118 @@
+# core/images.py
+"""
+Pemrosesan foto upload: buang EXIF (termasuk GPS), batasi dimensi, kompres
+ulang gambar utama dan buat thumbnail WebP untuk halaman list & API.
+
+Diproses di thread pool setelah transaksi commit, sehingga request upload
+tidak menunggu Pillow. Set IMAGE_PROCESSING_ASYNC = False untuk memproses
+langsung (dipakai di test).
+"""
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .storage import release_file
+
+logger = logging.getLogger(__name__)
+
+MAX_DIMENSION = 1600
+MAIN_QUALITY = 82
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_QUALITY = 75
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2),
+            thread_name_prefix='image-worker'
+        )
+    return _executor
+
+
+def render_derivatives(source):
+    """Kembalikan (bytes JPEG utama, bytes thumbnail WebP) dari file gambar."""
+    with Image.open(source) as image:
+        # Terapkan orientasi EXIF sebelum metadata dibuang
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        image.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.LANCZOS)
+        main = io.BytesIO()
+        image.save(main, format='JPEG', quality=MAIN_QUALITY, optimize=True, progressive=True)
+
+        image.thumbnail(THUMBNAIL_SIZE, Image.LANCZOS)
+        thumb = io.BytesIO()
+        image.save(thumb, format='WEBP', quality=THUMBNAIL_QUALITY, method=4)
+
+    return main.getvalue(), thumb.getvalue()
+
+
+def process_image(model_label, pk, field_name, thumb_field_name):
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return
+
+    storage = field_file.storage
+    old_name = field_file.name
+    with storage.open(old_name, 'rb') as source:
+        main_bytes, thumb_bytes = render_derivatives(source)
+
+    # Simpan gambar utama hasil kompres (selalu .jpg) lalu lepas file mentah
+    stem = os.path.splitext(os.path.basename(old_name))[0]
+    new_name = storage.save(
+        field_file.field.generate_filename(instance, f'{stem}.jpg'),
+        ContentFile(main_bytes)
+    )
+    if new_name != old_name:
+        release_file(instance, field_name, old_name)
+
+    thumb_file = getattr(instance, thumb_field_name)
+    if thumb_file:
+        release_file(instance, thumb_field_name)
+    thumb_file.save(f'thumb_{stem}.webp', ContentFile(thumb_bytes), save=False)
+
+    # update_fields agar tidak menimpa perubahan lain (mis. status) yang terjadi bersamaan
+    field_file.name = new_name
+    instance.save(update_fields=[field_name, thumb_field_name])
+
+
+def _run_job(*args):
+    try:
+        process_image(*args)
+    except Exception:
+        logger.exception("Gagal memproses gambar %s", args)
+    finally:
+        close_old_connections()
+
+
+def schedule_image_processing(instance, field_name, thumb_field_name):
+    """Jadwalkan pemrosesan foto `instance.<field_name>` setelah commit."""
+    if not getattr(instance, field_name):
+        return
+
+    args = (instance._meta.label, instance.pk, field_name, thumb_field_name)
+
+    def submit():
+        if getattr(settings, 'IMAGE_PROCESSING_ASYNC', True):
+            get_executor().submit(_run_job, *args)
+        else:
+            process_image(*args)
+
+    transaction.on_commit(submit)
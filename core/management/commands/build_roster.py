@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core.roster import build_roster
+
+
+class Command(BaseCommand):
+    help = "Bangun ulang index petugas terjadwal (RosterEntry/RosterDay), default hari ini + 14 hari ke depan."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="Tanggal awal (YYYY-MM-DD), default hari ini.")
+        parser.add_argument('--days', type=int, default=15, help="Jumlah hari mulai --start.")
+
+    def handle(self, *args, **options):
+        try:
+            start_date = parse_date(options['start']) if options['start'] else timezone.localdate()
+        except ValueError:
+            start_date = None
+        if start_date is None:
+            raise CommandError("Format tanggal --start salah. Gunakan YYYY-MM-DD")
+        if options['days'] < 1:
+            raise CommandError("--days minimal 1")
+
+        end_date = start_date + timedelta(days=options['days'])
+        entries = build_roster(start_date, end_date)
+        self.stdout.write(self.style.SUCCESS(
+            f"Roster {start_date} s/d {end_date - timedelta(days=1)}: {entries} petugas terjadwal."
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.roster import import_roster, parse_roster_csv, RosterImportError
+
+
+class Command(BaseCommand):
+    help = "Import jadwal shift dari CSV (kolom email,shift,hari,mulai,sampai)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--replace', action='store_true', help="Akhiri jadwal lama petugas yang diimport.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as handle:
+                created = import_roster(parse_roster_csv(handle.read()), replace=options['replace'])
+        except OSError as exc:
+            raise CommandError(str(exc))
+        except RosterImportError as exc:
+            raise CommandError('\n'.join([str(exc), *exc.errors]))
+        self.stdout.write(self.style.SUCCESS(f"{created} jadwal shift diimport."))
@@ -0,0 +1,97 @@
+import os
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import User, Presensi, Laporan
+from core.storage import is_content_addressed
+
+# (model, field) yang menyimpan file media
+MEDIA_FIELDS = [
+    (User, 'profile_picture'),
+    (User, 'profile_thumbnail'),
+    (Presensi, 'selfie_photo'),
+    (Presensi, 'selfie_thumbnail'),
+    (Laporan, 'photo'),
+    (Laporan, 'photo_thumbnail'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Pindahkan file media lama (nama dari client, folder datar/per email) ke "
+        "penyimpanan berbasis hash isi dan perbarui path di database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Hanya hitung file yang akan dipindahkan.")
+        parser.add_argument('--keep-old', action='store_true', help="Jangan hapus file lama setelah dipindahkan.")
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        # nama lama -> nama baru; file yang sama dipakai beberapa baris hanya disalin sekali
+        moved = {}
+        missing = rows = 0
+
+        for model, field_name in MEDIA_FIELDS:
+            field = model._meta.get_field(field_name)
+            queryset = (
+                model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+                .only('pk', field_name).order_by('pk')
+            )
+            pending = []
+            for instance in queryset.iterator(chunk_size=options['chunk_size']):
+                old_name = getattr(instance, field_name).name
+                if is_content_addressed(old_name):
+                    continue
+                if old_name not in moved:
+                    if not field.storage.exists(old_name):
+                        missing += 1
+                        self.stderr.write(f"File tidak ditemukan: {old_name} ({model.__name__} #{instance.pk})")
+                        continue
+                    if options['dry_run']:
+                        moved[old_name] = None
+                    else:
+                        with field.storage.open(old_name, 'rb') as source:
+                            target = field.generate_filename(instance, os.path.basename(old_name))
+                            moved[old_name] = field.storage.save(target, source, max_length=field.max_length)
+                rows += 1
+                if not options['dry_run']:
+                    setattr(instance, field_name, moved[old_name])
+                    pending.append(instance)
+                if len(pending) >= options['chunk_size']:
+                    self.flush(model, field_name, pending)
+                    pending = []
+            self.flush(model, field_name, pending)
+
+        if not options['dry_run'] and not options['keep_old']:
+            self.remove_old_files(moved)
+
+        verb = "akan dipindahkan" if options['dry_run'] else "dipindahkan"
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(moved)} file {verb} ({rows} baris), {missing} file tidak ditemukan."
+        ))
+
+    def flush(self, model, field_name, instances):
+        if instances:
+            # bulk_update: tanpa signal dan tanpa memicu pemrosesan foto ulang
+            with transaction.atomic():
+                model.objects.bulk_update(instances, [field_name])
+
+    def remove_old_files(self, moved):
+        storage = default_storage
+        directories = set()
+        for old_name, new_name in moved.items():
+            if new_name and new_name != old_name:
+                storage.delete(old_name)
+                directories.add(os.path.dirname(storage.path(old_name)))
+        # Folder lama (mis. user_<email>/) yang sudah kosong ikut dibersihkan
+        root = os.path.abspath(storage.location)
+        for directory in sorted(directories, key=len, reverse=True):
+            while os.path.abspath(directory) != root:
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+                directory = os.path.dirname(directory)
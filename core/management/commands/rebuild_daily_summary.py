@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core.rekap import rebuild_daily_summaries
+
+
+class Command(BaseCommand):
+    help = "Hitung ulang DailyAttendanceSummary dari data Presensi/Laporan/Alarm untuk rentang tanggal."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="Tanggal awal (YYYY-MM-DD), default hari ini.")
+        parser.add_argument('--end', help="Tanggal akhir (YYYY-MM-DD), default sama dengan --start.")
+
+    def parse(self, value, label):
+        parsed = parse_date(value)
+        if not parsed:
+            raise CommandError(f"Format tanggal {label} salah. Gunakan YYYY-MM-DD")
+        return parsed
+
+    def handle(self, *args, **options):
+        start_date = self.parse(options['start'], '--start') if options['start'] else timezone.localdate()
+        end_date = self.parse(options['end'], '--end') if options['end'] else start_date
+
+        if end_date < start_date:
+            raise CommandError("--end tidak boleh sebelum --start")
+
+        summaries = rebuild_daily_summaries(start_date, end_date)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(summaries)} ringkasan harian dibangun ulang ({start_date} s/d {end_date})."
+        ))
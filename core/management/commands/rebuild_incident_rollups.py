@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core.analytics import build_rollups, chunked
+
+
+class Command(BaseCommand):
+    help = "Hitung ulang rollup heatmap insiden per hari (default 365 hari terakhir, tanpa hari ini)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="Tanggal awal YYYY-MM-DD.")
+        parser.add_argument('--end', help="Tanggal akhir YYYY-MM-DD (inklusif, paling lambat kemarin).")
+        parser.add_argument('--days', type=int, default=365)
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        try:
+            end = parse_date(options['end']) if options['end'] else today - timedelta(days=1)
+            start = parse_date(options['start']) if options['start'] else end - timedelta(days=options['days'] - 1)
+        except ValueError:
+            end = start = None
+        if start is None or end is None:
+            raise CommandError("Format tanggal harus YYYY-MM-DD.")
+        end = min(end, today - timedelta(days=1))
+
+        rows = 0
+        for chunk_start, chunk_end in chunked(start, end + timedelta(days=1)):
+            rows += build_rollups(chunk_start, chunk_end)
+        self.stdout.write(self.style.SUCCESS(f"Rollup {start} s/d {end}: {rows} baris."))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core.geofence import reevaluate_presensi
+from core.rekap import invalidate_monthly_rekap, rebuild_daily_summaries
+from core.stats import invalidate_dashboard_stats
+
+
+class Command(BaseCommand):
+    help = "Klasifikasi ulang status_validasi presensi terhadap geofence pos jaga (setelah pos diubah)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="Tanggal awal (YYYY-MM-DD), default seluruh riwayat.")
+        parser.add_argument('--end', help="Tanggal akhir (YYYY-MM-DD), default sampai data terbaru.")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def parse(self, value, label):
+        parsed = parse_date(value)
+        if not parsed:
+            raise CommandError(f"Format tanggal {label} salah. Gunakan YYYY-MM-DD")
+        return parsed
+
+    def handle(self, *args, **options):
+        start_date = self.parse(options['start'], '--start') if options['start'] else None
+        end_date = self.parse(options['end'], '--end') if options['end'] else None
+
+        if start_date and end_date and end_date < start_date:
+            raise CommandError("--end tidak boleh sebelum --start")
+
+        checked, changed, dates = reevaluate_presensi(start_date, end_date, options['chunk_size'])
+
+        # bulk_update tidak mengirim signal: ringkasan harian & cache dashboard diperbarui manual
+        if dates:
+            rebuild_daily_summaries(min(dates), max(dates))
+            invalidate_dashboard_stats()
+            for month in {day.replace(day=1) for day in dates}:
+                invalidate_monthly_rekap(month)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{checked} presensi diperiksa, {changed} status berubah."
+        ))
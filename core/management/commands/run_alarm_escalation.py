@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core.escalation import EscalationScheduler
+
+
+class Command(BaseCommand):
+    help = (
+        "Scheduler eskalasi alarm yang belum ditanggapi (kirim ulang, naikkan tingkat, "
+        "panggil supervisor, kedaluwarsa). Cukup satu proses."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Proses tenggat yang sudah lewat lalu berhenti.")
+        parser.add_argument('--poll-interval', type=float, default=5.0, help="Jeda maksimum (detik) antar pemeriksaan alarm baru.")
+
+    def handle(self, *args, **options):
+        scheduler = EscalationScheduler()
+        if options['once']:
+            applied = scheduler.tick()
+            self.stdout.write(self.style.SUCCESS(f"{applied} langkah eskalasi dijalankan."))
+            return
+        try:
+            scheduler.run(poll_interval=options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
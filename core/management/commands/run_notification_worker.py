@@ -0,0 +1,45 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from core.notifications import get_transport, run_pending_jobs
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Worker antrean push notification alarm. Boleh dijalankan di beberapa proses sekaligus."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Proses job yang siap lalu berhenti.")
+        # Berbeda dari NOTIFICATION_BATCH_SIZE (jumlah token per kiriman transport)
+        parser.add_argument('--claim-limit', type=int, default=10, help="Jumlah job yang diklaim per putaran.")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Jeda (detik) saat antrean kosong.")
+        parser.add_argument('--max-jobs', type=int, default=0, help="Berhenti setelah sekian job (0 = tanpa batas).")
+
+    def handle(self, *args, **options):
+        transport = get_transport()
+        processed = 0
+        try:
+            while True:
+                try:
+                    count = run_pending_jobs(transport, limit=options['claim_limit'])
+                except Exception:
+                    # Mis. database sempat tidak tersedia: catat lalu coba lagi setelah jeda
+                    logger.exception("Putaran worker notifikasi gagal")
+                    count = 0
+                    if not connection.in_atomic_block:
+                        close_old_connections()
+                processed += count
+                if options['max_jobs'] and processed >= options['max_jobs']:
+                    break
+                if not count:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"{processed} job notifikasi diproses."))
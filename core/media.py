@@ -0,0 +1,144 @@
+# core/media.py
+"""
+Penyajian file media (selfie, foto laporan, foto profil) dengan cek hak akses.
+
+Admin boleh membuka semua file; petugas hanya file miliknya sendiri (dicek ke
+baris Presensi/Laporan/User pemiliknya). Pengiriman isi file diserahkan ke web
+server di depan Django jika dikonfigurasi:
+
+    MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'   # nginx: location internal
+    MEDIA_X_SENDFILE = True                             # Apache mod_xsendfile / lighttpd
+
+Tanpa proxy, file dikirim dengan FileResponse yang mendukung Range (206) dan
+conditional GET (ETag/Last-Modified -> 304).
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from .models import User, Presensi, Laporan
+from .storage import is_content_addressed
+
+# Awalan path -> (model, field file, field pemilik)
+OWNERS = [
+    ('presensi_photos/', Presensi, ('selfie_photo', 'selfie_thumbnail'), 'petugas'),
+    ('laporan_photos/', Laporan, ('photo', 'photo_thumbnail'), 'petugas'),
+    ('profile_pictures/', User, ('profile_picture', 'profile_thumbnail'), 'pk'),
+    # Foto profil lama sebelum migrate_media_storage
+    ('user_', User, ('profile_picture', 'profile_thumbnail'), 'pk'),
+]
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_CHUNK = 64 * 1024
+
+
+def can_access(user, name):
+    if user.is_admin:
+        return True
+    for prefix, model, fields, owner_field in OWNERS:
+        if name.startswith(prefix):
+            match = Q()
+            for field in fields:
+                match |= Q(**{field: name})
+            # Filter pemilik dulu: memakai index (petugas, timestamp) / primary key
+            return model.objects.filter(match, **{owner_field: user.pk}).exists()
+    return False
+
+
+def _etag(stat):
+    return f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+
+def _range(header, size):
+    """(start, end) inklusif dari satu byte range, None jika diabaikan, False jika tidak valid."""
+    match = RANGE_RE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None  # multi-range / sintaks lain: kirim file utuh
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(size - int(last), 0), size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        while length > 0:
+            chunk = handle.read(min(STREAM_CHUNK, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_media(request, name):
+    name = name.lstrip('/')
+    try:
+        path = default_storage.path(name)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(path) or not can_access(request.user, name):
+        # Sama-sama 404 agar keberadaan file orang lain tidak bocor
+        raise Http404
+
+    stat = os.stat(path)
+    etag, last_modified = _etag(stat), int(stat.st_mtime)
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    # Nama berbasis hash: isi tidak pernah berubah untuk URL yang sama
+    cache_control = 'private, max-age=31536000, immutable' if is_content_addressed(name) else 'private, max-age=3600'
+
+    def finish(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = cache_control
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return finish(not_modified)
+
+    accel_prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', None)
+    if accel_prefix or getattr(settings, 'MEDIA_X_SENDFILE', False):
+        # Web server yang mengirim isi file (termasuk Range) tanpa menahan worker Django
+        response = HttpResponse(content_type=content_type)
+        if accel_prefix:
+            response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(name)
+        else:
+            response['X-Sendfile'] = path
+        return finish(response)
+
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and if_range and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+        range_header = None  # file sudah berubah sejak potongan sebelumnya: kirim utuh
+
+    byte_range = _range(range_header, stat.st_size) if range_header else None
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return finish(response)
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(path, start, end - start + 1), status=206, content_type=content_type
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        return finish(response)
+
+    return finish(FileResponse(open(path, 'rb'), content_type=content_type))
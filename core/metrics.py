@@ -0,0 +1,284 @@
+# core/metrics.py
+"""
+Instrumentasi per request: jumlah query, waktu DB, waktu serializer (objek ->
+dict, lewat SerializationTimingMixin), waktu render (dict -> bytes oleh renderer)
+dan latensi total, dikelompokkan per nama URL (mis. `presensi-list`).
+
+Disimpan di memori proses (jendela bergulir per endpoint untuk persentil) dan
+diekspos dalam format teks Prometheus di /api/admin/metrics/. Query yang lebih
+lambat dari REQUEST_METRICS_SLOW_QUERY_MS dicatat ke log beserta baris kode
+asalnya, begitu juga request dengan jumlah query berlebihan (indikasi N+1).
+"""
+import logging
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 1000
+DEFAULT_SLOW_QUERY_MS = 100
+DEFAULT_MAX_QUERIES = 50
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Frame di luar kode proyek (Django, DRF, stdlib) dilewati saat mencari asal query
+_PROJECT_ROOT = str(settings.BASE_DIR)
+_SKIP_PATHS = ('site-packages', 'dist-packages', os.path.abspath(__file__))
+
+
+def query_origin():
+    """'file.py:baris di fungsi' terdalam milik proyek yang memicu query."""
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(_PROJECT_ROOT) and not any(p in frame.filename for p in _SKIP_PATHS):
+            return f"{os.path.relpath(frame.filename, _PROJECT_ROOT)}:{frame.lineno} di {frame.name}"
+    return 'tidak diketahui'
+
+
+class EndpointStats:
+    __slots__ = (
+        'count', 'errors', 'latency_sum', 'db_sum', 'serialize_sum', 'render_sum', 'queries_sum',
+        'latencies', 'queries',
+    )
+
+    def __init__(self, window):
+        self.count = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+        self.db_sum = 0.0
+        self.serialize_sum = 0.0
+        self.render_sum = 0.0
+        self.queries_sum = 0
+        self.latencies = deque(maxlen=window)
+        self.queries = deque(maxlen=window)
+
+
+def _quantile(sorted_values, q):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def record(self, view, status_code, latency, db_time, serialize_time, render_time, query_count):
+        window = getattr(settings, 'REQUEST_METRICS_WINDOW', DEFAULT_WINDOW)
+        with self._lock:
+            stats = self._stats.get(view)
+            if stats is None:
+                stats = self._stats[view] = EndpointStats(window)
+            stats.count += 1
+            stats.errors += status_code >= 500
+            stats.latency_sum += latency
+            stats.db_sum += db_time
+            stats.serialize_sum += serialize_time
+            stats.render_sum += render_time
+            stats.queries_sum += query_count
+            stats.latencies.append(latency)
+            stats.queries.append(query_count)
+
+    def snapshot(self):
+        """{view: dict ringkasan + persentil} dari jendela terakhir tiap endpoint."""
+        with self._lock:
+            items = [
+                (view, stats.count, stats.errors, stats.latency_sum, stats.db_sum, stats.serialize_sum,
+                 stats.render_sum, stats.queries_sum, sorted(stats.latencies), sorted(stats.queries))
+                for view, stats in self._stats.items()
+            ]
+        result = {}
+        for view, count, errors, latency_sum, db_sum, serialize_sum, render_sum, queries_sum, latencies, queries in items:
+            result[view] = {
+                'count': count, 'errors': errors, 'latency_sum': latency_sum, 'db_sum': db_sum,
+                'serialize_sum': serialize_sum, 'render_sum': render_sum, 'queries_sum': queries_sum,
+                'latency': {q: _quantile(latencies, q) for q in QUANTILES},
+                'queries': {q: _quantile(queries, q) for q in QUANTILES},
+            }
+        return result
+
+
+registry = MetricsRegistry()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(snapshot=None):
+    snapshot = registry.snapshot() if snapshot is None else snapshot
+    lines = [
+        '# HELP satgas_request_latency_seconds Latensi total request per endpoint.',
+        '# TYPE satgas_request_latency_seconds summary',
+    ]
+    for view, data in sorted(snapshot.items()):
+        for q, value in data['latency'].items():
+            lines.append(f'satgas_request_latency_seconds{{view="{_label(view)}",quantile="{q}"}} {value:.6f}')
+        lines.append(f'satgas_request_latency_seconds_sum{{view="{_label(view)}"}} {data["latency_sum"]:.6f}')
+        lines.append(f'satgas_request_latency_seconds_count{{view="{_label(view)}"}} {data["count"]}')
+
+    lines += [
+        '# HELP satgas_request_queries Jumlah query database per request.',
+        '# TYPE satgas_request_queries summary',
+    ]
+    for view, data in sorted(snapshot.items()):
+        for q, value in data['queries'].items():
+            lines.append(f'satgas_request_queries{{view="{_label(view)}",quantile="{q}"}} {value}')
+        lines.append(f'satgas_request_queries_sum{{view="{_label(view)}"}} {data["queries_sum"]}')
+        lines.append(f'satgas_request_queries_count{{view="{_label(view)}"}} {data["count"]}')
+
+    counters = [
+        ('satgas_request_db_seconds_total', 'Total waktu eksekusi query database.', 'db_sum', '.6f'),
+        ('satgas_request_serialize_seconds_total', 'Total waktu serializer (objek ke dict).', 'serialize_sum', '.6f'),
+        ('satgas_request_render_seconds_total', 'Total waktu renderer response (dict ke bytes).', 'render_sum', '.6f'),
+        ('satgas_request_errors_total', 'Jumlah response 5xx.', 'errors', 'd'),
+    ]
+    for name, help_text, key, fmt in counters:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for view, data in sorted(snapshot.items()):
+            lines.append(f'{name}{{view="{_label(view)}"}} {data[key]:{fmt}}')
+    return '\n'.join(lines) + '\n'
+
+
+class _QueryRecorder:
+    """execute_wrapper: hitung query & waktu DB satu request, log query lambat."""
+
+    def __init__(self, slow_threshold):
+        self.count = 0
+        self.duration = 0.0
+        self.slow_threshold = slow_threshold
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            if elapsed >= self.slow_threshold:
+                logger.warning("Query lambat %.1f ms dari %s: %s", elapsed * 1000, query_origin(), sql[:500])
+
+
+class RequestTiming:
+    """Waktu serializer dan render satu request; diisi hook di luar middleware."""
+    __slots__ = ('serialize', 'render', 'serializing')
+
+    def __init__(self):
+        self.serialize = 0.0
+        self.render = 0.0
+        self.serializing = False
+
+
+# ContextVar ikut disalin ke thread sync_to_async, jadi juga terisi di bawah ASGI
+_current_timing = ContextVar('request_timing', default=None)
+
+
+class SerializationTimingMixin:
+    """
+    Mixin serializer DRF: waktu to_representation dihitung sebagai waktu
+    serializer request, bukan waktu view. Serializer bersarang (dan child
+    list) tidak dihitung dua kali.
+    """
+
+    def to_representation(self, instance):
+        timing = _current_timing.get()
+        if timing is None or timing.serializing:
+            return super().to_representation(instance)
+        timing.serializing = True
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            timing.serialize += time.perf_counter() - start
+            timing.serializing = False
+
+
+class RequestMetricsMiddleware:
+    """
+    Dipasang di awal MIDDLEWARE agar query session/auth ikut terhitung.
+    Untuk StreamingHttpResponse (export, stream alarm) yang terukur hanya
+    sampai header dikirim.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder, timing, token = self._begin(request)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                self._wrap_connections(stack, recorder)
+                response = self.get_response(request)
+        finally:
+            _current_timing.reset(token)
+        return self._finish(request, response, recorder, timing, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        recorder, timing, token = self._begin(request)
+        start = time.perf_counter()
+        # Koneksi database per thread: wrapper dipasang di thread tempat view sync
+        # (dan query-nya) dijalankan, yaitu thread sync_to_async yang sama per request
+        stack = ExitStack()
+        try:
+            await sync_to_async(self._wrap_connections)(stack, recorder)
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            _current_timing.reset(token)
+        return self._finish(request, response, recorder, timing, time.perf_counter() - start)
+
+    def _begin(self, request):
+        recorder = _QueryRecorder(getattr(settings, 'REQUEST_METRICS_SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS) / 1000)
+        timing = request._metrics_timing = RequestTiming()
+        return recorder, timing, _current_timing.set(timing)
+
+    @staticmethod
+    def _wrap_connections(stack, recorder):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+
+    def _finish(self, request, response, recorder, timing, latency):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match.route) if match else '<unresolved>'
+        registry.record(
+            view, response.status_code, latency, recorder.duration, timing.serialize, timing.render, recorder.count
+        )
+
+        max_queries = getattr(settings, 'REQUEST_METRICS_MAX_QUERIES', DEFAULT_MAX_QUERIES)
+        if recorder.count > max_queries:
+            logger.warning(
+                "%s %s (%s) menjalankan %d query (%.1f ms DB)",
+                request.method, request.path, view, recorder.count, recorder.duration * 1000
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        # Response DRF/TemplateResponse dirender setelah hook ini; ukur dengan callback
+        timing = request._metrics_timing
+        started = time.perf_counter()
+
+        def done(rendered):
+            timing.render += time.perf_counter() - started
+        response.add_post_render_callback(done)
+        return response
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_emergencyalarm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('hadir', models.PositiveIntegerField(default=0)),
+                ('tidak_hadir', models.PositiveIntegerField(default=0)),
+                ('diluar_lokasi', models.PositiveIntegerField(default=0)),
+                ('laporan', models.PositiveIntegerField(default=0)),
+                ('laporan_selesai', models.PositiveIntegerField(default=0)),
+                ('alarm', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+    ]
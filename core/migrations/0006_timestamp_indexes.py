@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_dailyattendancesummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emergencyalarm',
+            index=models.Index(fields=['timestamp'], name='alarm_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emergencyalarm',
+            index=models.Index(fields=['petugas', 'timestamp'], name='alarm_petugas_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emergencyalarm',
+            index=models.Index(fields=['status', 'timestamp'], name='alarm_status_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='laporan',
+            index=models.Index(fields=['timestamp'], name='laporan_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='laporan',
+            index=models.Index(fields=['petugas', 'timestamp'], name='laporan_petugas_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='laporan',
+            index=models.Index(fields=['status', 'timestamp'], name='laporan_status_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presensi',
+            index=models.Index(fields=['timestamp'], name='presensi_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presensi',
+            index=models.Index(fields=['petugas', 'timestamp'], name='presensi_petugas_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presensi',
+            index=models.Index(fields=['status_validasi', 'timestamp'], name='presensi_status_ts_idx'),
+        ),
+    ]
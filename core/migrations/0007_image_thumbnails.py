@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:51
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_timestamp_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='laporan',
+            name='photo_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='laporan_photos/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='presensi',
+            name='selfie_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='presensi_photos/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='profile_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to=core.models.user_directory_path),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_image_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='laporan',
+            name='client_id',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='presensi',
+            name='client_id',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='laporan',
+            constraint=models.UniqueConstraint(fields=('petugas', 'client_id'), name='laporan_client_id_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='presensi',
+            constraint=models.UniqueConstraint(fields=('petugas', 'client_id'), name='presensi_client_id_unique'),
+        ),
+    ]
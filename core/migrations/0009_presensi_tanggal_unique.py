@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:53
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def isi_tanggal(apps, schema_editor):
+    """Isi tanggal lokal; jika data lama ganda, hanya presensi terakhir per hari yang diberi tanggal."""
+    Presensi = apps.get_model('core', 'Presensi')
+    terisi = set()
+    batch = []
+    for presensi in Presensi.objects.order_by('-timestamp', '-pk').only('pk', 'petugas_id', 'timestamp').iterator():
+        kunci = (presensi.petugas_id, django.utils.timezone.localtime(presensi.timestamp).date())
+        if kunci in terisi:
+            continue
+        terisi.add(kunci)
+        presensi.tanggal = kunci[1]
+        batch.append(presensi)
+        if len(batch) >= 1000:
+            Presensi.objects.bulk_update(batch, ['tanggal'])
+            batch = []
+    Presensi.objects.bulk_update(batch, ['tanggal'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_client_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='presensi',
+            name='tanggal',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(isi_tanggal, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='presensi',
+            name='tanggal',
+            field=models.DateField(default=django.utils.timezone.localdate, editable=False, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='presensi',
+            constraint=models.UniqueConstraint(fields=('petugas', 'tanggal'), name='presensi_petugas_tanggal_unique'),
+        ),
+    ]
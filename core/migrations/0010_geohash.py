@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:08
+
+import core.geo
+from django.db import migrations
+
+
+def isi_geohash(apps, schema_editor):
+    for model_name in ('Presensi', 'Laporan', 'EmergencyAlarm'):
+        Model = apps.get_model('core', model_name)
+        batch = []
+        for obj in Model.objects.only('pk', 'latitude', 'longitude').iterator():
+            obj.geohash = core.geo.encode(obj.latitude, obj.longitude)
+            batch.append(obj)
+            if len(batch) >= 1000:
+                Model.objects.bulk_update(batch, ['geohash'])
+                batch = []
+        Model.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_presensi_tanggal_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emergencyalarm',
+            name='geohash',
+            field=core.geo.GeohashField(blank=True, db_index=True, editable=False, max_length=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='laporan',
+            name='geohash',
+            field=core.geo.GeohashField(blank=True, db_index=True, editable=False, max_length=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='presensi',
+            name='geohash',
+            field=core.geo.GeohashField(blank=True, db_index=True, editable=False, max_length=9, null=True),
+        ),
+        migrations.RunPython(isi_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_geohash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='presensi',
+            name='validasi_manual',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.CreateModel(
+            name='PostLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('latitude', models.DecimalField(decimal_places=6, help_text='Titik pusat pos.', max_digits=9)),
+                ('longitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('radius_m', models.PositiveIntegerField(blank=True, help_text='Radius geofence (meter). Kosongkan jika memakai poligon.', null=True)),
+                ('polygon', models.JSONField(blank=True, help_text='Daftar titik [[lat, lon], ...] minimal 3 titik.', null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('petugas', models.ManyToManyField(blank=True, related_name='post_locations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='presensi',
+            name='post_location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='presensi_set', to='core.postlocation'),
+        ),
+    ]
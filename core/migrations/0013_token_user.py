@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:34
+
+import core.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_notifications'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenUser',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('core.user',),
+            managers=[
+                ('objects', core.models.UserManager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:47
+
+import core.geo
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_token_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationTrack',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('latitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('longitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('geohash', core.geo.GeohashField(blank=True, db_index=True, editable=False, max_length=9, null=True)),
+                ('accuracy', models.FloatField(blank=True, help_text='Akurasi GPS (meter).', null=True)),
+                ('petugas', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='location_tracks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['petugas', 'timestamp'], name='track_petugas_ts_idx'), models.Index(fields=['timestamp'], name='track_ts_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:40
+
+import core.search
+from django.db import migrations
+
+
+def buat_index(apps, schema_editor):
+    core.search.install_fts(schema_editor.connection)
+
+
+def hapus_index(apps, schema_editor):
+    core.search.drop_fts(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_location_track'),
+    ]
+
+    operations = [
+        migrations.RunPython(buat_index, hapus_index),
+    ]
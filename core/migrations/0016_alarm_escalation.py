@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def jadwalkan_alarm_aktif(apps, schema_editor):
+    # Dievaluasi scheduler pada tick pertama (alarm lama langsung kedaluwarsa)
+    EmergencyAlarm = apps.get_model('core', 'EmergencyAlarm')
+    EmergencyAlarm.objects.filter(status='active').update(next_escalation_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_laporan_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emergencyalarm',
+            name='acknowledged_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='emergencyalarm',
+            name='acknowledged_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alarms_acknowledged', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='emergencyalarm',
+            name='escalated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='emergencyalarm',
+            name='escalation_level',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='emergencyalarm',
+            name='next_escalation_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='emergencyalarm',
+            name='severity',
+            field=models.CharField(choices=[('normal', 'Normal'), ('high', 'Tinggi'), ('critical', 'Kritis')], default='normal', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='emergencyalarm',
+            name='status',
+            field=models.CharField(choices=[('active', 'Active'), ('handled', 'Handled/Resolved'), ('false_alarm', 'False Alarm'), ('expired', 'Expired')], default='active', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='emergencyalarm',
+            index=models.Index(fields=['status', 'next_escalation_at'], name='alarm_status_deadline_idx'),
+        ),
+        migrations.RunPython(jadwalkan_alarm_aktif, migrations.RunPython.noop),
+    ]
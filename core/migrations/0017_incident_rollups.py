@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_alarm_escalation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IncidentRollupDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='IncidentDayRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('category', models.CharField(max_length=50)),
+                ('priority', models.CharField(blank=True, max_length=20)),
+                ('cells', models.BinaryField()),
+                ('total', models.PositiveIntegerField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'category', 'priority'), name='unique_rollup_day_group')],
+            },
+        ),
+    ]
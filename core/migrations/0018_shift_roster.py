@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_incident_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RosterDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('expected', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Shift',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('late_after_minutes', models.PositiveSmallIntegerField(default=15, help_text='Toleransi sebelum presensi dihitung terlambat.')),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='dailyattendancesummary',
+            name='terlambat',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='presensi',
+            name='terlambat_menit',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='RosterEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('starts_at', models.DateTimeField()),
+                ('late_at', models.DateTimeField()),
+                ('petugas', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='roster_entries', to=settings.AUTH_USER_MODEL)),
+                ('shift', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.shift')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'petugas'), name='roster_date_petugas_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ShiftException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('petugas', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shift_exceptions', to=settings.AUTH_USER_MODEL)),
+                ('shift', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.shift')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='shift_exception_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('petugas', 'date'), name='shift_exception_petugas_date_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ShiftSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekdays', models.PositiveSmallIntegerField(default=31)),
+                ('valid_from', models.DateField()),
+                ('valid_until', models.DateField(blank=True, null=True)),
+                ('petugas', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shift_schedules', to=settings.AUTH_USER_MODEL)),
+                ('shift', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedules', to='core.shift')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['valid_from', 'valid_until'], name='schedule_validity_idx')],
+            },
+        ),
+    ]
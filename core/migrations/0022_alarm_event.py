@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_cache_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlarmEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(max_length=20)),
+                ('data', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='alarm_event_created_idx')],
+            },
+        ),
+    ]
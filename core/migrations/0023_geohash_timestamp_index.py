@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_alarm_event'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='laporan',
+            index=models.Index(fields=['geohash', 'timestamp'], name='laporan_geohash_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presensi',
+            index=models.Index(fields=['geohash', 'timestamp'], name='presensi_geohash_ts_idx'),
+        ),
+    ]
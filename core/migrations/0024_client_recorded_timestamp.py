@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:43
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_geohash_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='laporan',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='presensi',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
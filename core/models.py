@@ -1,11 +1,15 @@
 # core/models.py
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 
+from .geo import GeohashField
 
-# Fungsi untuk menentukan lokasi upload foto
+
+# Fungsi untuk menentukan lokasi upload foto profil. Nama akhir ditentukan
+# ContentAddressedStorage (hash isi), jadi tidak perlu folder per user/email.
 def user_directory_path(instance, filename):
-    return 'user_{0}/{1}'.format(instance.email, filename)
+    return 'profile_pictures/{0}'.format(filename)
 
 from django.contrib.auth.base_user import BaseUserManager
 
@@ -42,6 +46,7 @@ class User(AbstractUser):
     email = models.EmailField(unique=True)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     profile_picture = models.ImageField(upload_to=user_directory_path, blank=True, null=True)
+    profile_thumbnail = models.ImageField(upload_to=user_directory_path, blank=True, null=True, editable=False)
 
     is_admin = models.BooleanField(default=False)
     is_petugas = models.BooleanField(default=True)
@@ -55,14 +60,86 @@ class User(AbstractUser):
         return self.email
 
 
+class TokenUser(User):
+    """
+    User dari klaim JWT (lihat authentication.py) tanpa query ke database.
+    Field yang tidak ada di token dimuat sekaligus saat pertama kali diakses.
+    """
+
+    CLAIM_FIELDS = ('is_active', 'is_admin', 'is_petugas')
+
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        deferred = self.get_deferred_fields()
+        if fields and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
+    def save(self, *args, **kwargs):
+        # Status aktif & peran diisi dari klaim token (bisa sudah basi): jangan ditulis balik
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding:
+            update_fields = {f.attname for f in self._meta.concrete_fields} - self.get_deferred_fields() - {'id'}
+        if update_fields is not None:
+            kwargs['update_fields'] = sorted(set(update_fields) - set(self.CLAIM_FIELDS))
+        super().save(*args, **kwargs)
+
+
+class TokenRevocation(models.Model):
+    """
+    Waktu pencabutan token JWT per user (lihat authentication.py). Disimpan di
+    database agar berlaku di semua proses server; baris yang lebih tua dari umur
+    access token tidak berarti lagi dan dibersihkan saat pencabutan berikutnya.
+    """
+    # Bukan FK: user yang dihapus tetap harus tercabut tokennya
+    user_id = models.BigIntegerField(primary_key=True)
+    revoked_at = models.DateTimeField()
+
+
+class PostLocation(models.Model):
+    """Pos jaga: geofence berupa radius dari titik pusat atau poligon [[lat, lon], ...]."""
+    name = models.CharField(max_length=100)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, help_text="Titik pusat pos.")
+    longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    radius_m = models.PositiveIntegerField(blank=True, null=True, help_text="Radius geofence (meter). Kosongkan jika memakai poligon.")
+    polygon = models.JSONField(blank=True, null=True, help_text="Daftar titik [[lat, lon], ...] minimal 3 titik.")
+    is_active = models.BooleanField(default=True)
+
+    # Petugas yang ditugaskan; petugas tanpa penugasan boleh presensi di pos mana pun
+    petugas = models.ManyToManyField(User, blank=True, related_name='post_locations')
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        if self.polygon:
+            if not isinstance(self.polygon, list) or len(self.polygon) < 3 or not all(
+                isinstance(point, (list, tuple)) and len(point) == 2 for point in self.polygon
+            ):
+                raise ValidationError({'polygon': "Poligon harus berupa list minimal 3 titik [lat, lon]."})
+        elif not self.radius_m:
+            raise ValidationError("Isi radius_m atau polygon.")
+
+    def __str__(self):
+        return self.name
+
+
 class Presensi(models.Model):
     petugas = models.ForeignKey(User, on_delete=models.CASCADE, related_name='presensi_set')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Bukan auto_now_add: sinkronisasi offline (core/sync.py) mengisi waktu dari perangkat
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     latitude = models.DecimalField(max_digits=9, decimal_places=6)
     longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    geohash = GeohashField()
     location_note = models.CharField(max_length=255, help_text="Alamat atau nama lokasi presensi.")
     note = models.TextField(help_text="Catatan harian dari petugas (e.g., 'Presensi Harian').")
     selfie_photo = models.ImageField(upload_to='presensi_photos/')
+    selfie_thumbnail = models.ImageField(upload_to='presensi_photos/thumbs/', blank=True, null=True, editable=False)
 
     # Tambahan: Status Verifikasi Admin
     STATUS_PRESENSI_CHOICES = [
@@ -77,8 +154,36 @@ class Presensi(models.Model):
         default='hadir'
     )
 
+    # Tanggal lokal presensi; unik per petugas sehingga presensi ganda ditolak database.
+    # NULL hanya untuk data lama yang sudah terlanjur ganda sebelum constraint ada.
+    tanggal = models.DateField(default=timezone.localdate, null=True, editable=False)
+
+    # Kunci idempotensi dari aplikasi (sinkronisasi offline)
+    client_id = models.CharField(max_length=64, blank=True, null=True, editable=False)
+
+    # Hasil validasi geofence otomatis (lihat geofence.py); validasi_manual = diubah admin,
+    # sehingga tidak ditimpa saat evaluasi ulang
+    post_location = models.ForeignKey(
+        PostLocation, on_delete=models.SET_NULL, null=True, blank=True, related_name='presensi_set'
+    )
+    validasi_manual = models.BooleanField(default=False, editable=False)
+
+    # Menit terlambat dari jam mulai shift (0 = tepat waktu); NULL jika tidak terjadwal
+    terlambat_menit = models.PositiveIntegerField(null=True, blank=True, editable=False)
+
     class Meta:
-        pass
+        # Sesuai pola query: per petugas per hari, filter status, urut -timestamp
+        indexes = [
+            models.Index(fields=['timestamp'], name='presensi_ts_idx'),
+            models.Index(fields=['petugas', 'timestamp'], name='presensi_petugas_ts_idx'),
+            models.Index(fields=['status_validasi', 'timestamp'], name='presensi_status_ts_idx'),
+            # Pencarian radius dibatasi waktu (core/dispatch.py): timestamp disaring di dalam index
+            models.Index(fields=['geohash', 'timestamp'], name='presensi_geohash_ts_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['petugas', 'client_id'], name='presensi_client_id_unique'),
+            models.UniqueConstraint(fields=['petugas', 'tanggal'], name='presensi_petugas_tanggal_unique'),
+        ]
 
     def __str__(self):
         return f"Presensi {self.petugas.first_name} ({self.status_validasi})"
@@ -86,12 +191,14 @@ class Presensi(models.Model):
 
 class Laporan(models.Model):
     petugas = models.ForeignKey(User, on_delete=models.CASCADE, related_name='laporan_set')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     latitude = models.DecimalField(max_digits=9, decimal_places=6)
     longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    geohash = GeohashField()
     location_note = models.CharField(max_length=255, help_text="Alamat atau nama lokasi kejadian.")
     note = models.TextField(help_text="Detail laporan insiden/anomaly.")
     photo = models.ImageField(upload_to='laporan_photos/')
+    photo_thumbnail = models.ImageField(upload_to='laporan_photos/thumbs/', blank=True, null=True, editable=False)
 
     STATUS_CHOICES = [
         ('lapor', 'Lapor'),
@@ -108,6 +215,19 @@ class Laporan(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='lapor')
     priority = models.CharField(max_length=20, choices=PRIORITY_CHOICES, default='medium')
 
+    client_id = models.CharField(max_length=64, blank=True, null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp'], name='laporan_ts_idx'),
+            models.Index(fields=['petugas', 'timestamp'], name='laporan_petugas_ts_idx'),
+            models.Index(fields=['status', 'timestamp'], name='laporan_status_ts_idx'),
+            models.Index(fields=['geohash', 'timestamp'], name='laporan_geohash_ts_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['petugas', 'client_id'], name='laporan_client_id_unique'),
+        ]
+
     def __str__(self):
         return f"Laporan {self.petugas.first_name} - {self.status}"
 
@@ -126,6 +246,13 @@ class EmergencyAlarm(models.Model):
         ('active', 'Active'),
         ('handled', 'Handled/Resolved'),
         ('false_alarm', 'False Alarm'),
+        ('expired', 'Expired'),
+    ]
+
+    SEVERITY_CHOICES = [
+        ('normal', 'Normal'),
+        ('high', 'Tinggi'),
+        ('critical', 'Kritis'),
     ]
 
     petugas = models.ForeignKey(User, on_delete=models.CASCADE, related_name='alarms_triggered')
@@ -135,10 +262,259 @@ class EmergencyAlarm(models.Model):
     
     latitude = models.DecimalField(max_digits=9, decimal_places=6)
     longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    geohash = GeohashField()
     
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     resolved_at = models.DateTimeField(null=True, blank=True)
     resolved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='alarms_resolved')
 
+    # Eskalasi alarm yang belum ditanggapi (core/escalation.py)
+    severity = models.CharField(max_length=20, choices=SEVERITY_CHOICES, default='normal')
+    acknowledged_at = models.DateTimeField(null=True, blank=True)
+    acknowledged_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='alarms_acknowledged')
+    escalation_level = models.PositiveSmallIntegerField(default=0, editable=False)
+    escalated_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Tenggat langkah eskalasi/kedaluwarsa berikutnya; None jika alarm sudah selesai
+    next_escalation_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp'], name='alarm_ts_idx'),
+            models.Index(fields=['petugas', 'timestamp'], name='alarm_petugas_ts_idx'),
+            models.Index(fields=['status', 'timestamp'], name='alarm_status_ts_idx'),
+            models.Index(fields=['status', 'next_escalation_at'], name='alarm_status_deadline_idx'),
+        ]
+
     def __str__(self):
         return f"ALARM: {self.category} by {self.petugas.first_name} at {self.timestamp}"
+
+
+class DailyAttendanceSummary(models.Model):
+    """Ringkasan per hari yang diperbarui inkremental, agar dashboard cukup membaca satu baris."""
+    date = models.DateField(unique=True)
+
+    hadir = models.PositiveIntegerField(default=0)
+    tidak_hadir = models.PositiveIntegerField(default=0)
+    diluar_lokasi = models.PositiveIntegerField(default=0)
+
+    laporan = models.PositiveIntegerField(default=0)
+    laporan_selesai = models.PositiveIntegerField(default=0)
+    alarm = models.PositiveIntegerField(default=0)
+
+    terlambat = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"Ringkasan {self.date}: {self.hadir} hadir, {self.laporan} laporan"
+
+
+class CacheVersion(models.Model):
+    """
+    Penghitung versi bernama untuk kunci cache (mis. statistik dashboard). Disimpan
+    di database agar kenaikan dari worker atau management command mana pun
+    terlihat semua proses, dan tidak hilang saat cache lokal membuang kunci.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveIntegerField(default=0)
+
+
+class MonthlyRekapVersion(models.Model):
+    """
+    Versi data presensi satu bulan lampau (month = tanggal 1); bagian dari kunci
+    cache rekap bulanan sehingga perubahan dari proses mana pun langsung terlihat.
+    """
+    month = models.DateField(unique=True)
+    version = models.PositiveIntegerField(default=0)
+
+
+class Shift(models.Model):
+    """Jam kerja, mis. Pagi 07:00-15:00. end_time <= start_time berarti shift lewat tengah malam."""
+    name = models.CharField(max_length=50, unique=True)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    late_after_minutes = models.PositiveSmallIntegerField(
+        default=15, help_text="Toleransi sebelum presensi dihitung terlambat."
+    )
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.start_time:%H:%M}-{self.end_time:%H:%M})"
+
+
+class ShiftSchedule(models.Model):
+    """Jadwal berulang: petugas masuk `shift` pada hari-hari `weekdays` selama [valid_from, valid_until]."""
+    petugas = models.ForeignKey(User, on_delete=models.CASCADE, related_name='shift_schedules')
+    shift = models.ForeignKey(Shift, on_delete=models.CASCADE, related_name='schedules')
+    # Bitmask hari: bit 0 = Senin ... bit 6 = Minggu
+    weekdays = models.PositiveSmallIntegerField(default=0b0011111)
+    valid_from = models.DateField()
+    valid_until = models.DateField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['valid_from', 'valid_until'], name='schedule_validity_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.petugas.first_name}: {self.shift.name} sejak {self.valid_from}"
+
+
+class ShiftException(models.Model):
+    """Pengecualian satu tanggal: libur/cuti (shift kosong), ganti shift, atau shift tambahan."""
+    petugas = models.ForeignKey(User, on_delete=models.CASCADE, related_name='shift_exceptions')
+    date = models.DateField()
+    shift = models.ForeignKey(Shift, on_delete=models.CASCADE, null=True, blank=True)
+    note = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['petugas', 'date'], name='shift_exception_petugas_date_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='shift_exception_date_idx'),
+        ]
+
+
+class RosterEntry(models.Model):
+    """
+    Index petugas yang dijadwalkan per tanggal, dibangun dari jadwal +
+    pengecualian (core/roster.py). Dibaca lewat (date, petugas) saja.
+    """
+    date = models.DateField()
+    petugas = models.ForeignKey(User, on_delete=models.CASCADE, related_name='roster_entries')
+    shift = models.ForeignKey(Shift, on_delete=models.CASCADE)
+    starts_at = models.DateTimeField()
+    late_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'petugas'], name='roster_date_petugas_unique'),
+        ]
+
+
+class RosterDay(models.Model):
+    """Penanda tanggal yang index RosterEntry-nya sudah dibangun, beserta jumlah petugas terjadwal."""
+    date = models.DateField(unique=True)
+    expected = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+
+class IncidentDayRollup(models.Model):
+    """
+    Jumlah insiden (laporan + alarm) satu hari lokal untuk satu kategori dan
+    prioritas, per sel geohash dan jam; sumber heatmap analitik (core/analytics.py).
+    """
+    date = models.DateField()
+    # Kategori alarm, atau 'laporan'
+    category = models.CharField(max_length=50)
+    # Prioritas laporan; kosong untuk alarm
+    priority = models.CharField(max_length=20, blank=True)
+    # Record NumPy berurutan per sel: geohash 6 byte ASCII + 24 x uint32 LE (jam 0..23)
+    cells = models.BinaryField()
+    total = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'category', 'priority'], name='unique_rollup_day_group'),
+        ]
+
+
+class IncidentRollupDay(models.Model):
+    """Penanda hari yang rollup-nya sudah dihitung (hari tanpa insiden tidak punya baris rollup)."""
+    date = models.DateField(unique=True)
+    computed_at = models.DateTimeField(auto_now=True)
+
+
+class DeviceToken(models.Model):
+    """Token push notification (FCM/APNs) per perangkat; satu user bisa punya banyak perangkat."""
+    PLATFORM_CHOICES = [
+        ('android', 'Android'),
+        ('ios', 'iOS'),
+        ('web', 'Web'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='device_tokens')
+    token = models.CharField(max_length=255, unique=True)
+    platform = models.CharField(max_length=20, choices=PLATFORM_CHOICES, default='android')
+    # Dinonaktifkan otomatis jika transport melaporkan token tidak valid
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_seen_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.email} ({self.platform})"
+
+
+class AlarmEvent(models.Model):
+    """
+    Event perubahan alarm untuk stream SSE (core/alarm_stream.py). Ditulis oleh
+    proses mana pun (web, scheduler eskalasi, command) dan dibaca tiap proses
+    ASGI berdasarkan id, yang sekaligus menjadi Last-Event-ID client.
+    """
+    event_type = models.CharField(max_length=20)
+    data = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='alarm_event_created_idx'),
+        ]
+
+
+class NotificationJob(models.Model):
+    """Antrean notifikasi tahan restart; diproses oleh `manage.py run_notification_worker`."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    alarm = models.ForeignKey(
+        EmergencyAlarm, on_delete=models.CASCADE, null=True, blank=True, related_name='notification_jobs'
+    )
+    # Pesan (title, body, data) dan, untuk percobaan ulang, daftar token yang gagal
+    payload = models.JSONField(default=dict)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    sent_count = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='notifjob_status_avail_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class LocationTrack(models.Model):
+    """Riwayat posisi petugas selama shift (hasil down-sampling ping, ditulis massal oleh tracking.py)."""
+    petugas = models.ForeignKey(User, on_delete=models.CASCADE, related_name='location_tracks')
+    # Waktu posisi direkam perangkat
+    timestamp = models.DateTimeField()
+    latitude = models.DecimalField(max_digits=9, decimal_places=6)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    geohash = GeohashField()
+    accuracy = models.FloatField(blank=True, null=True, help_text="Akurasi GPS (meter).")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['petugas', 'timestamp'], name='track_petugas_ts_idx'),
+            models.Index(fields=['timestamp'], name='track_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"Posisi {self.petugas_id} @ {self.timestamp}"
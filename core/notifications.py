@@ -0,0 +1,230 @@
+# core/notifications.py
+"""
+Push notification alarm lewat antrean di database (outbox).
+
+Request alarm hanya menyisipkan satu NotificationJob dalam transaksi yang sama,
+sehingga waktu responsnya tidak bergantung pada jumlah perangkat. Worker
+(`manage.py run_notification_worker`, boleh lebih dari satu proses) mengklaim
+job, mengambil token penerima, mengirim per batch lewat transport, lalu
+menjadwalkan ulang token yang gagal dengan backoff eksponensial.
+
+Transport dipilih lewat setting NOTIFICATION_TRANSPORT (dotted path kelas
+turunan BaseTransport). FakeTransport dipakai di test.
+"""
+import logging
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import DeviceToken, NotificationJob
+
+logger = logging.getLogger(__name__)
+
+ALARM_CREATED = 'alarm_created'
+
+# Batas multicast FCM adalah 500 token per request
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = timedelta(seconds=30)
+
+# Job yang diklaim worker tetapi tidak selesai sampai batas ini (worker mati) diambil ulang
+LEASE_DURATION = timedelta(minutes=5)
+
+
+@dataclass
+class SendResult:
+    # Token yang ditolak permanen (tidak terdaftar lagi) -> dinonaktifkan
+    invalid: list = field(default_factory=list)
+    # Token yang gagal sementara -> dicoba ulang
+    failed: list = field(default_factory=list)
+
+
+class BaseTransport:
+    def send_batch(self, tokens, message):
+        """Kirim `message` (dict title/body/data) ke `tokens`; kembalikan SendResult."""
+        raise NotImplementedError
+
+
+class LoggingTransport(BaseTransport):
+    """Default untuk development: hanya mencatat ke log."""
+
+    def send_batch(self, tokens, message):
+        logger.info("Push '%s' ke %d perangkat", message.get('title'), len(tokens))
+        return SendResult()
+
+
+class FakeTransport(BaseTransport):
+    """Transport untuk test: menyimpan kiriman di memori, kegagalan bisa diatur."""
+    sent = []
+    fail_tokens = set()
+    invalid_tokens = set()
+
+    @classmethod
+    def reset(cls):
+        cls.sent = []
+        cls.fail_tokens = set()
+        cls.invalid_tokens = set()
+
+    def send_batch(self, tokens, message):
+        self.sent.append((list(tokens), message))
+        return SendResult(
+            invalid=[t for t in tokens if t in self.invalid_tokens],
+            failed=[t for t in tokens if t in self.fail_tokens],
+        )
+
+
+def get_transport():
+    path = getattr(settings, 'NOTIFICATION_TRANSPORT', 'core.notifications.LoggingTransport')
+    return import_string(path)()
+
+
+# ============================================
+# ENQUEUE (dipanggil dari request)
+# ============================================
+
+def alarm_message(alarm):
+    category = alarm.get_category_display()
+    return {
+        'title': f"ALARM DARURAT: {category}",
+        'body': alarm.description or f"{alarm.petugas.first_name} membutuhkan bantuan.",
+        'data': {
+            'type': ALARM_CREATED,
+            'alarm_id': alarm.pk,
+            'category': alarm.category,
+            'latitude': str(alarm.latitude),
+            'longitude': str(alarm.longitude),
+        },
+    }
+
+
+def enqueue_alarm_notification(alarm):
+    """Satu INSERT, dijalankan di dalam transaksi pembuatan alarm."""
+    return NotificationJob.objects.create(
+        kind=ALARM_CREATED, alarm=alarm, payload={'message': alarm_message(alarm)}
+    )
+
+
+# ============================================
+# WORKER
+# ============================================
+
+def max_attempts_setting():
+    return getattr(settings, 'NOTIFICATION_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+
+
+def claim_jobs(limit=10, now=None):
+    """
+    Klaim job yang siap diproses. UPDATE bersyarat per job sehingga beberapa
+    worker bisa berjalan bersamaan tanpa memproses job yang sama (juga di SQLite).
+    """
+    now = now or timezone.now()
+    # Lease habis pada percobaan terakhir (worker mati/macet terus): jangan diklaim lagi
+    NotificationJob.objects.filter(
+        status='processing', locked_until__lt=now, attempts__gte=max_attempts_setting()
+    ).update(status='failed', locked_until=None, last_error="Lease habis pada percobaan terakhir")
+    ready = Q(status='pending', available_at__lte=now) | Q(status='processing', locked_until__lt=now)
+    candidates = NotificationJob.objects.filter(ready).order_by('available_at', 'pk').values_list('pk', 'status')[:limit]
+
+    claimed = []
+    for pk, current_status in candidates:
+        updated = NotificationJob.objects.filter(pk=pk, status=current_status).filter(ready).update(
+            status='processing', locked_until=now + LEASE_DURATION, attempts=F('attempts') + 1
+        )
+        if updated:
+            claimed.append(pk)
+    return list(NotificationJob.objects.filter(pk__in=claimed).select_related('alarm').order_by('available_at', 'pk'))
+
+
+def recipient_tokens(job):
+    tokens = DeviceToken.objects.filter(is_active=True, user__is_active=True)
+    if job.payload.get('audience') == 'admin':
+        # Eskalasi ke supervisor (core/escalation.py)
+        tokens = tokens.filter(user__is_admin=True)
+    if job.alarm_id:
+        # Pemicu alarm tidak perlu menerima notifikasinya sendiri
+        tokens = tokens.exclude(user_id=job.alarm.petugas_id)
+    return list(tokens.order_by('pk').values_list('token', flat=True))
+
+
+def retry_delay(attempts):
+    return RETRY_BASE_DELAY * (2 ** max(attempts - 1, 0))
+
+
+def process_job(job, transport, batch_size=None, max_attempts=None):
+    batch_size = batch_size or getattr(settings, 'NOTIFICATION_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    max_attempts = max_attempts or max_attempts_setting()
+
+    message = job.payload.get('message', {})
+    # Percobaan ulang hanya untuk token yang gagal sebelumnya
+    tokens = job.payload.get('tokens')
+    if tokens is None:
+        tokens = recipient_tokens(job)
+
+    invalid, failed, errors = [], [], []
+    for start in range(0, len(tokens), batch_size):
+        batch = tokens[start:start + batch_size]
+        try:
+            result = transport.send_batch(batch, message)
+        except Exception as exc:
+            logger.warning("Batch notifikasi job %s gagal: %s", job.pk, exc)
+            errors.append(str(exc))
+            failed.extend(batch)
+            continue
+        invalid.extend(result.invalid)
+        failed.extend(result.failed)
+
+    if invalid:
+        DeviceToken.objects.filter(token__in=invalid).update(is_active=False)
+
+    job.sent_count += len(tokens) - len(failed) - len(invalid)
+    job.locked_until = None
+    if not failed:
+        job.status = 'done'
+        job.payload.pop('tokens', None)
+    elif job.attempts < max_attempts:
+        job.status = 'pending'
+        job.available_at = timezone.now() + retry_delay(job.attempts)
+        job.payload['tokens'] = failed
+    else:
+        job.status = 'failed'
+        job.payload['tokens'] = failed
+    job.last_error = '; '.join(errors)[:1000] if errors else (f"{len(failed)} token gagal" if failed else '')
+    job.save(update_fields=['status', 'available_at', 'locked_until', 'payload', 'sent_count', 'last_error', 'updated_at'])
+    return job
+
+
+def run_pending_jobs(transport=None, limit=10, batch_size=None):
+    """Proses satu putaran job yang siap; kembalikan jumlah job yang diproses."""
+    transport = transport or get_transport()
+    jobs = claim_jobs(limit)
+    for job in jobs:
+        try:
+            process_job(job, transport, batch_size=batch_size)
+        except Exception as exc:
+            logger.exception("Job notifikasi %s gagal diproses", job.pk)
+            release_failed_job(job, exc)
+    return len(jobs)
+
+
+def release_failed_job(job, exc, max_attempts=None):
+    """
+    Job yang gagal di luar transport (mis. query penerima) dijadwalkan ulang
+    dengan backoff, atau ditandai gagal setelah percobaan maksimum. Jika
+    penyimpanan ini pun gagal, job diklaim ulang setelah lease habis.
+    """
+    max_attempts = max_attempts or max_attempts_setting()
+    retry = job.attempts < max_attempts
+    try:
+        NotificationJob.objects.filter(pk=job.pk, status='processing').update(
+            status='pending' if retry else 'failed',
+            available_at=timezone.now() + retry_delay(job.attempts) if retry else job.available_at,
+            locked_until=None,
+            last_error=str(exc)[:1000],
+            updated_at=timezone.now(),
+        )
+    except Exception:
+        logger.exception("Status job notifikasi %s gagal disimpan", job.pk)
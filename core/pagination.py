@@ -0,0 +1,79 @@
+# core/pagination.py
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class TimestampCursorPagination(CursorPagination):
+    """
+    Keyset pagination berdasarkan `-timestamp` (lalu `-id`), sehingga biaya tiap
+    halaman tetap O(page_size) berapapun posisinya.
+    """
+    ordering = ('-timestamp', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class PetugasCursorPagination(TimestampCursorPagination):
+    ordering = ('email',)
+
+
+class ShiftScheduleCursorPagination(TimestampCursorPagination):
+    ordering = ('-valid_from', '-id')
+
+
+class ShiftExceptionCursorPagination(TimestampCursorPagination):
+    ordering = ('-date', '-id')
+
+
+class SearchPagination(BasePagination):
+    """
+    Halaman hasil pencarian (urut relevansi, bukan timestamp sehingga cursor
+    tidak bisa dipakai). Tanpa COUNT(*): diambil page_size + 1 baris untuk
+    mengetahui ada halaman berikutnya. Bentuk respons sama dengan cursor.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    page_query_param = 'page'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page = _positive_int(request.query_params.get(self.page_query_param), 1)
+        self.size = min(
+            _positive_int(request.query_params.get(self.page_size_query_param), self.page_size),
+            self.max_page_size,
+        )
+        offset = (self.page - 1) * self.size
+        rows = list(queryset[offset:offset + self.size + 1])
+        self.has_next = len(rows) > self.size
+        return rows[:self.size]
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.page + 1)
+
+    def get_previous_link(self):
+        if self.page <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page - 1)
+
+
+def _positive_int(value, default):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
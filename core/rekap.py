@@ -0,0 +1,329 @@
+# core/rekap.py
+import calendar
+import re
+from datetime import date, datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import User, Presensi, Laporan, EmergencyAlarm, DailyAttendanceSummary, MonthlyRekapVersion
+from .roster import expected_petugas, roster_entries
+
+
+def day_bounds(target_date):
+    """Rentang [awal, akhir) satu hari lokal, agar filter tanggal bisa memakai range biasa."""
+    start = timezone.make_aware(datetime.combine(target_date, time.min))
+    return start, start + timedelta(days=1)
+
+
+def filter_on_date(queryset, target_date, field='timestamp'):
+    """
+    Filter satu tanggal lokal sebagai range `[awal, akhir)` sehingga index pada
+    `field` terpakai (lookup `__date` menerapkan fungsi ke setiap baris).
+    `target_date` boleh berupa string YYYY-MM-DD; string tidak valid diabaikan.
+    """
+    if isinstance(target_date, str):
+        try:
+            target_date = parse_date(target_date)
+        except ValueError:
+            target_date = None
+    if target_date is None:
+        return queryset
+
+    start, end = day_bounds(target_date)
+    return queryset.filter(**{f'{field}__gte': start, f'{field}__lt': end})
+
+
+def rekap_presensi_harian(target_date, petugas_queryset=None):
+    """
+    Ambil petugas yang terjadwal pada `target_date` (semua petugas jika roster
+    belum berlaku) beserta presensi terakhirnya.
+
+    Jumlah query tetap berapapun jumlah petugas: satu query User dengan
+    subquery id presensi terakhir, lalu satu query Presensi untuk id tersebut,
+    ditambah lookup index roster. Hasilnya ditempel ke atribut
+    `presensi_on_date` (None jika belum hadir) dan `roster_entry`.
+    """
+    if petugas_queryset is None:
+        petugas_queryset = User.objects.filter(is_petugas=True).order_by('email')
+
+    scheduled = expected_petugas(target_date)
+    if scheduled is not None:
+        petugas_queryset = petugas_queryset.filter(pk__in=scheduled)
+
+    start, end = day_bounds(target_date)
+    latest_presensi = Presensi.objects.filter(
+        petugas=OuterRef('pk'),
+        timestamp__gte=start,
+        timestamp__lt=end,
+    ).order_by('-timestamp', '-pk').values('pk')[:1]
+
+    petugas_list = list(
+        petugas_queryset.annotate(last_presensi_id=Subquery(latest_presensi))
+    )
+
+    presensi_map = {}
+    # Id sudah didapat dari query User; tidak perlu menjalankan subquery itu lagi
+    presensi_ids = [p.last_presensi_id for p in petugas_list if p.last_presensi_id]
+    if presensi_ids:
+        presensi_map = Presensi.objects.in_bulk(presensi_ids)
+
+    entries = roster_entries(target_date) if scheduled is not None else {}
+    for petugas in petugas_list:
+        presensi = presensi_map.get(petugas.last_presensi_id)
+        if presensi is not None:
+            # Hindari query ulang saat serializer membaca presensi.petugas
+            presensi.petugas = petugas
+        petugas.presensi_on_date = presensi
+        petugas.roster_entry = entries.get(petugas.pk)
+
+    return petugas_list
+
+
+# ============================================
+# RINGKASAN HARIAN (DailyAttendanceSummary)
+# ============================================
+
+def local_date(value):
+    return timezone.localtime(value).date()
+
+
+def _count_by_date(queryset, start, end, group_field=None, distinct_field=None):
+    rows = queryset.filter(timestamp__gte=start, timestamp__lt=end).annotate(
+        hari=TruncDate('timestamp')
+    )
+    fields = ['hari'] + ([group_field] if group_field else [])
+    aggregate = Count(distinct_field, distinct=True) if distinct_field else Count('pk')
+    return rows.values(*fields).annotate(total=aggregate).order_by()
+
+
+def rebuild_daily_summaries(start_date, end_date):
+    """Hitung ulang ringkasan untuk rentang tanggal [start_date, end_date] dari data mentah."""
+    start, _ = day_bounds(start_date)
+    _, end = day_bounds(end_date)
+
+    counts = {}
+
+    def bucket(tanggal):
+        return counts.setdefault(tanggal, {
+            'hadir': 0, 'tidak_hadir': 0, 'diluar_lokasi': 0,
+            'laporan': 0, 'laporan_selesai': 0, 'alarm': 0, 'terlambat': 0,
+        })
+
+    for row in _count_by_date(Presensi.objects.all(), start, end, 'status_validasi', 'petugas'):
+        bucket(row['hari'])[row['status_validasi']] = row['total']
+
+    for row in _count_by_date(Presensi.objects.filter(terlambat_menit__gt=0), start, end, distinct_field='petugas'):
+        bucket(row['hari'])['terlambat'] = row['total']
+
+    for row in _count_by_date(Laporan.objects.all(), start, end, 'status'):
+        data = bucket(row['hari'])
+        data['laporan'] += row['total']
+        if row['status'] == 'selesai':
+            data['laporan_selesai'] = row['total']
+
+    for row in _count_by_date(EmergencyAlarm.objects.all(), start, end):
+        bucket(row['hari'])['alarm'] = row['total']
+
+    summaries = []
+    tanggal = start_date
+    while tanggal <= end_date:
+        summary, _ = DailyAttendanceSummary.objects.update_or_create(
+            date=tanggal, defaults=bucket(tanggal)
+        )
+        summaries.append(summary)
+        tanggal += timedelta(days=1)
+    return summaries
+
+
+def get_daily_summary(target_date=None):
+    """Ambil ringkasan satu tanggal; dibangun dari data mentah jika belum ada."""
+    target_date = target_date or timezone.localdate()
+    summary = DailyAttendanceSummary.objects.filter(date=target_date).first()
+    if summary is None:
+        summary = rebuild_daily_summaries(target_date, target_date)[0]
+    return summary
+
+
+def _apply_summary_delta(target_date, **deltas):
+    updates = {
+        field: Greatest(F(field) + Value(delta), Value(0))
+        for field, delta in deltas.items() if delta
+    }
+    if not updates:
+        return
+    updates['updated_at'] = timezone.now()
+    updated = DailyAttendanceSummary.objects.filter(date=target_date).update(**updates)
+    if not updated:
+        # Baris belum ada: bangun dari data mentah (sudah termasuk perubahan ini)
+        rebuild_daily_summaries(target_date, target_date)
+
+
+def record_presensi_created(presensi):
+    _apply_summary_delta(
+        local_date(presensi.timestamp),
+        **{presensi.status_validasi: 1, 'terlambat': 1 if presensi.terlambat_menit else 0}
+    )
+
+
+def record_presensi_status_change(presensi, old_status):
+    if old_status == presensi.status_validasi:
+        return
+    _apply_summary_delta(
+        local_date(presensi.timestamp),
+        **{old_status: -1, presensi.status_validasi: 1}
+    )
+
+
+def record_laporan_created(laporan):
+    _apply_summary_delta(
+        local_date(laporan.timestamp),
+        laporan=1,
+        laporan_selesai=1 if laporan.status == 'selesai' else 0
+    )
+
+
+def record_laporan_status_change(laporan, old_status):
+    if old_status == laporan.status or 'selesai' not in (old_status, laporan.status):
+        return
+    _apply_summary_delta(
+        local_date(laporan.timestamp),
+        laporan_selesai=1 if laporan.status == 'selesai' else -1
+    )
+
+
+def record_alarm_created(alarm):
+    _apply_summary_delta(local_date(alarm.timestamp), alarm=1)
+
+
+# ============================================
+# REKAP BULANAN (matriks petugas x tanggal)
+# ============================================
+
+STATUS_PRESENSI = ('hadir', 'diluar_lokasi', 'tidak_hadir')
+
+# Bulan yang sudah lewat hampir tidak pernah berubah; perubahan yang jarang
+# terjadi menaikkan versi bulan itu di database sehingga kuncinya berganti
+# di semua proses (lihat invalidate_monthly_rekap)
+CLOSED_MONTH_CACHE_TIMEOUT = 60 * 60 * 24 * 31
+
+
+def parse_month(value):
+    """'YYYY-MM' -> (tahun, bulan), atau None jika format salah."""
+    match = re.fullmatch(r'(\d{4})-(\d{1,2})', value or '')
+    if not match or not 1 <= int(match.group(2)) <= 12:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+def month_bounds(year, month):
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def is_closed_month(year, month):
+    return month_bounds(year, month)[1] < timezone.localdate()
+
+
+def monthly_version(year, month):
+    return MonthlyRekapVersion.objects.filter(month=date(year, month, 1)).values_list(
+        'version', flat=True
+    ).first() or 0
+
+
+def monthly_cache_key(year, month, version):
+    return f'rekap-bulanan:{year}-{month:02d}:v{version}'
+
+
+def _monthly_cells(first, last):
+    """
+    Satu query agregat: (petugas_id, tanggal, status) per sel. Constraint
+    (petugas, tanggal) menjamin satu presensi per sel; presensi ganda lama
+    (tanggal NULL) tidak dihitung, sama seperti rekap harian yang memakai
+    presensi terakhir. Range timestamp ditambahkan agar index terpakai.
+    """
+    start, _ = day_bounds(first)
+    _, end = day_bounds(last)
+    rows = (
+        Presensi.objects
+        .filter(timestamp__gte=start, timestamp__lt=end, tanggal__gte=first, tanggal__lte=last)
+        .values('petugas_id', 'tanggal', 'status_validasi')
+        .annotate(jumlah=Count('pk'))
+        .order_by()
+    )
+    return [(row['petugas_id'], row['tanggal'], row['status_validasi']) for row in rows]
+
+
+def get_monthly_cells(year, month):
+    first, last = month_bounds(year, month)
+    if not is_closed_month(year, month):
+        return _monthly_cells(first, last)
+
+    key = monthly_cache_key(year, month, monthly_version(year, month))
+    cells = cache.get(key)
+    if cells is None:
+        cells = _monthly_cells(first, last)
+        cache.set(key, cells, CLOSED_MONTH_CACHE_TIMEOUT)
+    return cells
+
+
+def invalidate_monthly_rekap(target_date):
+    """
+    Naikkan versi bulan `target_date` (hanya bulan lampau yang di-cache). Ikut
+    transaksi yang mengubah presensi, jadi batal bersama jika transaksi gagal.
+    """
+    if not is_closed_month(target_date.year, target_date.month):
+        return
+    month = target_date.replace(day=1)
+    _, created = MonthlyRekapVersion.objects.get_or_create(month=month, defaults={'version': 1})
+    if not created:
+        MonthlyRekapVersion.objects.filter(month=month).update(version=F('version') + 1)
+
+
+def rekap_presensi_bulanan(year, month, petugas_queryset=None):
+    """
+    Matriks presensi satu bulan dengan 2 query (petugas + agregat sel), ditambah
+    lookup versi cache untuk bulan lampau.
+
+    Setiap petugas diberi atribut `rekap_cells` (status per tanggal, None jika
+    tidak presensi) dan `rekap_totals` (jumlah per status + `tanpa_presensi`
+    untuk hari yang sudah lewat).
+    """
+    if petugas_queryset is None:
+        petugas_queryset = User.objects.filter(is_petugas=True).order_by('email')
+
+    first, last = month_bounds(year, month)
+    days = [first + timedelta(days=offset) for offset in range(last.day)]
+    day_index = {day: i for i, day in enumerate(days)}
+    elapsed_days = sum(1 for day in days if day <= timezone.localdate())
+
+    petugas_list = list(petugas_queryset)
+    by_id = {}
+    for petugas in petugas_list:
+        petugas.rekap_cells = [None] * len(days)
+        petugas.rekap_totals = dict.fromkeys(STATUS_PRESENSI, 0)
+        by_id[petugas.pk] = petugas
+
+    daily_totals = [dict(dict.fromkeys(STATUS_PRESENSI, 0), date=day) for day in days]
+    for petugas_id, tanggal, status in get_monthly_cells(year, month):
+        petugas = by_id.get(petugas_id)
+        if petugas is None:
+            continue
+        i = day_index[tanggal]
+        petugas.rekap_cells[i] = status
+        petugas.rekap_totals[status] += 1
+        daily_totals[i][status] += 1
+
+    for petugas in petugas_list:
+        presensi_days = sum(1 for status in petugas.rekap_cells[:elapsed_days] if status)
+        petugas.rekap_totals['tanpa_presensi'] = elapsed_days - presensi_days
+
+    return {
+        'year': year,
+        'month': month,
+        'days': days,
+        'petugas': petugas_list,
+        'daily_totals': daily_totals,
+    }
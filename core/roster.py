@@ -0,0 +1,326 @@
+# core/roster.py
+"""
+Jadwal shift petugas dan index petugas terjadwal per tanggal.
+
+Jadwal berulang (ShiftSchedule: shift + bitmask hari + masa berlaku) dan
+pengecualian per tanggal (ShiftException: libur/cuti atau ganti shift)
+diratakan menjadi RosterEntry, satu baris per (tanggal, petugas), ditambah
+RosterDay berisi jumlah petugas terjadwal. Rekap harian, dashboard dan deteksi
+keterlambatan hanya membaca index ini lewat (date) / (date, petugas), tanpa
+mengevaluasi jadwal.
+
+Index satu tanggal dibangun saat pertama dibutuhkan atau lewat
+`manage.py build_roster`; perubahan shift, jadwal atau pengecualian menghapus
+penanda RosterDay tanggal yang terdampak (lihat signals.py) sehingga dibangun
+ulang. Tanggal sebelum jadwal paling awal memakai perilaku lama: semua petugas
+dianggap terjadwal.
+"""
+import csv
+import io
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import User, Shift, ShiftSchedule, ShiftException, RosterEntry, RosterDay
+
+WEEKDAY_NAMES = ['senin', 'selasa', 'rabu', 'kamis', 'jumat', 'sabtu', 'minggu']
+ALL_WEEKDAYS = 0b1111111
+
+ROSTER_CHUNK_DAYS = 31
+BATCH_SIZE = 2000
+
+# Kolom CSV import: email,shift,hari,mulai,sampai (sampai boleh kosong)
+IMPORT_COLUMNS = ('email', 'shift', 'hari', 'mulai', 'sampai')
+MAX_IMPORT_ROWS = 5000
+
+
+class RosterImportError(Exception):
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+# ============================================
+# HARI KERJA
+# ============================================
+
+def _weekday_index(name):
+    if name.isdigit() and int(name) < len(WEEKDAY_NAMES):
+        return int(name)
+    # Cukup tiga huruf pertama: sen, sel, rab, kam, jum, sab, min
+    for index, day in enumerate(WEEKDAY_NAMES):
+        if len(name) >= 3 and day.startswith(name):
+            return index
+    raise ValueError(f"Hari tidak dikenal: {name!r}")
+
+
+def parse_weekdays(value):
+    """
+    'senin-jumat', 'sabtu,minggu', '0-4' (0 = Senin) atau 'setiap' -> bitmask.
+    Rentang boleh melewati Minggu, mis. 'jumat-senin'.
+    """
+    text = (value or '').strip().lower().replace(' ', '')
+    if text in ('setiap', 'semua', '*'):
+        return ALL_WEEKDAYS
+    mask = 0
+    for part in filter(None, text.split(',')):
+        first, _, last = part.partition('-')
+        day, end = _weekday_index(first), _weekday_index(last or first)
+        mask |= 1 << day
+        while day != end:
+            day = (day + 1) % len(WEEKDAY_NAMES)
+            mask |= 1 << day
+    if not mask:
+        raise ValueError("Hari kerja kosong.")
+    return mask
+
+
+def weekday_names(mask):
+    return [name for index, name in enumerate(WEEKDAY_NAMES) if mask & (1 << index)]
+
+
+# ============================================
+# INDEX PER TANGGAL
+# ============================================
+
+def shift_times(target_date, shift):
+    """(mulai, batas terlambat) shift pada tanggal lokal itu."""
+    starts_at = timezone.make_aware(datetime.combine(target_date, shift.start_time))
+    return starts_at, starts_at + timedelta(minutes=shift.late_after_minutes)
+
+
+def roster_start():
+    """Tanggal berlaku jadwal paling awal; None jika belum ada jadwal sama sekali."""
+    return ShiftSchedule.objects.aggregate(first=Min('valid_from'))['first']
+
+
+def compute_roster(start_date, end_date):
+    """{(tanggal, petugas_id): Shift} untuk [start_date, end_date) dari jadwal + pengecualian."""
+    last_date = end_date - timedelta(days=1)
+    active_petugas = User.objects.filter(is_petugas=True, is_active=True).values('pk')
+    schedules = ShiftSchedule.objects.select_related('shift').filter(
+        Q(valid_until__isnull=True) | Q(valid_until__gte=start_date),
+        valid_from__lte=last_date, shift__is_active=True, petugas__in=active_petugas,
+    ).order_by('shift__start_time', 'pk')
+
+    roster = {}
+    for schedule in schedules:
+        day = max(start_date, schedule.valid_from)
+        until = min(last_date, schedule.valid_until or last_date)
+        while day <= until:
+            # Dua jadwal di hari yang sama: shift yang mulai paling awal dipakai
+            if schedule.weekdays & (1 << day.weekday()):
+                roster.setdefault((day, schedule.petugas_id), schedule.shift)
+            day += timedelta(days=1)
+
+    exceptions = ShiftException.objects.select_related('shift').filter(
+        date__gte=start_date, date__lt=end_date, petugas__in=active_petugas
+    )
+    for exception in exceptions:
+        key = (exception.date, exception.petugas_id)
+        if exception.shift is None or not exception.shift.is_active:
+            roster.pop(key, None)
+        else:
+            roster[key] = exception.shift
+    return roster
+
+
+def build_roster(start_date, end_date):
+    """Bangun ulang index [start_date, end_date); kembalikan jumlah RosterEntry."""
+    first = roster_start()
+    entries, expected = [], Counter()
+    if first is not None:
+        for (day, petugas_id), shift in compute_roster(max(start_date, first), end_date).items():
+            starts_at, late_at = shift_times(day, shift)
+            entries.append(RosterEntry(
+                date=day, petugas_id=petugas_id, shift=shift, starts_at=starts_at, late_at=late_at
+            ))
+            expected[day] += 1
+
+    with transaction.atomic():
+        RosterEntry.objects.filter(date__gte=start_date, date__lt=end_date).delete()
+        RosterEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+        RosterDay.objects.filter(date__gte=start_date, date__lt=end_date).delete()
+        if first is not None:
+            day, days = max(start_date, first), []
+            while day < end_date:
+                days.append(RosterDay(date=day, expected=expected[day]))
+                day += timedelta(days=1)
+            RosterDay.objects.bulk_create(days, batch_size=BATCH_SIZE)
+    return len(entries)
+
+
+def ensure_roster(start_date, end_date):
+    """Bangun index untuk hari dalam [start_date, end_date) yang belum punya RosterDay."""
+    days = (end_date - start_date).days
+    done = set(RosterDay.objects.filter(date__gte=start_date, date__lt=end_date).values_list('date', flat=True))
+    missing = [start_date + timedelta(days=offset) for offset in range(days)
+               if start_date + timedelta(days=offset) not in done]
+    if not missing:
+        return
+    chunk_start = missing[0]
+    try:
+        while chunk_start <= missing[-1]:
+            chunk_end = min(chunk_start + timedelta(days=ROSTER_CHUNK_DAYS), missing[-1] + timedelta(days=1))
+            build_roster(chunk_start, chunk_end)
+            chunk_start = chunk_end
+    except IntegrityError:
+        # Tanggal yang sama sedang dibangun proses lain
+        pass
+
+
+def roster_day(target_date):
+    """RosterDay tanggal itu (dibangun jika perlu); None jika roster belum berlaku pada tanggal itu."""
+    day = RosterDay.objects.filter(date=target_date).first()
+    if day is None:
+        first = roster_start()
+        if first is None or target_date < first:
+            return None
+        ensure_roster(target_date, target_date + timedelta(days=1))
+        day = RosterDay.objects.filter(date=target_date).first()
+    return day
+
+
+def expected_petugas(target_date):
+    """QuerySet id petugas terjadwal pada tanggal itu; None jika semua petugas dianggap terjadwal."""
+    if roster_day(target_date) is None:
+        return None
+    return RosterEntry.objects.filter(date=target_date).values('petugas_id')
+
+
+def roster_entries(target_date):
+    """{petugas_id: RosterEntry} tanggal itu (index sudah dibangun oleh expected_petugas)."""
+    return {entry.petugas_id: entry for entry in RosterEntry.objects.select_related('shift').filter(date=target_date)}
+
+
+def invalidate_roster(start_date=None, end_date=None):
+    """Hapus penanda tanggal [start_date, end_date] (tanpa batas jika None) agar index dibangun ulang."""
+    from .stats import invalidate_dashboard_stats
+
+    days = RosterDay.objects.all()
+    if start_date is not None:
+        days = days.filter(date__gte=start_date)
+    if end_date is not None:
+        days = days.filter(date__lte=end_date)
+    days.delete()
+    invalidate_dashboard_stats()
+
+
+# ============================================
+# KETERLAMBATAN
+# ============================================
+
+def lateness_minutes(entry, timestamp):
+    """0 jika masih dalam toleransi, selain itu menit sejak shift mulai (dibulatkan ke atas)."""
+    if timestamp <= entry.late_at:
+        return 0
+    return max(-int((entry.starts_at - timestamp).total_seconds() // 60), 1)
+
+
+def apply_roster(presensi):
+    """Isi terlambat_menit presensi baru dari shift petugas hari itu (satu lookup index)."""
+    timestamp = presensi.timestamp or timezone.now()
+    target_date = presensi.tanggal or timezone.localdate(timestamp)
+    entry = None
+    if roster_day(target_date) is not None:
+        entry = RosterEntry.objects.filter(date=target_date, petugas_id=presensi.petugas_id).first()
+    presensi.terlambat_menit = lateness_minutes(entry, timestamp) if entry else None
+    return presensi
+
+
+# ============================================
+# IMPORT MASSAL
+# ============================================
+
+def parse_roster_csv(content):
+    """Baris dict dari CSV (bytes/str) dengan header IMPORT_COLUMNS."""
+    if isinstance(content, bytes):
+        try:
+            content = content.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise RosterImportError("File harus CSV UTF-8.")
+    reader = csv.DictReader(io.StringIO(content))
+    fields = {(name or '').strip().lower() for name in reader.fieldnames or []}
+    missing = [column for column in IMPORT_COLUMNS[:4] if column not in fields]
+    if missing:
+        raise RosterImportError(f"Kolom wajib tidak ada: {', '.join(missing)}.")
+    return [{(key or '').strip().lower(): (value or '').strip() for key, value in row.items()} for row in reader]
+
+
+def _close_schedules(schedules):
+    """Akhiri jadwal lama petugas sehari sebelum jadwal barunya berlaku (satu query baca)."""
+    starts = {}
+    for schedule in schedules:
+        starts[schedule.petugas_id] = min(starts.get(schedule.petugas_id, schedule.valid_from), schedule.valid_from)
+    removed, closed = [], []
+    for current in ShiftSchedule.objects.filter(
+        Q(valid_until__isnull=True) | Q(valid_until__gte=min(starts.values())), petugas_id__in=list(starts)
+    ):
+        valid_from = starts[current.petugas_id]
+        if current.valid_until is not None and current.valid_until < valid_from:
+            continue
+        if current.valid_from >= valid_from:
+            removed.append(current.pk)
+        else:
+            current.valid_until = valid_from - timedelta(days=1)
+            closed.append(current)
+    ShiftSchedule.objects.filter(pk__in=removed).delete()
+    ShiftSchedule.objects.bulk_update(closed, ['valid_until'], batch_size=BATCH_SIZE)
+
+
+def import_roster(rows, replace=False):
+    """
+    Buat ShiftSchedule dari banyak baris sekaligus (semua atau tidak sama sekali).
+    Petugas dan shift dimuat dengan satu query masing-masing. `replace` menutup
+    jadwal petugas yang diimport mulai tanggal `mulai` jadwal barunya.
+    Mengembalikan jumlah jadwal yang dibuat.
+    """
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise RosterImportError(f"Maksimal {MAX_IMPORT_ROWS} baris per import.")
+
+    emails = {row.get('email', '').lower() for row in rows}
+    petugas = {
+        email.lower(): pk for pk, email in
+        User.objects.filter(email__in=emails, is_petugas=True).values_list('pk', 'email')
+    }
+    shifts = {name.lower(): pk for pk, name in Shift.objects.values_list('pk', 'name')}
+
+    schedules, errors = [], []
+    for line, row in enumerate(rows, start=2):
+        try:
+            petugas_id = petugas.get(row.get('email', '').lower())
+            if petugas_id is None:
+                raise ValueError(f"petugas {row.get('email')!r} tidak ditemukan")
+            shift_id = shifts.get(row.get('shift', '').lower())
+            if shift_id is None:
+                raise ValueError(f"shift {row.get('shift')!r} tidak ditemukan")
+            weekdays = parse_weekdays(row.get('hari'))
+            valid_from = parse_date(row.get('mulai') or '')
+            valid_until = parse_date(row['sampai']) if row.get('sampai') else None
+            if valid_from is None or (row.get('sampai') and valid_until is None):
+                raise ValueError("tanggal harus YYYY-MM-DD")
+            if valid_until and valid_until < valid_from:
+                raise ValueError("sampai lebih awal dari mulai")
+        except ValueError as exc:
+            errors.append(f"Baris {line}: {exc}.")
+            continue
+        schedules.append(ShiftSchedule(
+            petugas_id=petugas_id, shift_id=shift_id, weekdays=weekdays,
+            valid_from=valid_from, valid_until=valid_until,
+        ))
+    if errors:
+        raise RosterImportError("Import dibatalkan, perbaiki baris berikut.", errors)
+    if not schedules:
+        return 0
+
+    with transaction.atomic():
+        if replace:
+            _close_schedules(schedules)
+        # bulk_create tanpa signal: invalidasi sekali untuk seluruh rentang
+        ShiftSchedule.objects.bulk_create(schedules, batch_size=BATCH_SIZE)
+        invalidate_roster(min(schedule.valid_from for schedule in schedules))
+    return len(schedules)
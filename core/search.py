@@ -0,0 +1,199 @@
+# core/search.py
+"""
+Pencarian teks laporan (note & location_note).
+
+Di SQLite memakai index FTS5 `core_laporan_fts` (external content: teks tetap
+di core_laporan, index hanya posting list) yang disinkronkan trigger
+INSERT/UPDATE/DELETE, sehingga semua jalur tulis ikut ter-index. Hasil diurutkan
+dengan bm25 (kolom tersembunyi `rank`), atau dari yang terbaru jika kecocokan
+terlalu banyak, dan potongan teks yang cocok ditandai untuk <mark>.
+
+Database lain memakai fallback `icontains` per kata (tanpa index).
+
+Input pengguna tidak pernah diteruskan sebagai sintaks FTS: tiap kata dikutip,
+"frasa dalam kutip" dicari sebagai frasa, dan kata terakhir dicocokkan sebagai
+awalan (mis. "gerb" menemukan "gerbang").
+"""
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+FTS_TABLE = 'core_laporan_fts'
+FTS_TRIGGERS = ('core_laporan_fts_ai', 'core_laporan_fts_ad', 'core_laporan_fts_au')
+
+# Penanda sementara di sekitar kata yang cocok; diganti <mark> setelah teks di-escape
+MARK_START, MARK_END = '\x02', '\x03'
+SNIPPET_TOKENS = 24
+MAX_TERMS = 8
+# Lebih dari ini hasil diurutkan terbaru dulu, bukan bm25 (lihat is_rankable)
+RANK_LIMIT = 2000
+
+QUERY_RE = re.compile(r'"([^"]*)"|([^\s"]+)')
+WORD_RE = re.compile(r'\w+')
+
+INSTALL_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        note, location_note,
+        content='core_laporan', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS core_laporan_fts_ai AFTER INSERT ON core_laporan BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, note, location_note)
+        VALUES (new.id, new.note, new.location_note);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS core_laporan_fts_ad AFTER DELETE ON core_laporan BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, note, location_note)
+        VALUES ('delete', old.id, old.note, old.location_note);
+    END
+    """,
+    # Perubahan status/prioritas tidak menyentuh index
+    f"""
+    CREATE TRIGGER IF NOT EXISTS core_laporan_fts_au AFTER UPDATE OF note, location_note ON core_laporan BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, note, location_note)
+        VALUES ('delete', old.id, old.note, old.location_note);
+        INSERT INTO {FTS_TABLE}(rowid, note, location_note)
+        VALUES (new.id, new.note, new.location_note);
+    END
+    """,
+    # Index ulang seluruh isi core_laporan
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+
+def install_fts(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in INSTALL_SQL:
+            cursor.execute(statement)
+
+
+def drop_fts(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for trigger in FTS_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def ensure_fts(connection):
+    """
+    Pasang ulang trigger yang hilang. Migrasi yang mengubah kolom Laporan di
+    SQLite membuat ulang tabel core_laporan, dan trigger ikut terhapus.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name FROM sqlite_master WHERE name = %s OR name IN (%s, %s, %s)",
+            [FTS_TABLE, *FTS_TRIGGERS],
+        )
+        found = {name for _type, name in cursor.fetchall()}
+    if FTS_TABLE not in found or found.issuperset(FTS_TRIGGERS):
+        return False
+    install_fts(connection)
+    return True
+
+
+def parse_query(text):
+    """
+    [(kata, ..., is_phrase)] dari input pengguna. Karakter operator FTS
+    (tanda kurung, *, :, ^, -) dibuang bersama tanda baca lain.
+    """
+    terms = []
+    for phrase, word in QUERY_RE.findall(text or ''):
+        words = tuple(WORD_RE.findall((phrase or word).lower()))
+        if words:
+            terms.append((words, bool(phrase)))
+    return terms[:MAX_TERMS]
+
+
+def match_expression(terms):
+    parts = ['"' + ' '.join(words) + '"' for words, _ in terms]
+    if not terms[-1][1]:
+        parts[-1] += '*'
+    return ' '.join(parts)
+
+
+def is_rankable(connection, expression):
+    """
+    True jika kecocokan tidak lebih dari RANK_LIMIT baris. bm25 harus dihitung
+    untuk setiap baris yang cocok (~2 µs/baris), jadi kata yang sangat umum
+    ("cctv" di jutaan laporan) diurutkan dari yang terbaru saja: tetap
+    O(halaman) dan pengguna bisa mempersempit dengan kata lain.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT 1 FROM "{FTS_TABLE}" WHERE "{FTS_TABLE}" MATCH %s LIMIT 1 OFFSET %s',
+            [expression, RANK_LIMIT],
+        )
+        return cursor.fetchone() is None
+
+
+def search_laporan(queryset, text):
+    """
+    Saring `queryset` (Laporan) dengan teks pencarian, urut relevansi.
+    Di SQLite setiap baris membawa `note_match`/`location_match` (teks bertanda).
+    """
+    terms = parse_query(text)
+    if not terms:
+        return queryset.none()
+
+    if connections[queryset.db].vendor != 'sqlite':
+        for words, _ in terms:
+            phrase = ' '.join(words)
+            queryset = queryset.filter(Q(note__icontains=phrase) | Q(location_note__icontains=phrase))
+        return queryset.order_by('-timestamp')
+
+    expression = match_expression(terms)
+    table = queryset.model._meta.db_table
+    # Urut hanya dengan kolom FTS (rank / rowid) agar FTS5 yang mengurutkan dan
+    # snippet dihitung untuk baris halaman saja
+    ordering = 'search_rank' if is_rankable(connections[queryset.db], expression) else '-search_rowid'
+    return queryset.extra(
+        select={
+            'search_rank': f'"{FTS_TABLE}".rank',
+            'search_rowid': f'"{FTS_TABLE}".rowid',
+            'note_match': f"snippet({FTS_TABLE}, 0, char(2), char(3), '…', {SNIPPET_TOKENS})",
+            'location_match': f"highlight({FTS_TABLE}, 1, char(2), char(3))",
+        },
+        tables=[FTS_TABLE],
+        where=[f'"{FTS_TABLE}".rowid = "{table}"."id"', f'"{FTS_TABLE}" MATCH %s'],
+        params=[expression],
+    ).order_by(ordering)
+
+
+def mark_terms(text, terms):
+    """Tandai kata yang cocok di Python (fallback non-SQLite)."""
+    if not text or not terms:
+        return text or ''
+    pattern = re.compile('|'.join(
+        r'\W+'.join(re.escape(word) for word in words) for words, _ in terms
+    ), re.IGNORECASE)
+    return pattern.sub(lambda match: MARK_START + match.group(0) + MARK_END, text)
+
+
+def render_marks(text):
+    """HTML aman: teks di-escape, penanda diganti <mark>."""
+    return mark_safe(
+        escape(text or '').replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+    )
+
+
+def highlights(laporan, terms):
+    """{'note': html, 'location_note': html} untuk satu hasil pencarian."""
+    note = getattr(laporan, 'note_match', None)
+    location = getattr(laporan, 'location_match', None)
+    return {
+        'note': render_marks(note if note is not None else mark_terms(laporan.note, terms)),
+        'location_note': render_marks(location if location is not None else mark_terms(laporan.location_note, terms)),
+    }
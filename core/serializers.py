@@ -1,16 +1,42 @@
 # core/serializers.py
 from rest_framework import serializers
-from .models import User, Presensi, Laporan, EmergencyAlarm
+from .models import User, Presensi, Laporan, EmergencyAlarm, DeviceToken, Shift, ShiftSchedule, ShiftException
+from .metrics import SerializationTimingMixin
+from .rekap import filter_on_date
+from .roster import parse_weekdays, weekday_names
+from .search import highlights
 from django.utils import timezone
 
-class UserSerializer(serializers.ModelSerializer):
+
+class SparseFieldsMixin:
+    """
+    Dukungan `?fields=id,timestamp,...` agar client hanya menerima kolom yang
+    dibutuhkan. Hanya berlaku untuk request GET dari view DRF.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or 'view' not in self.context or request.method != 'GET':
+            return
+
+        fields_param = request.query_params.get('fields')
+        if not fields_param:
+            return
+
+        requested = {name.strip() for name in fields_param.split(',') if name.strip()}
+        if not requested & set(self.fields):
+            return
+        for name in set(self.fields) - requested:
+            self.fields.pop(name)
+
+class UserSerializer(SerializationTimingMixin, serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ['id', 'first_name', 'last_name', 'email', 'phone_number', 'profile_picture', 'last_login', 'is_active', 'is_admin', 'is_petugas']
-        read_only_fields = ['is_admin', 'is_petugas', 'last_login']
+        fields = ['id', 'first_name', 'last_name', 'email', 'phone_number', 'profile_picture', 'profile_thumbnail', 'last_login', 'is_active', 'is_admin', 'is_petugas']
+        read_only_fields = ['is_admin', 'is_petugas', 'last_login', 'profile_thumbnail']
 
 # Serializer KHUSUS untuk update profil
-class UpdateProfileSerializer(serializers.ModelSerializer):
+class UpdateProfileSerializer(SerializationTimingMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['first_name', 'last_name', 'phone_number', 'profile_picture']
@@ -21,7 +47,7 @@ class UpdateProfileSerializer(serializers.ModelSerializer):
             'profile_picture': {'required': False}, # Gambar tidak wajib
         }
 
-class PresensiSerializer(serializers.ModelSerializer):
+class PresensiSerializer(SerializationTimingMixin, SparseFieldsMixin, serializers.ModelSerializer):
     petugas_name = serializers.CharField(source='petugas.first_name', read_only=True)
 
     class Meta:
@@ -29,34 +55,34 @@ class PresensiSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'petugas', 'petugas_name', 'timestamp',
             'latitude', 'longitude', 'location_note',
-            'note', 'selfie_photo', 'status_validasi' 
+            'note', 'selfie_photo', 'selfie_thumbnail', 'status_validasi', 'terlambat_menit'
         ]
-        read_only_fields = ['petugas', 'timestamp', 'status_validasi'] 
+        read_only_fields = ['petugas', 'timestamp', 'status_validasi', 'selfie_thumbnail', 'terlambat_menit']
 
         extra_kwargs = {
             'location_note': {'required': False, 'allow_blank': True},
             'note': {'required': False, 'allow_blank': True},
         }
 
-class LaporanSerializer(serializers.ModelSerializer):
+class LaporanSerializer(SerializationTimingMixin, SparseFieldsMixin, serializers.ModelSerializer):
     petugas_name = serializers.CharField(source='petugas.first_name', read_only=True)
 
     class Meta:
         model = Laporan
-        fields = ['id', 'petugas', 'petugas_name', 'timestamp', 'latitude', 'longitude', 'location_note', 'note', 'photo', 'status', 'priority']
-        read_only_fields = ['petugas', 'timestamp', 'status', 'priority']
+        fields = ['id', 'petugas', 'petugas_name', 'timestamp', 'latitude', 'longitude', 'location_note', 'note', 'photo', 'photo_thumbnail', 'status', 'priority']
+        read_only_fields = ['petugas', 'timestamp', 'status', 'priority', 'photo_thumbnail']
 
 
-class PetugasDetailSerializer(serializers.ModelSerializer):
+class PetugasDetailSerializer(SerializationTimingMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = [
             'id', 'first_name', 'last_name', 'email', 'phone_number', 
-            'profile_picture', 'is_active', 'last_login', 'date_joined'
+            'profile_picture', 'profile_thumbnail', 'is_active', 'last_login', 'date_joined'
         ]
         read_only_fields = ['email', 'is_active', 'last_login', 'date_joined']
 
-class AdminPresensiSerializer(serializers.ModelSerializer):
+class AdminPresensiSerializer(SerializationTimingMixin, SparseFieldsMixin, serializers.ModelSerializer):
     petugas_name = serializers.CharField(source='petugas.first_name', read_only=True)
     petugas_email = serializers.EmailField(source='petugas.email', read_only=True)
 
@@ -65,21 +91,71 @@ class AdminPresensiSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'petugas_name', 'petugas_email', 'timestamp', 
             'latitude', 'longitude', 'location_note', 'note', 'selfie_photo',
-            'status_validasi' 
+            'selfie_thumbnail', 'status_validasi', 'post_location', 'validasi_manual', 'terlambat_menit'
         ]
 
-class PetugasStatusPresensiSerializer(serializers.ModelSerializer):
+class WeekdaysField(serializers.Field):
+    """Bitmask hari <-> ['senin', ...]; input juga boleh teks seperti 'senin-jumat'."""
+
+    def to_representation(self, value):
+        return weekday_names(value)
+
+    def to_internal_value(self, data):
+        if isinstance(data, (list, tuple)):
+            data = ','.join(str(day) for day in data)
+        try:
+            return parse_weekdays(str(data))
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+
+
+class ShiftSerializer(SerializationTimingMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Shift
+        fields = ['id', 'name', 'start_time', 'end_time', 'late_after_minutes', 'is_active']
+
+
+class ShiftScheduleSerializer(SerializationTimingMixin, serializers.ModelSerializer):
+    weekdays = WeekdaysField()
+
+    class Meta:
+        model = ShiftSchedule
+        fields = ['id', 'petugas', 'shift', 'weekdays', 'valid_from', 'valid_until']
+
+    def validate(self, attrs):
+        valid_from = attrs.get('valid_from', getattr(self.instance, 'valid_from', None))
+        valid_until = attrs.get('valid_until', getattr(self.instance, 'valid_until', None))
+        if valid_until and valid_from and valid_until < valid_from:
+            raise serializers.ValidationError({'valid_until': 'Tidak boleh lebih awal dari valid_from.'})
+        return attrs
+
+
+class ShiftExceptionSerializer(SerializationTimingMixin, serializers.ModelSerializer):
+    class Meta:
+        model = ShiftException
+        fields = ['id', 'petugas', 'date', 'shift', 'note']
+
+
+class PetugasStatusPresensiSerializer(SerializationTimingMixin, serializers.ModelSerializer):
     has_presensi_today = serializers.SerializerMethodField()
     last_presensi = serializers.SerializerMethodField()
     full_name = serializers.SerializerMethodField()
+    shift = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = [
             'id', 'first_name', 'last_name', 'full_name',
-            'email', 'phone_number', 'has_presensi_today', 'last_presensi'
+            'email', 'phone_number', 'has_presensi_today', 'last_presensi', 'shift'
         ]
 
+    def get_shift(self, obj):
+        # Diisi rekap_presensi_harian jika roster berlaku pada tanggal itu
+        entry = getattr(obj, 'roster_entry', None)
+        if entry is None:
+            return None
+        return {'id': entry.shift_id, 'name': entry.shift.name, 'starts_at': entry.starts_at, 'late_at': entry.late_at}
+
     def get_full_name(self, obj):
         full = f"{obj.first_name} {obj.last_name}".strip()
         return full if full else obj.email 
@@ -87,20 +163,21 @@ class PetugasStatusPresensiSerializer(serializers.ModelSerializer):
     def get_target_date(self):
         return self.context.get('target_date', timezone.localdate())
 
+    def get_presensi_on_date(self, obj):
+        # Pakai hasil rekap_presensi_harian jika tersedia (tanpa query per petugas)
+        if hasattr(obj, 'presensi_on_date'):
+            return obj.presensi_on_date
+        return filter_on_date(
+            Presensi.objects.filter(petugas=obj),
+            self.get_target_date()
+        ).order_by('-timestamp').first()
+
     def get_has_presensi_today(self, obj):
-        target_date = self.get_target_date()
-        return Presensi.objects.filter(
-            petugas=obj, 
-            timestamp__date=target_date
-        ).exists()
+        return self.get_presensi_on_date(obj) is not None
 
     def get_last_presensi(self, obj):
-        target_date = self.get_target_date()
         try:
-            presensi_on_date = Presensi.objects.filter(
-                petugas=obj, 
-                timestamp__date=target_date
-            ).order_by('-timestamp').first()
+            presensi_on_date = self.get_presensi_on_date(obj)
             
             if presensi_on_date:
                 return AdminPresensiSerializer(presensi_on_date, context=self.context).data
@@ -109,7 +186,21 @@ class PetugasStatusPresensiSerializer(serializers.ModelSerializer):
         except Exception:
             return None
 
-class AdminLaporanSerializer(serializers.ModelSerializer):
+class PetugasRekapBulananSerializer(SerializationTimingMixin, serializers.ModelSerializer):
+    """Satu baris matriks rekap bulanan; data dari rekap_presensi_bulanan."""
+    full_name = serializers.SerializerMethodField()
+    cells = serializers.ListField(source='rekap_cells', read_only=True)
+    totals = serializers.DictField(source='rekap_totals', read_only=True)
+
+    class Meta:
+        model = User
+        fields = ['id', 'first_name', 'last_name', 'full_name', 'email', 'cells', 'totals']
+
+    def get_full_name(self, obj):
+        full = f"{obj.first_name} {obj.last_name}".strip()
+        return full if full else obj.email
+
+class AdminLaporanSerializer(SerializationTimingMixin, SparseFieldsMixin, serializers.ModelSerializer):
     petugas_name = serializers.CharField(source='petugas.first_name', read_only=True)
     petugas_email = serializers.EmailField(source='petugas.email', read_only=True)
 
@@ -118,25 +209,92 @@ class AdminLaporanSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'petugas_name', 'petugas_email', 'timestamp', 
             'latitude', 'longitude', 'location_note', 'note', 'photo', 
-            'status', 'priority'
+            'photo_thumbnail', 'status', 'priority'
         ]
         read_only_fields = ['status', 'priority']
 
-class EmergencyAlarmSerializer(serializers.ModelSerializer):
+
+class AdminLaporanSearchSerializer(AdminLaporanSerializer):
+    """Hasil `?q=`: skor relevansi (bm25, makin kecil makin relevan) dan teks bertanda <mark>."""
+    rank = serializers.SerializerMethodField()
+    highlight = serializers.SerializerMethodField()
+
+    class Meta(AdminLaporanSerializer.Meta):
+        fields = AdminLaporanSerializer.Meta.fields + ['rank', 'highlight']
+
+    def get_rank(self, obj):
+        return getattr(obj, 'search_rank', None)
+
+    def get_highlight(self, obj):
+        return highlights(obj, self.context.get('search_terms'))
+
+class EmergencyAlarmSerializer(SerializationTimingMixin, SparseFieldsMixin, serializers.ModelSerializer):
     petugas_name = serializers.CharField(source='petugas.first_name', read_only=True)
     
     class Meta:
         model = EmergencyAlarm
         fields = [
             'id', 'petugas', 'petugas_name', 'timestamp', 'category', 'description',
-            'latitude', 'longitude', 'status', 'resolved_at'
+            'latitude', 'longitude', 'status', 'resolved_at',
+            'severity', 'escalation_level', 'acknowledged_at'
         ]
-        read_only_fields = ['petugas', 'timestamp', 'status', 'resolved_at']
+        read_only_fields = ['petugas', 'timestamp', 'status', 'resolved_at', 'severity', 'acknowledged_at']
         extra_kwargs = {
             'description': {'required': False, 'allow_null': True, 'allow_blank': True},
         }
 
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+class DeviceTokenSerializer(SerializationTimingMixin, serializers.ModelSerializer):
+    class Meta:
+        model = DeviceToken
+        fields = ['token', 'platform', 'is_active', 'created_at', 'last_seen_at']
+        read_only_fields = ['is_active', 'created_at', 'last_seen_at']
+        # Keunikan ditangani upsert di view (token bisa berpindah user)
+        extra_kwargs = {'token': {'validators': []}}
+
+class LocationPingSerializer(serializers.Serializer):
+    """Ping posisi petugas; bukan ModelSerializer karena tidak langsung disimpan ke database."""
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+    accuracy = serializers.FloatField(min_value=0, required=False, allow_null=True)
+    recorded_at = serializers.DateTimeField(required=False)
+
+    def validate_recorded_at(self, value):
+        # Jam perangkat yang terlalu maju dipotong ke waktu server
+        return min(value, timezone.now())
+
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .authentication import add_role_claims, record_login
 
 class EmailTokenObtainPairSerializer(TokenObtainPairSerializer):
     username_field = 'email'
+
+    @classmethod
+    def get_token(cls, user):
+        # Klaim peran dipakai RoleClaimsJWTAuthentication agar tidak perlu query user
+        return add_role_claims(super().get_token(user), user)
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        record_login(self.user)
+        return data
+
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh selalu membaca ulang user: akun nonaktif ditolak, klaim peran diperbarui."""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.filter(pk=refresh.payload.get(api_settings.USER_ID_CLAIM), is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        add_role_claims(refresh, user)
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
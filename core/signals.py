@@ -0,0 +1,104 @@
+# core/signals.py
+from django.db import connections
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed, post_migrate
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .analytics import invalidate_rollup_day
+from .authentication import ACCESS_FIELDS, revoke_user_tokens
+from .geofence import invalidate_fence_index
+from .rekap import invalidate_monthly_rekap, local_date
+from .roster import invalidate_roster
+from .search import ensure_fts
+from .models import (
+    User, TokenUser, Presensi, Laporan, EmergencyAlarm, PostLocation, Shift, ShiftSchedule, ShiftException,
+)
+from .stats import invalidate_dashboard_stats
+
+
+@receiver(post_save, sender=Presensi)
+@receiver(post_save, sender=Laporan)
+@receiver(post_save, sender=EmergencyAlarm)
+@receiver(post_delete, sender=Presensi)
+@receiver(post_delete, sender=Laporan)
+@receiver(post_delete, sender=EmergencyAlarm)
+def invalidate_dashboard_on_change(sender, **kwargs):
+    invalidate_dashboard_stats()
+
+
+@receiver(post_save, sender=Presensi)
+@receiver(post_delete, sender=Presensi)
+def invalidate_monthly_rekap_on_change(sender, instance, **kwargs):
+    invalidate_monthly_rekap(instance.tanggal or local_date(instance.timestamp))
+
+
+@receiver(post_save, sender=Laporan)
+@receiver(post_save, sender=EmergencyAlarm)
+@receiver(post_delete, sender=Laporan)
+@receiver(post_delete, sender=EmergencyAlarm)
+def invalidate_incident_rollup_on_change(sender, instance, **kwargs):
+    if instance.timestamp:
+        invalidate_rollup_day(instance.timestamp)
+
+
+@receiver(post_save, sender=PostLocation)
+@receiver(post_delete, sender=PostLocation)
+@receiver(m2m_changed, sender=PostLocation.petugas.through)
+def invalidate_geofence_on_change(sender, **kwargs):
+    invalidate_fence_index()
+
+
+@receiver(post_save, sender=Shift)
+@receiver(post_delete, sender=Shift)
+def invalidate_roster_on_shift_change(sender, **kwargs):
+    invalidate_roster()
+
+
+@receiver(pre_save, sender=ShiftSchedule)
+def remember_schedule_start(sender, instance, **kwargs):
+    # Tanggal mulai lama ikut diinvalidasi jika jadwal dimundurkan
+    instance._previous_valid_from = ShiftSchedule.objects.filter(pk=instance.pk).values_list(
+        'valid_from', flat=True
+    ).first() if instance.pk else None
+
+
+@receiver(post_save, sender=ShiftSchedule)
+@receiver(post_delete, sender=ShiftSchedule)
+def invalidate_roster_on_schedule_change(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_valid_from', None)
+    invalidate_roster(min(instance.valid_from, previous) if previous else instance.valid_from)
+
+
+@receiver(post_save, sender=ShiftException)
+@receiver(post_delete, sender=ShiftException)
+def invalidate_roster_on_exception_change(sender, instance, **kwargs):
+    invalidate_roster(instance.date, instance.date)
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=TokenUser)
+def revoke_tokens_on_access_change(sender, instance, update_fields=None, **kwargs):
+    # Token JWT tidak dicek ke tabel user: perubahan status/peran/password harus mencabutnya
+    if instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(ACCESS_FIELDS):
+        return
+    old = User.objects.filter(pk=instance.pk).values(*ACCESS_FIELDS).first()
+    if old and any(old[name] != getattr(instance, name) for name in ACCESS_FIELDS):
+        revoke_user_tokens(instance.pk)
+        # Petugas nonaktif / bukan petugas lagi keluar dari roster mulai hari ini
+        if (old['is_active'], old['is_petugas']) != (instance.is_active, instance.is_petugas):
+            invalidate_roster(timezone.localdate())
+
+
+@receiver(post_delete, sender=User)
+def revoke_tokens_on_delete(sender, instance, **kwargs):
+    revoke_user_tokens(instance.pk)
+    if instance.is_petugas:
+        invalidate_roster(timezone.localdate())
+
+
+@receiver(post_migrate)
+def ensure_laporan_search_index(sender, using, **kwargs):
+    if sender.name == 'core':
+        ensure_fts(connections[using])
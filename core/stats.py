@@ -0,0 +1,97 @@
+# core/stats.py
+"""
+Statistik dashboard bersama untuk API mobile dan dashboard web.
+
+Hasil dihitung sekali lalu disimpan di cache dengan kunci berversi. Setiap
+perubahan Presensi/Laporan/EmergencyAlarm menaikkan versi (lihat signals.py),
+sehingga cache lama otomatis tidak terpakai dan ETag ikut berubah. Versinya
+disimpan di tabel CacheVersion (satu lookup primary key per request), bukan di
+cache, agar kenaikan dari proses lain terlihat dan tidak bisa mundur ke versi
+lama. Penulisan lewat queryset.update() tidak memicu signal dan harus
+memanggil invalidate_dashboard_stats() sendiri.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import User, Presensi, Laporan, EmergencyAlarm, CacheVersion
+from .rekap import get_daily_summary
+from .roster import expected_petugas, roster_day
+
+VERSION_NAME = 'dashboard-stats'
+
+# Batas umur cache untuk perubahan yang tidak memicu invalidasi (mis. petugas baru)
+STATS_TIMEOUT = 300
+
+
+def get_stats_version():
+    return CacheVersion.objects.filter(name=VERSION_NAME).values_list('version', flat=True).first() or 0
+
+
+def bump_stats_version():
+    if not CacheVersion.objects.filter(name=VERSION_NAME).update(version=F('version') + 1):
+        _, created = CacheVersion.objects.get_or_create(name=VERSION_NAME, defaults={'version': 1})
+        if not created:
+            CacheVersion.objects.filter(name=VERSION_NAME).update(version=F('version') + 1)
+
+
+def invalidate_dashboard_stats():
+    """Naikkan versi setelah transaksi commit agar cache tidak diisi data yang belum commit."""
+    transaction.on_commit(bump_stats_version)
+
+
+def dashboard_stats_etag(version=None):
+    if version is None:
+        version = get_stats_version()
+    return f'"dashboard-{version}-{timezone.localdate().isoformat()}"'
+
+
+def compute_dashboard_stats(today):
+    total_petugas = User.objects.filter(is_petugas=True).count()
+    summary = get_daily_summary(today)
+
+    # Dengan roster, hanya petugas terjadwal yang ditunggu (jumlahnya dari RosterDay)
+    day = roster_day(today)
+    if day is None:
+        terjadwal, belum_hadir = total_petugas, total_petugas - summary.hadir
+    else:
+        hadir_terjadwal = Presensi.objects.filter(
+            tanggal=today, status_validasi='hadir', petugas__in=expected_petugas(today)
+        ).count()
+        terjadwal, belum_hadir = day.expected, day.expected - hadir_terjadwal
+
+    return {
+        'total_petugas': total_petugas,
+        'terjadwal_today': terjadwal,
+        'hadir_today': summary.hadir,
+        'belum_hadir': belum_hadir,
+        'terlambat_today': summary.terlambat,
+        'laporan_baru': summary.laporan,
+        'active_alarms': EmergencyAlarm.objects.filter(status='active').count(),
+        # prefetch (bukan select_related): dengan JOIN + LIMIT 5 SQLite memilih scan
+        # core_user lalu sort seluruh presensi (~0.7 dtk pada 1 juta baris)
+        'recent_presensi': list(
+            Presensi.objects.prefetch_related('petugas').order_by('-timestamp')[:5]
+        ),
+        'open_laporan': list(
+            Laporan.objects.select_related('petugas').filter(status='lapor').order_by('-timestamp')[:5]
+        ),
+    }
+
+
+def get_dashboard_stats(version=None):
+    """
+    Kembalikan dict statistik hari ini. `recent_presensi`/`open_laporan` berisi
+    instance model (petugas sudah di-select_related) agar bisa dipakai template
+    maupun serializer tanpa query tambahan.
+    """
+    today = timezone.localdate()
+    if version is None:
+        version = get_stats_version()
+    key = f'dashboard-stats:{version}:{today.isoformat()}'
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_dashboard_stats(today)
+        cache.set(key, stats, STATS_TIMEOUT)
+    return stats
@@ -0,0 +1,98 @@
+# core/storage.py
+"""
+Penyimpanan media berbasis isi (content-addressed).
+
+Nama file = SHA-256 isinya, dibagi ke subdirektori dua tingkat di bawah folder
+upload_to, mis. `presensi_photos/3f/a2/3fa2...e1.jpg`. Dengan begitu satu
+direktori tidak pernah berisi ratusan ribu file, dan upload ulang dengan isi
+yang sama (retry dari aplikasi) tidak membuat salinan baru.
+
+File ditulis ke file sementara di direktori yang sama lalu di-rename, sehingga
+pembaca tidak pernah melihat file setengah jadi. Karena satu file bisa dipakai
+beberapa baris, hapus lewat release_file() (cek referensi dulu).
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+
+TEMP_PREFIX = '.upload-'
+
+# <prefix>/<aa>/<bb>/<sha256><ext>
+CONTENT_NAME = re.compile(r'(?:^|/)([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})(\.[\w]+)?$')
+
+
+def is_content_addressed(name):
+    return bool(name and CONTENT_NAME.search(name))
+
+
+def content_name(prefix, digest, extension):
+    return posixpath.join(prefix, digest[:2], digest[2:4], digest + extension)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        validate_file_name(name, allow_relative_path=True)
+
+        prefix = posixpath.dirname(name.replace('\\', '/'))
+        extension = os.path.splitext(name)[1].lower()
+        directory = self.path(prefix)
+        os.makedirs(directory, mode=self.directory_permissions_mode or 0o777, exist_ok=True)
+
+        # Tulis sekaligus hitung hash; nama akhir baru diketahui setelah isi selesai dibaca
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=TEMP_PREFIX, suffix='.part')
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as output:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    output.write(chunk)
+                output.flush()
+                os.fsync(output.fileno())
+
+            name = content_name(prefix, digest.hexdigest(), extension)
+            if max_length is not None and len(name) > max_length:
+                raise SuspiciousFileOperation(f"Nama file '{name}' melebihi {max_length} karakter.")
+
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                # Isi identik sudah tersimpan
+                os.unlink(temp_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), mode=self.directory_permissions_mode or 0o777, exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return name
+
+
+def release_file(instance, field_name, name=None):
+    """
+    Hapus file `instance.<field_name>` (atau `name`) dari storage jika tidak ada
+    baris lain pada field yang sama yang masih memakainya.
+    """
+    field_file = getattr(instance, field_name)
+    name = name or field_file.name
+    if not name:
+        return False
+    model = type(instance)._meta.concrete_model
+    if model._default_manager.filter(**{field_name: name}).exclude(pk=instance.pk).exists():
+        return False
+    field_file.storage.delete(name)
+    return True
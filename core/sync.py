@@ -0,0 +1,180 @@
+# core/sync.py
+"""
+Sinkronisasi batch Presensi/Laporan dari aplikasi (antrean offline).
+
+Setiap record membawa `client_id` buatan aplikasi sebagai kunci idempotensi:
+record yang sudah pernah diterima dikembalikan sebagai `duplicate` dengan id
+lamanya, bukan dibuat ulang. Record valid disimpan dengan bulk_create dalam
+satu transaksi dan hasil dikembalikan per item.
+
+`recorded_at` opsional berisi waktu record dibuat di perangkat; dipotong ke
+waktu server jika jam perangkat maju, ditolak jika lebih tua dari
+MAX_RECORD_AGE. Timestamp dan tanggal presensi diambil dari nilai ini.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .analytics import invalidate_rollup_day
+from .geofence import apply_geofence, get_fence_index
+from .images import schedule_image_processing
+from .models import Presensi, Laporan
+from .rekap import invalidate_monthly_rekap, record_presensi_created, record_laporan_created
+from .roster import apply_roster
+from .stats import invalidate_dashboard_stats
+from .serializers import PresensiSerializer, LaporanSerializer
+
+MAX_BATCH_SIZE = 50
+# Antrean offline lebih lama dari ini tidak diterima
+MAX_RECORD_AGE = timedelta(days=7)
+
+# type -> (model, serializer, field foto, field thumbnail, pencatat ringkasan)
+RECORD_TYPES = {
+    'presensi': (Presensi, PresensiSerializer, 'selfie_photo', 'selfie_thumbnail', record_presensi_created),
+    'laporan': (Laporan, LaporanSerializer, 'photo', 'photo_thumbnail', record_laporan_created),
+}
+
+
+class SyncError(Exception):
+    pass
+
+
+def _result(record, status, **extra):
+    return dict({'client_id': record.get('client_id'), 'type': record.get('type'), 'status': status}, **extra)
+
+
+def _existing_ids(user, records):
+    existing = {}
+    for record_type, (model, *_) in RECORD_TYPES.items():
+        client_ids = [r['client_id'] for r in records if r.get('type') == record_type and r.get('client_id')]
+        if client_ids:
+            existing[record_type] = dict(
+                model.objects.filter(petugas=user, client_id__in=client_ids).values_list('client_id', 'pk')
+            )
+    return existing
+
+
+def _recorded_at(value, now):
+    if value in (None, ''):
+        return now
+    recorded_at = serializers.DateTimeField().to_internal_value(value)
+    if recorded_at < now - MAX_RECORD_AGE:
+        raise serializers.ValidationError(f"Record lebih lama dari {MAX_RECORD_AGE.days} hari tidak diterima.")
+    # Jam perangkat yang terlalu maju dipotong ke waktu server
+    return min(recorded_at, now)
+
+
+def _build(user, records, files):
+    """Validasi semua record; kembalikan (hasil per item, instance baru per type)."""
+    now = timezone.now()
+    existing = _existing_ids(user, records)
+    presensi_dates = set(Presensi.objects.filter(
+        petugas=user, tanggal__gte=timezone.localdate(now - MAX_RECORD_AGE)
+    ).values_list('tanggal', flat=True))
+
+    fence_index = get_fence_index()
+
+    results = []
+    pending = {record_type: [] for record_type in RECORD_TYPES}
+    # (type, client_id) -> instance record pertama di batch ini
+    seen = {}
+
+    for record in records:
+        record_type = record.get('type')
+        client_id = record.get('client_id')
+
+        if record_type not in RECORD_TYPES:
+            results.append(_result(record, 'error', errors={'type': ['Tipe harus presensi atau laporan.']}))
+            continue
+        if not client_id or len(str(client_id)) > 64:
+            results.append(_result(record, 'error', errors={'client_id': ['client_id wajib diisi (maks. 64 karakter).']}))
+            continue
+
+        client_id = str(client_id)
+        existing_pk = existing.get(record_type, {}).get(client_id)
+        if existing_pk is not None:
+            results.append(_result(record, 'duplicate', id=existing_pk))
+            continue
+        if (record_type, client_id) in seen:
+            # id diisi setelah record pertama tersimpan
+            results.append(_result(record, 'duplicate', instance=seen[(record_type, client_id)]))
+            continue
+
+        try:
+            recorded_at = _recorded_at(record.get('recorded_at'), now)
+        except serializers.ValidationError as exc:
+            results.append(_result(record, 'error', errors={'recorded_at': exc.detail}))
+            continue
+
+        model, serializer_class, photo_field, _, _ = RECORD_TYPES[record_type]
+        data = {k: v for k, v in record.items() if k not in ('type', 'client_id', 'recorded_at', photo_field)}
+        if record.get(photo_field):
+            data[photo_field] = files.get(record[photo_field])
+
+        serializer = serializer_class(data=data)
+        if not serializer.is_valid():
+            results.append(_result(record, 'error', errors=serializer.errors))
+            continue
+
+        instance = model(petugas=user, client_id=client_id, timestamp=recorded_at, **serializer.validated_data)
+        if record_type == 'presensi':
+            instance.tanggal = timezone.localdate(recorded_at)
+            if instance.tanggal in presensi_dates:
+                results.append(_result(record, 'error', errors={
+                    'non_field_errors': ["Anda sudah melakukan presensi harian pada tanggal ini."]
+                }))
+                continue
+            presensi_dates.add(instance.tanggal)
+
+        seen[(record_type, client_id)] = instance
+        if record_type == 'presensi':
+            apply_geofence(instance, fence_index)
+            apply_roster(instance)
+        pending[record_type].append(instance)
+        results.append(_result(record, 'created', instance=instance))
+
+    return results, pending
+
+
+def ingest_batch(user, records, files):
+    if not isinstance(records, list):
+        raise SyncError("records harus berupa list.")
+    if len(records) > MAX_BATCH_SIZE:
+        raise SyncError(f"Maksimal {MAX_BATCH_SIZE} record per batch.")
+    if not all(isinstance(record, dict) for record in records):
+        raise SyncError("Setiap record harus berupa object.")
+
+    # Satu kali ulang jika retry paralel menabrak constraint client_id / presensi harian
+    for attempt in range(2):
+        results, pending = _build(user, records, files)
+        try:
+            with transaction.atomic():
+                for record_type, instances in pending.items():
+                    if not instances:
+                        continue
+                    model, _, photo_field, thumb_field, record_created = RECORD_TYPES[record_type]
+                    # bulk_create tidak mengirim post_save, jadi invalidasi manual
+                    model.objects.bulk_create(instances)
+                    invalidate_dashboard_stats()
+                    for instance in instances:
+                        record_created(instance)
+                        schedule_image_processing(instance, photo_field, thumb_field)
+                        # Record dari hari yang sudah lewat (antrean offline)
+                        if record_type == 'presensi':
+                            invalidate_monthly_rekap(instance.tanggal)
+                        else:
+                            invalidate_rollup_day(instance.timestamp)
+            break
+        except IntegrityError:
+            if attempt:
+                raise
+            for uploaded in files.values():
+                uploaded.seek(0)
+
+    for result in results:
+        instance = result.pop('instance', None)
+        if instance is not None:
+            result['id'] = instance.pk
+    return results
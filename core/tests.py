@@ -1,3 +1,2036 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from PIL import Image
+from asgiref.sync import sync_to_async
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .alarm_stream import broker
+from .authentication import REVOCATION_REFRESH_SECONDS, revocations
+from .analytics import build_rollups, incident_heatmap
+from .models import (
+    User, Presensi, Laporan, EmergencyAlarm, DailyAttendanceSummary, PostLocation,
+    AlarmEvent, DeviceToken, NotificationJob, LocationTrack, IncidentDayRollup, IncidentRollupDay,
+    Shift, ShiftSchedule, ShiftException, RosterEntry, RosterDay, TokenRevocation,
+)
+from .metrics import registry as metrics_registry
+from .escalation import EscalationScheduler, FakeClock, initial_deadline
+from .notifications import FakeTransport, claim_jobs, run_pending_jobs
+from .search import ensure_fts, search_laporan
+from .tracking import store as live_store
+from .rekap import (
+    day_bounds, filter_on_date, get_daily_summary, invalidate_monthly_rekap, rebuild_daily_summaries,
+    rekap_presensi_harian,
+)
+from .roster import WEEKDAY_NAMES
+from .stats import bump_stats_version, get_dashboard_stats, get_stats_version
+
+TEST_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
+
+
+def buat_petugas(nomor, **extra):
+    return User.objects.create_user(
+        email=f'petugas{nomor}@example.com',
+        password='rahasia123',
+        first_name=f'Petugas{nomor}',
+        **extra
+    )
+
+
+def buat_gambar(nama='foto.jpg', ukuran=(32, 32), exif=None):
+    buffer = io.BytesIO()
+    Image.new('RGB', ukuran, 'red').save(buffer, format='JPEG', exif=exif or Image.Exif())
+    return SimpleUploadedFile(nama, buffer.getvalue(), content_type='image/jpeg')
+
+
+def buat_presensi(petugas, **extra):
+    data = {
+        'latitude': '-6.200000',
+        'longitude': '106.816666',
+        'location_note': 'Pos Utama',
+        'note': 'Presensi Harian',
+        'selfie_photo': 'presensi_photos/test.jpg',
+    }
+    data.update(extra)
+    return Presensi.objects.create(petugas=petugas, **data)
+
+
+class RekapHarianQueryTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='rahasia123',
+            is_admin=True, is_petugas=False
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+        self.nomor = 0
+
+    def tambah_petugas(self, jumlah):
+        for _ in range(jumlah):
+            self.nomor += 1
+            petugas = buat_petugas(self.nomor)
+            if self.nomor % 2:
+                buat_presensi(petugas)
+
+    def hitung_query(self, func):
+        with CaptureQueriesContext(connection) as ctx:
+            response = func()
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_api_harian_query_tetap(self):
+        self.tambah_petugas(3)
+        jumlah_awal, _ = self.hitung_query(
+            lambda: self.api.get('/api/admin/laporan/harian/')
+        )
+        self.tambah_petugas(10)
+        jumlah_akhir, response = self.hitung_query(
+            lambda: self.api.get('/api/admin/laporan/harian/')
+        )
+
+        self.assertGreater(jumlah_awal, 0)
+        self.assertEqual(jumlah_awal, jumlah_akhir)
+        self.assertEqual(response.data['total_petugas'], 13)
+        self.assertEqual(response.data['petugas_hadir'], 7)
+
+        hadir = [p for p in response.data['data'] if p['has_presensi_today']]
+        self.assertTrue(all(p['last_presensi']['petugas_email'] == p['email'] for p in hadir))
+
+    def test_presensi_terakhir_pada_tanggal(self):
+        petugas = buat_petugas(99)
+        # Data lama (sebelum constraint harian) bisa punya dua presensi sehari
+        pertama = buat_presensi(petugas, tanggal=None)
+        kedua = buat_presensi(petugas, location_note='Pos Belakang')
+        Presensi.objects.filter(pk=pertama.pk).update(
+            timestamp=timezone.now() - timedelta(minutes=30)
+        )
+        kemarin = buat_presensi(petugas, tanggal=timezone.localdate() - timedelta(days=1))
+        Presensi.objects.filter(pk=kemarin.pk).update(
+            timestamp=timezone.now() - timedelta(days=1)
+        )
+
+        response = self.api.get('/api/admin/laporan/harian/')
+        item = response.data['data'][0]
+        self.assertEqual(item['last_presensi']['id'], kedua.pk)
+
+    def test_presensi_dimuat_dari_id_tanpa_subquery_ulang(self):
+        self.tambah_petugas(4)
+        with CaptureQueriesContext(connection) as ctx:
+            petugas_list = rekap_presensi_harian(timezone.localdate())
+        self.assertEqual(sum(p.presensi_on_date is not None for p in petugas_list), 2)
+        # Subquery "presensi terakhir" hanya dijalankan sekali (di query User)
+        subquery = [q['sql'] for q in ctx.captured_queries if 'ORDER BY U0."timestamp" DESC' in q['sql']]
+        self.assertEqual(len(subquery), 1)
+
+    def test_web_rekap_query_tetap(self):
+        self.client.force_login(self.admin)
+        url = reverse('web-rekap-harian')
+        self.tambah_petugas(3)
+        jumlah_awal, _ = self.hitung_query(lambda: self.client.get(url))
+        self.tambah_petugas(10)
+        jumlah_akhir, response = self.hitung_query(lambda: self.client.get(url))
+
+        self.assertEqual(jumlah_awal, jumlah_akhir)
+        self.assertEqual(len(response.context['data_rekap']), 13)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class RingkasanHarianTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='rahasia123',
+            is_admin=True, is_petugas=False
+        )
+        self.petugas = buat_petugas(1)
+        self.api = APIClient()
+        self.api.force_authenticate(self.petugas)
+
+    def test_ringkasan_bertambah_saat_create(self):
+        today = timezone.localdate()
+        get_daily_summary(today)
+
+        response = self.api.post('/api/presensi/', {
+            'latitude': '-6.200000', 'longitude': '106.816666',
+            'selfie_photo': buat_gambar(),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+        response = self.api.post('/api/laporan/', {
+            'latitude': '-6.200000', 'longitude': '106.816666',
+            'location_note': 'Gerbang', 'note': 'Pintu rusak',
+            'photo': buat_gambar(),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+        summary = DailyAttendanceSummary.objects.get(date=today)
+        self.assertEqual((summary.hadir, summary.laporan), (1, 1))
+
+    def test_ringkasan_ikut_perubahan_status_admin(self):
+        presensi = buat_presensi(self.petugas)
+        laporan = Laporan.objects.create(
+            petugas=self.petugas, latitude='-6.2', longitude='106.8',
+            location_note='Gerbang', note='Pintu rusak', photo='laporan_photos/test.jpg'
+        )
+        get_daily_summary()
+
+        self.client.force_login(self.admin)
+        self.client.post(
+            reverse('web-presensi-detail', args=[presensi.pk]),
+            {'status_validasi': 'diluar_lokasi'}
+        )
+        self.client.post(reverse('web-laporan-detail', args=[laporan.pk]), {'status': 'selesai'})
+
+        summary = get_daily_summary()
+        self.assertEqual(summary.hadir, 0)
+        self.assertEqual(summary.diluar_lokasi, 1)
+        self.assertEqual(summary.laporan_selesai, 1)
+
+        response = self.client.get(reverse('web-dashboard'))
+        self.assertEqual(response.context['hadir_today'], 0)
+        self.assertEqual(response.context['laporan_baru'], 1)
+
+    def test_api_admin_laporan_hanya_baca(self):
+        laporan = Laporan.objects.create(
+            petugas=self.petugas, latitude='-6.2', longitude='106.8',
+            location_note='Gerbang', note='Pintu rusak', photo='laporan_photos/test.jpg'
+        )
+        get_daily_summary()
+        self.api.force_authenticate(self.admin)
+        url = f'/api/admin/laporan/{laporan.pk}/'
+
+        self.assertEqual(self.api.get(url).status_code, 200)
+        # Perubahan di luar helper ringkasan akan membuat DailyAttendanceSummary melenceng
+        self.assertEqual(self.api.patch(url, {'note': 'Diubah'}, format='json').status_code, 405)
+        self.assertEqual(self.api.delete(url).status_code, 405)
+        self.assertEqual(self.api.post('/api/admin/laporan/', {}, format='json').status_code, 405)
+        self.assertTrue(Laporan.objects.filter(pk=laporan.pk, note='Pintu rusak').exists())
+        self.assertEqual(get_daily_summary().laporan, 1)
+
+    def test_rebuild_command(self):
+        buat_presensi(self.petugas)
+        kemarin = buat_presensi(buat_petugas(2), status_validasi='tidak_hadir')
+        Presensi.objects.filter(pk=kemarin.pk).update(
+            timestamp=timezone.now() - timedelta(days=1)
+        )
+        today = timezone.localdate()
+        start = today - timedelta(days=2)
+
+        call_command('rebuild_daily_summary', start=start.isoformat(), end=today.isoformat(),
+                     stdout=io.StringIO())
+
+        self.assertEqual(DailyAttendanceSummary.objects.filter(date__gte=start).count(), 3)
+        self.assertEqual(DailyAttendanceSummary.objects.get(date=today).hadir, 1)
+        self.assertEqual(
+            DailyAttendanceSummary.objects.get(date=today - timedelta(days=1)).tidak_hadir, 1
+        )
+
+
+@override_settings(ALARM_STREAM_BACKGROUND_POLL=False)
+class AlarmStreamTest(TestCase):
+    def setUp(self):
+        broker.reset()
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='rahasia123',
+            is_admin=True, is_petugas=False
+        )
+        self.petugas = buat_petugas(1)
+
+    def buat_alarm(self, **extra):
+        return EmergencyAlarm.objects.create(
+            petugas=self.petugas, category='maling',
+            latitude='-6.2', longitude='106.8', **extra
+        )
+
+    def test_perubahan_status_diterbitkan_setelah_commit(self):
+        alarm = self.buat_alarm()
+        self.client.force_login(self.admin)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.client.post(reverse('web-alarm-detail', args=[alarm.pk]), {'status': 'handled'})
+        self.assertFalse(AlarmEvent.objects.exists())
+        for callback in callbacks:
+            callback()
+
+        # Disimpan ke database agar terbaca stream di proses/worker mana pun
+        event = AlarmEvent.objects.get()
+        self.assertEqual((event.event_type, event.data['id'], event.data['transition']), ('alarm', alarm.pk, 'handled'))
+
+    def test_polling_bersyarat_304(self):
+        self.buat_alarm()
+        api = APIClient()
+        api.force_authenticate(self.admin)
+
+        first = api.get('/api/alarm/?status=active')
+        self.assertEqual(first.status_code, 200)
+        second = api.get('/api/alarm/?status=active', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+
+        self.buat_alarm()
+        third = api.get('/api/alarm/?status=active', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(third.status_code, 200)
+        self.assertNotEqual(third['ETag'], first['ETag'])
+
+    def test_stream_ditolak_untuk_non_admin_dan_wsgi(self):
+        self.client.force_login(self.petugas)
+        response = self.client.get(reverse('web-alarm-stream'))
+        self.assertEqual(response.status_code, 403)
+        # Admin lewat WSGI: ditolak agar tidak menahan thread worker
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(reverse('web-alarm-stream')).status_code, 503)
+
+    async def test_stream_snapshot_lalu_event(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(reverse('web-alarm-stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+        snapshot = (await anext(stream)).decode()
+        self.assertIn('event: snapshot', snapshot)
+        self.assertEqual(json.loads(snapshot.split('data: ', 1)[1]), [])
+
+        # Diterbitkan proses lain: hanya terlihat lewat tabel event
+        event_id, _, _ = await sync_to_async(broker.publish)('alarm', {'id': 99, 'status': 'active'})
+        self.assertEqual(await sync_to_async(broker.poll)(), 1)
+        event = (await anext(stream)).decode()
+        self.assertIn(f'id: {event_id}', event)
+        self.assertIn('"id": 99', event)
+        await stream.aclose()
+
+    async def test_stream_melanjutkan_dari_last_event_id(self):
+        first, _, _ = await sync_to_async(broker.publish)('alarm', {'id': 1, 'status': 'active'})
+        await sync_to_async(broker.publish)('alarm', {'id': 2, 'status': 'active'})
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(reverse('web-alarm-stream'), headers={'Last-Event-ID': str(first)})
+
+        stream = aiter(response.streaming_content)
+        await anext(stream)
+        event = (await anext(stream)).decode()
+        self.assertIn('event: alarm', event)
+        self.assertIn('"id": 2', event)
+        # Event yang sudah dikirim dari riwayat tidak diulang oleh poller
+        await sync_to_async(broker.publish)('alarm', {'id': 3, 'status': 'active'})
+        await sync_to_async(broker.poll)()
+        self.assertIn('"id": 3', (await anext(stream)).decode())
+        await stream.aclose()
+
+
+class PaginationDanFieldsTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='rahasia123',
+            is_admin=True, is_petugas=False
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+        petugas = buat_petugas(1)
+        for hari in range(25):
+            buat_presensi(petugas, tanggal=timezone.localdate() - timedelta(days=hari))
+
+    def test_cursor_pagination(self):
+        first = self.api.get('/api/admin/presensi/', {'page_size': 10})
+        self.assertEqual(len(first.data['results']), 10)
+        self.assertIsNotNone(first.data['next'])
+
+        seen = [item['id'] for item in first.data['results']]
+        url = first.data['next']
+        while url:
+            page = self.api.get(url)
+            seen += [item['id'] for item in page.data['results']]
+            url = page.data['next']
+
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_sparse_fields(self):
+        response = self.api.get('/api/admin/presensi/', {'fields': 'id,timestamp'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'timestamp'})
+
+    def test_list_tanpa_n_plus_satu(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.api.get('/api/presensi/')
+        self.assertLessEqual(len(ctx.captured_queries), 2)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, IMAGE_PROCESSING_ASYNC=False)
+class PemrosesanFotoTest(TestCase):
+    def setUp(self):
+        self.petugas = buat_petugas(1)
+        self.api = APIClient()
+        self.api.force_authenticate(self.petugas)
+
+    def test_foto_diresize_tanpa_exif_dan_punya_thumbnail(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'KameraHP'
+        foto = buat_gambar('JPEG_besar.jpg', ukuran=(3000, 2000), exif=exif)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.api.post('/api/laporan/', {
+                'latitude': '-6.200000', 'longitude': '106.816666',
+                'location_note': 'Gerbang', 'note': 'Pintu rusak', 'photo': foto,
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+        laporan = Laporan.objects.get(pk=response.data['id'])
+        with Image.open(laporan.photo.path) as main:
+            self.assertEqual(max(main.size), 1600)
+            self.assertEqual(len(main.getexif()), 0)
+        with Image.open(laporan.photo_thumbnail.path) as thumb:
+            self.assertEqual(thumb.format, 'WEBP')
+            self.assertLessEqual(max(thumb.size), 320)
+
+        detail = self.api.get(f'/api/laporan/{laporan.pk}/')
+        self.assertTrue(detail.data['photo_thumbnail'].endswith('.webp'))
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class SyncBatchTest(TestCase):
+    def setUp(self):
+        self.petugas = buat_petugas(1)
+        self.api = APIClient()
+        self.api.force_authenticate(self.petugas)
+
+    def kirim(self):
+        records = [
+            {'type': 'presensi', 'client_id': 'p-1', 'latitude': '-6.2', 'longitude': '106.8',
+             'selfie_photo': 'file0'},
+            {'type': 'laporan', 'client_id': 'l-1', 'latitude': '-6.2', 'longitude': '106.8',
+             'location_note': 'Gerbang', 'note': 'Pintu rusak', 'photo': 'file1'},
+            {'type': 'laporan', 'client_id': 'l-2', 'latitude': '-6.2', 'longitude': '106.8',
+             'location_note': 'Pagar', 'note': 'Lampu mati', 'photo': 'file2'},
+            {'type': 'laporan', 'client_id': 'l-3', 'latitude': '-6.2', 'longitude': '106.8'},
+        ]
+        return self.api.post('/api/sync/', {
+            'records': json.dumps(records),
+            'file0': buat_gambar('a.jpg'), 'file1': buat_gambar('b.jpg'), 'file2': buat_gambar('c.jpg'),
+        }, format='multipart')
+
+    def test_batch_dan_retry_idempoten(self):
+        response = self.kirim()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['error']), (3, 1))
+        self.assertEqual(response.data['results'][3]['status'], 'error')
+        self.assertIn('photo', response.data['results'][3]['errors'])
+        ids = [r['id'] for r in response.data['results'][:3]]
+
+        retry = self.kirim()
+        self.assertEqual(retry.data['duplicate'], 3)
+        self.assertEqual([r['id'] for r in retry.data['results'][:3]], ids)
+        self.assertEqual(Laporan.objects.count(), 2)
+        self.assertEqual(Presensi.objects.count(), 1)
+        self.assertEqual(get_daily_summary().laporan, 2)
+
+    def test_duplikat_dalam_batch_mendapat_id_pertama(self):
+        record = {'type': 'laporan', 'client_id': 'l-1', 'latitude': '-6.2', 'longitude': '106.8',
+                  'location_note': 'Gerbang', 'note': 'Pintu rusak', 'photo': 'file0'}
+        response = self.api.post('/api/sync/', {
+            'records': json.dumps([record, record]), 'file0': buat_gambar('a.jpg'),
+        }, format='multipart')
+        pertama, kedua = response.data['results']
+        self.assertEqual((pertama['status'], kedua['status']), ('created', 'duplicate'))
+        self.assertIsNotNone(pertama['id'])
+        self.assertEqual(kedua['id'], pertama['id'])
+
+    def test_recorded_at_dari_perangkat(self):
+        buat_presensi(self.petugas)
+        kemarin = timezone.localtime() - timedelta(days=1)
+
+        def presensi(client_id, recorded_at, nama):
+            return {'type': 'presensi', 'client_id': client_id, 'latitude': '-6.2', 'longitude': '106.8',
+                    'selfie_photo': nama, 'recorded_at': recorded_at}
+
+        records = [
+            presensi('p-kemarin', kemarin.isoformat(), 'file0'),
+            presensi('p-lama', (kemarin - timedelta(days=30)).isoformat(), 'file1'),
+            {'type': 'laporan', 'client_id': 'l-besok', 'latitude': '-6.2', 'longitude': '106.8',
+             'location_note': 'Pos', 'note': 'Cek', 'photo': 'file2',
+             'recorded_at': (timezone.now() + timedelta(days=1)).isoformat()},
+        ]
+        response = self.api.post('/api/sync/', {
+            'records': json.dumps(records),
+            'file0': buat_gambar('a.jpg'), 'file1': buat_gambar('b.jpg'), 'file2': buat_gambar('c.jpg'),
+        }, format='multipart')
+        hasil = response.data['results']
+        self.assertEqual([r['status'] for r in hasil], ['created', 'error', 'created'])
+        self.assertIn('recorded_at', hasil[1]['errors'])
+
+        # Presensi hari ini sudah ada, tetapi record offline kemarin tetap diterima untuk tanggal kemarin
+        presensi_kemarin = Presensi.objects.get(pk=hasil[0]['id'])
+        self.assertEqual(presensi_kemarin.tanggal, kemarin.date())
+        self.assertAlmostEqual(presensi_kemarin.timestamp.timestamp(), kemarin.timestamp(), delta=1)
+        # Jam perangkat yang maju dipotong ke waktu server
+        self.assertLessEqual(Laporan.objects.get(pk=hasil[2]['id']).timestamp, timezone.now())
+
+    def test_batch_terlalu_besar_ditolak(self):
+        records = [{'type': 'laporan', 'client_id': str(i)} for i in range(51)]
+        response = self.api.post('/api/sync/', {'records': records}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class DuplikatKonkurenTest(TransactionTestCase):
+    jumlah_thread = 5
+
+    def setUp(self):
+        cache.clear()
+        self.petugas = buat_petugas(1)
+
+    def kirim_bersamaan(self, path, data_factory):
+        barrier = threading.Barrier(self.jumlah_thread)
+        status_codes = []
+
+        def kirim():
+            api = APIClient()
+            api.force_authenticate(self.petugas)
+            data = data_factory()
+            barrier.wait()
+            try:
+                status_codes.append(api.post(path, data, format='multipart').status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=kirim) for _ in range(self.jumlah_thread)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(status_codes)
+
+    def test_presensi_harian_ganda_ditolak(self):
+        status_codes = self.kirim_bersamaan('/api/presensi/', lambda: {
+            'latitude': '-6.2', 'longitude': '106.8', 'selfie_photo': buat_gambar(),
+        })
+        self.assertEqual(status_codes, [201] + [400] * (self.jumlah_thread - 1))
+        self.assertEqual(Presensi.objects.filter(petugas=self.petugas).count(), 1)
+
+    def test_cooldown_alarm_atomik(self):
+        status_codes = self.kirim_bersamaan('/api/alarm/', lambda: {
+            'category': 'maling', 'latitude': '-6.2', 'longitude': '106.8',
+        })
+        self.assertEqual(status_codes, [201] + [400] * (self.jumlah_thread - 1))
+        self.assertEqual(EmergencyAlarm.objects.filter(petugas=self.petugas).count(), 1)
+
+    def test_constraint_database(self):
+        buat_presensi(self.petugas)
+        with self.assertRaises(IntegrityError):
+            buat_presensi(self.petugas)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, IMAGE_PROCESSING_ASYNC=False)
+class DashboardStatsCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='rahasia123',
+            is_admin=True, is_petugas=False
+        )
+        self.petugas = buat_petugas(1)
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def test_cache_dan_etag(self):
+        first = self.api.get('/api/admin/dashboard/stats/')
+        self.assertEqual(first.status_code, 200)
+
+        # Hanya lookup versi (primary key) per request
+        with self.assertNumQueries(2):
+            cached = self.api.get('/api/admin/dashboard/stats/')
+            not_modified = self.api.get('/api/admin/dashboard/stats/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.data, first.data)
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_versi_di_database(self):
+        first = self.api.get('/api/admin/dashboard/stats/')
+        # Dinaikkan proses lain (mis. management command), lalu cache lokal dikosongkan/di-cull
+        buat_petugas(2)
+        bump_stats_version()
+        cache.clear()
+        response = self.api.get('/api/admin/dashboard/stats/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_petugas'], first.data['total_petugas'] + 1)
+
+    def test_invalidasi_saat_ada_presensi(self):
+        first = self.api.get('/api/admin/dashboard/stats/')
+        self.assertEqual(first.data['hadir_today'], 0)
+
+        petugas_api = APIClient()
+        petugas_api.force_authenticate(self.petugas)
+        with self.captureOnCommitCallbacks(execute=True):
+            petugas_api.post('/api/presensi/', {
+                'latitude': '-6.2', 'longitude': '106.8', 'selfie_photo': buat_gambar(),
+            }, format='multipart')
+
+        second = self.api.get('/api/admin/dashboard/stats/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.data['hadir_today'], 1)
+        self.assertEqual(len(second.data['recent_presensi']), 1)
+
+    def test_web_dashboard_memakai_stats_yang_sama(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('web-dashboard'))
+        self.assertEqual(response.context['total_petugas'], get_dashboard_stats()['total_petugas'])
+
+
+class AlarmNearbyTest(TestCase):
+    # Titik alarm; 0.009 derajat lintang ≈ 1 km
+    LAT, LON = -6.2, 106.8
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='rahasia123',
+            is_admin=True, is_petugas=False
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+        self.pemicu = buat_petugas(0)
+        buat_presensi(self.pemicu, latitude=self.LAT, longitude=self.LON)
+        self.alarm = EmergencyAlarm.objects.create(
+            petugas=self.pemicu, category='maling', latitude=self.LAT, longitude=self.LON
+        )
+
+    def geser(self, km):
+        return f'{self.LAT + km * 0.009:.6f}'
+
+    def test_geohash_dan_haversine(self):
+        from .geo import encode, haversine_km, cover_cells
+        self.assertEqual(encode(57.64911, 10.40744), 'u4pruydqq')
+        self.assertAlmostEqual(haversine_km(self.LAT, self.LON, self.geser(1), self.LON), 1.0, delta=0.01)
+        # Sel penutup harus memuat geohash titik di tepi radius
+        titik_tepi = encode(self.geser(0.99), self.LON)
+        self.assertTrue(any(titik_tepi.startswith(c) for c in cover_cells(self.LAT, self.LON, 1)))
+        self.assertEqual(self.alarm.geohash, encode(self.LAT, self.LON))
+
+    def test_petugas_terdekat_dari_presensi_terakhir(self):
+        dekat = buat_petugas(1)
+        buat_presensi(dekat, latitude=self.geser(0.3), longitude=self.LON)
+        sedang = buat_petugas(2)
+        buat_presensi(sedang, latitude=self.geser(3), longitude=self.LON)
+        # Presensi lama dekat alarm, tetapi posisi terakhirnya jauh
+        pindah = buat_petugas(3)
+        lama = buat_presensi(pindah, latitude=self.geser(0.1), longitude=self.LON, tanggal=timezone.localdate() - timedelta(days=1))
+        Presensi.objects.filter(pk=lama.pk).update(timestamp=timezone.now() - timedelta(hours=3))
+        buat_presensi(pindah, latitude=self.geser(20), longitude=self.LON)
+        dibatalkan = buat_petugas(4)
+        buat_presensi(dibatalkan, latitude=self.geser(0.2), longitude=self.LON, status_validasi='tidak_hadir')
+        kemarin = buat_petugas(5)
+        basi = buat_presensi(kemarin, latitude=self.geser(0.2), longitude=self.LON)
+        Presensi.objects.filter(pk=basi.pk).update(timestamp=timezone.now() - timedelta(days=2))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.get(f'/api/alarm/{self.alarm.pk}/nearby/?limit=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(ctx.captured_queries), 12)
+
+        officers = response.data['officers']
+        self.assertEqual([o['petugas_id'] for o in officers], [dekat.pk, sedang.pk, pindah.pk])
+        self.assertAlmostEqual(officers[0]['distance_km'], 0.3, delta=0.01)
+        self.assertGreaterEqual(response.data['search_radius_km'], 20)
+
+    def test_laporan_dalam_radius(self):
+        petugas = buat_petugas(1)
+        data = {'longitude': self.LON, 'location_note': 'Gerbang', 'note': 'Pagar rusak', 'photo': 'laporan_photos/x.jpg'}
+        dekat = Laporan.objects.create(petugas=petugas, latitude=self.geser(0.5), **data)
+        Laporan.objects.create(petugas=petugas, latitude=self.geser(5), **data)
+        lama = Laporan.objects.create(petugas=petugas, latitude=self.geser(0.1), **data)
+        Laporan.objects.filter(pk=lama.pk).update(timestamp=timezone.now() - timedelta(days=30))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.get(f'/api/alarm/{self.alarm.pk}/nearby/?radius=1')
+        self.assertEqual([l['id'] for l in response.data['laporan']], [dekat.pk])
+        self.assertEqual(response.data['officers'], [])
+        # Sel dicocokkan sebagai range pada index geohash, bukan substr()
+        sql = [q['sql'] for q in ctx.captured_queries if '"core_laporan"."geohash" >=' in q['sql']]
+        self.assertTrue(sql)
+        self.assertFalse(any('SUBSTR' in q['sql'].upper() for q in ctx.captured_queries))
+
+    def test_hanya_admin(self):
+        self.api.force_authenticate(self.pemicu)
+        response = self.api.get(f'/api/alarm/{self.alarm.pk}/nearby/')
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class GeofenceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.petugas = buat_petugas(1)
+        self.api = APIClient()
+        self.api.force_authenticate(self.petugas)
+        # Pos radius 200 m dan pos poligon kecil ~2 km di utaranya
+        self.gerbang = PostLocation.objects.create(name='Gerbang', latitude='-6.200000', longitude='106.800000', radius_m=200)
+        self.gudang = PostLocation.objects.create(
+            name='Gudang', latitude='-6.182000', longitude='106.800000',
+            polygon=[[-6.183, 106.799], [-6.183, 106.801], [-6.181, 106.801], [-6.181, 106.799]],
+        )
+
+    def kirim_presensi(self, latitude, longitude):
+        response = self.api.post('/api/presensi/', {
+            'latitude': latitude, 'longitude': longitude, 'selfie_photo': buat_gambar(),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return Presensi.objects.get(pk=response.data['id'])
+
+    def test_klasifikasi_saat_presensi(self):
+        presensi = self.kirim_presensi('-6.201000', '106.800500')
+        self.assertEqual(presensi.status_validasi, 'hadir')
+        self.assertEqual(presensi.post_location, self.gerbang)
+
+        Presensi.objects.all().delete()
+        presensi = self.kirim_presensi('-6.190000', '106.800000')
+        self.assertEqual(presensi.status_validasi, 'diluar_lokasi')
+        self.assertIsNone(presensi.post_location)
+
+    def test_poligon_dan_penugasan(self):
+        from .geofence import get_fence_index
+        index = get_fence_index()
+        self.assertEqual(index.classify(self.petugas.pk, -6.1820, 106.8005), ('hadir', self.gudang.pk))
+        self.assertEqual(index.classify(self.petugas.pk, -6.1820, 106.8020)[0], 'diluar_lokasi')
+
+        # Setelah ditugaskan ke Gudang, hadir di Gerbang dianggap di luar lokasi
+        self.gudang.petugas.add(self.petugas)
+        index = get_fence_index()
+        self.assertEqual(index.classify(self.petugas.pk, -6.2, 106.8), ('diluar_lokasi', None))
+        self.assertEqual(index.classify(buat_petugas(2).pk, -6.2, 106.8), ('hadir', self.gerbang.pk))
+
+    def test_versi_index_dari_database(self):
+        from .geofence import get_fence_index
+        index = get_fence_index()
+        # Cache versi kedaluwarsa tanpa perubahan data: index tidak dibangun ulang
+        cache.clear()
+        self.assertIs(get_fence_index(), index)
+
+        # Perubahan dari proses lain (tanpa signal di proses ini) terlihat setelah TTL versi
+        PostLocation.objects.bulk_create([
+            PostLocation(name='Parkir', latitude='-6.300000', longitude='106.800000', radius_m=200)
+        ])
+        PostLocation.petugas.through.objects.create(postlocation=self.gudang, user=self.petugas)
+        cache.clear()
+        index = get_fence_index()
+        self.assertEqual(len(index.fences), 3)
+        self.assertEqual(index.assignments, {self.petugas.pk: {self.gudang.pk}})
+
+    def test_tanpa_pos_status_tetap_hadir(self):
+        PostLocation.objects.all().delete()
+        presensi = self.kirim_presensi('-7.000000', '110.000000')
+        self.assertEqual(presensi.status_validasi, 'hadir')
+
+    def test_evaluasi_ulang_command(self):
+        hari_ini = timezone.localdate()
+        luar = buat_presensi(self.petugas, latitude='-6.190000', longitude='106.800000')
+        manual = buat_presensi(buat_petugas(2), latitude='-6.190000', longitude='106.800000', validasi_manual=True)
+        rebuild_daily_summaries(hari_ini, hari_ini)
+        self.assertEqual(get_daily_summary(hari_ini).hadir, 2)
+
+        # Pos diperluas: presensi yang tadinya di luar kini masuk
+        self.gerbang.radius_m = 2000
+        self.gerbang.save()
+        buat_presensi(buat_petugas(3), latitude='-6.250000', longitude='106.800000')
+
+        call_command('reevaluate_geofence', stdout=io.StringIO())
+        luar.refresh_from_db()
+        manual.refresh_from_db()
+        self.assertEqual((luar.status_validasi, luar.post_location), ('hadir', self.gerbang))
+        self.assertEqual((manual.status_validasi, manual.post_location), ('hadir', None))
+        summary = get_daily_summary(hari_ini)
+        self.assertEqual((summary.hadir, summary.diluar_lokasi), (2, 1))
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='rahasia123',
+            is_admin=True, is_petugas=False
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+        self.petugas = buat_petugas(1)
+        hari_ini = timezone.localdate()
+        for hari in range(5):
+            presensi = buat_presensi(
+                self.petugas, tanggal=hari_ini - timedelta(days=hari), note='=HYPERLINK("x")',
+                status_validasi='diluar_lokasi' if hari == 1 else 'hadir',
+            )
+            Presensi.objects.filter(pk=presensi.pk).update(timestamp=timezone.now() - timedelta(days=hari))
+        EmergencyAlarm.objects.create(
+            petugas=self.petugas, category='maling', description='Pagar <dibobol> & rusak',
+            latitude='-6.2', longitude='106.8'
+        )
+
+    def unduh(self, url):
+        response = self.api.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content), response
+
+    def test_csv_filter_tanggal_dan_status(self):
+        kemarin = (timezone.localdate() - timedelta(days=3)).isoformat()
+        content, response = self.unduh(f'/api/admin/export/presensi.csv?start={kemarin}')
+        self.assertIn('attachment; filename="presensi_', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8-sig'))))
+        self.assertEqual(rows[0][0], 'ID')
+        self.assertEqual(len(rows), 1 + 4)
+        # Urut kronologis dan catatan berisi formula di-escape
+        self.assertEqual([r[1] for r in rows[1:]], sorted(r[1] for r in rows[1:]))
+        self.assertEqual(rows[1][7], '\'=HYPERLINK("x")')
+
+        content, _ = self.unduh('/api/admin/export/presensi.csv?status=diluar_lokasi')
+        self.assertEqual(len(content.decode('utf-8-sig').strip().splitlines()), 2)
+
+    def test_query_tetap_tanpa_join(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.unduh('/api/admin/export/presensi.csv')
+        # lookup petugas + lookup pos + satu query baris
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertNotIn('JOIN', ctx.captured_queries[-1]['sql'])
+
+    def test_xlsx_valid(self):
+        import xml.etree.ElementTree as ET
+        import zipfile
+
+        content, response = self.unduh('/api/admin/export/alarm.xlsx?status=active')
+        self.assertTrue(response['Content-Type'].startswith('application/vnd.openxmlformats'))
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertIn('xl/workbook.xml', archive.namelist())
+            sheet = ET.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        ns = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+        rows = sheet.findall(f'{ns}sheetData/{ns}row')
+        self.assertEqual(len(rows), 2)
+        texts = [t.text for t in rows[1].iter(f'{ns}t')]
+        self.assertIn('Pagar <dibobol> & rusak', texts)
+
+    def test_validasi_dan_akses(self):
+        self.assertEqual(self.api.get('/api/admin/export/presensi.csv?status=liburan').status_code, 400)
+        self.assertEqual(self.api.get('/api/admin/export/presensi.csv?start=kemarin').status_code, 400)
+        self.assertEqual(self.api.get('/api/admin/export/presensi.csv?start=2024-02-30').status_code, 400)
+        self.assertEqual(self.api.get('/api/admin/export/laporan.xlsx?date=2024-13-01').status_code, 400)
+        self.assertEqual(self.api.get('/api/admin/export/user.csv').status_code, 400)
+
+        self.api.force_authenticate(self.petugas)
+        self.assertEqual(self.api.get('/api/admin/export/presensi.csv').status_code, 403)
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('web-export', args=['laporan', 'csv']) + '?status=all&date=')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content).decode('utf-8-sig').strip(), 'ID,Waktu,Petugas,Email,Latitude,Longitude,Lokasi,Catatan,Status,Prioritas,Foto')
+
+
+class RekapBulananTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='rahasia123',
+            is_admin=True, is_petugas=False
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+        self.andi = buat_petugas(1)
+        self.budi = buat_petugas(2)
+        # Bulan lalu = bulan tertutup yang boleh di-cache
+        akhir = timezone.localdate().replace(day=1) - timedelta(days=1)
+        self.bulan = akhir.replace(day=1)
+        self.param = self.bulan.strftime('%Y-%m')
+        self.hari = akhir.day
+
+        self.presensi_andi = [
+            self.presensi_pada(self.andi, 1),
+            self.presensi_pada(self.andi, 2, status_validasi='diluar_lokasi'),
+            self.presensi_pada(self.andi, self.hari),
+        ]
+        self.presensi_pada(self.budi, 2, status_validasi='tidak_hadir')
+        # Di luar bulan: tidak ikut dihitung
+        self.presensi_pada(self.budi, 0)
+
+    def presensi_pada(self, petugas, hari_ke, **extra):
+        tanggal = self.bulan + timedelta(days=hari_ke - 1)
+        presensi = buat_presensi(petugas, tanggal=tanggal, **extra)
+        Presensi.objects.filter(pk=presensi.pk).update(timestamp=day_bounds(tanggal)[0] + timedelta(hours=7))
+        return presensi
+
+    def test_matriks_dan_total(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.get(f'/api/admin/laporan/bulanan/?month={self.param}')
+        self.assertEqual(response.status_code, 200)
+        # Petugas + agregat sel, ditambah versi cache bulan lampau
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertEqual(len(response.data['days']), self.hari)
+
+        rows = {row['id']: row for row in response.data['data']}
+        andi = rows[self.andi.pk]
+        self.assertEqual(andi['cells'][:3], ['hadir', 'diluar_lokasi', None])
+        self.assertEqual(andi['cells'][-1], 'hadir')
+        self.assertEqual(andi['totals'], {
+            'hadir': 2, 'diluar_lokasi': 1, 'tidak_hadir': 0, 'tanpa_presensi': self.hari - 3
+        })
+        self.assertEqual(rows[self.budi.pk]['totals']['tidak_hadir'], 1)
+        self.assertEqual(response.data['daily_totals'][1]['diluar_lokasi'], 1)
+
+    def test_bulan_tertutup_di_cache_dan_diinvalidasi(self):
+        self.api.get(f'/api/admin/laporan/bulanan/?month={self.param}')
+        with CaptureQueriesContext(connection) as ctx:
+            self.api.get(f'/api/admin/laporan/bulanan/?month={self.param}')
+        # Hanya versi bulan + daftar petugas; sel diambil dari cache
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+        self.client.force_login(self.admin)
+        self.client.post(
+            reverse('web-presensi-detail', args=[self.presensi_andi[0].pk]),
+            {'status_validasi': 'tidak_hadir'}
+        )
+        response = self.api.get(f'/api/admin/laporan/bulanan/?month={self.param}')
+        andi = next(row for row in response.data['data'] if row['id'] == self.andi.pk)
+        self.assertEqual(andi['cells'][0], 'tidak_hadir')
+
+        # Perubahan dari proses lain: versinya di database, bukan di cache proses ini
+        Presensi.objects.filter(pk=self.presensi_andi[1].pk).update(status_validasi='hadir')
+        invalidate_monthly_rekap(self.bulan)
+        response = self.api.get(f'/api/admin/laporan/bulanan/?month={self.param}')
+        andi = next(row for row in response.data['data'] if row['id'] == self.andi.pk)
+        self.assertEqual(andi['cells'][1], 'hadir')
+
+    def test_validasi_dan_halaman_web(self):
+        self.assertEqual(self.api.get('/api/admin/laporan/bulanan/?month=2025-13').status_code, 400)
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('web-rekap-bulanan') + f'?month={self.param}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['petugas']), 2)
+        self.assertContains(response, 'Rekap Kehadiran Bulanan')
+
+
+class FilterTanggalTest(TestCase):
+    def setUp(self):
+        self.petugas = buat_petugas(1)
+        self.hari = date(2024, 3, 14)
+        # 23:59 lokal (WIB) = 16:59 UTC hari yang sama; 00:00 lokal besok = 17:00 UTC
+        awal_besok = day_bounds(self.hari + timedelta(days=1))[0]
+        self.malam = self.alarm_pada(awal_besok - timedelta(minutes=1))
+        self.tengah_malam = self.alarm_pada(awal_besok)
+
+    def alarm_pada(self, waktu):
+        alarm = EmergencyAlarm.objects.create(
+            petugas=self.petugas, category='maling', latitude='-6.2', longitude='106.8'
+        )
+        EmergencyAlarm.objects.filter(pk=alarm.pk).update(timestamp=waktu)
+        return alarm
+
+    def pk_pada(self, target_date):
+        return list(filter_on_date(EmergencyAlarm.objects.order_by('pk'), target_date).values_list('pk', flat=True))
+
+    def test_batas_hari_lokal(self):
+        self.malam.refresh_from_db()
+        self.assertEqual(timezone.localtime(self.malam.timestamp).strftime('%d %H:%M'), '14 23:59')
+        self.assertEqual(self.pk_pada(self.hari), [self.malam.pk])
+        self.assertEqual(self.pk_pada(self.hari + timedelta(days=1)), [self.tengah_malam.pk])
+        self.assertEqual(self.pk_pada('2024-03-15'), [self.tengah_malam.pk])
+        # Tanggal tidak valid diabaikan (tanpa filter)
+        self.assertEqual(len(self.pk_pada('2024-02-30')), 2)
+        self.assertEqual(len(self.pk_pada('kemarin')), 2)
+
+    def test_range_memakai_index_timestamp(self):
+        indexes = connection.introspection.get_constraints(connection.cursor(), EmergencyAlarm._meta.db_table)
+        self.assertEqual(indexes['alarm_ts_idx']['columns'], ['timestamp'])
+        self.assertEqual(indexes['alarm_petugas_ts_idx']['columns'], ['petugas_id', 'timestamp'])
+        plan = filter_on_date(EmergencyAlarm.objects.all(), self.hari).explain()
+        self.assertIn('alarm_ts_idx', plan)
+
+
+@override_settings(NOTIFICATION_TRANSPORT='core.notifications.FakeTransport', NOTIFICATION_BATCH_SIZE=2)
+class NotifikasiAlarmTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        FakeTransport.reset()
+        self.pemicu = buat_petugas(0)
+        self.rekan = [buat_petugas(nomor) for nomor in range(1, 4)]
+        for petugas in [self.pemicu] + self.rekan:
+            DeviceToken.objects.create(user=petugas, token=f'token-{petugas.pk}')
+        self.api = APIClient()
+        self.api.force_authenticate(self.pemicu)
+
+    def picu_alarm(self):
+        return self.api.post('/api/alarm/', {
+            'category': 'maling', 'latitude': '-6.200000', 'longitude': '106.800000'
+        }, format='json')
+
+    def lewati_cooldown(self):
+        cache.delete(f'alarm-cooldown:{self.pemicu.pk}')
+        EmergencyAlarm.objects.update(timestamp=timezone.now() - timedelta(minutes=5))
+
+    def test_cooldown_dicek_ke_database(self):
+        self.assertEqual(self.picu_alarm().status_code, 201)
+        # Worker lain tidak melihat cache proses ini
+        cache.clear()
+        self.assertEqual(self.picu_alarm().status_code, 400)
+        self.lewati_cooldown()
+        self.assertEqual(self.picu_alarm().status_code, 201)
+
+    def test_alarm_hanya_masuk_antrean(self):
+        self.assertEqual(self.picu_alarm().status_code, 201)
+        self.assertEqual(FakeTransport.sent, [])
+        job = NotificationJob.objects.get()
+        self.assertEqual((job.status, job.alarm.petugas_id), ('pending', self.pemicu.pk))
+
+        # Jumlah query request tidak bergantung pada jumlah perangkat
+        self.lewati_cooldown()
+        with CaptureQueriesContext(connection) as sedikit:
+            self.picu_alarm()
+        for nomor in range(10, 30):
+            DeviceToken.objects.create(user=buat_petugas(nomor), token=f'token-x{nomor}')
+        self.lewati_cooldown()
+        with CaptureQueriesContext(connection) as banyak:
+            self.picu_alarm()
+        self.assertEqual(len(banyak.captured_queries), len(sedikit.captured_queries))
+        self.assertEqual(NotificationJob.objects.count(), 3)
+
+    def test_worker_kirim_per_batch_tanpa_pemicu(self):
+        self.picu_alarm()
+        call_command('run_notification_worker', '--once', stdout=io.StringIO())
+
+        job = NotificationJob.objects.get()
+        self.assertEqual((job.status, job.sent_count, job.attempts), ('done', 3, 1))
+        self.assertEqual([len(tokens) for tokens, _ in FakeTransport.sent], [2, 1])
+        terkirim = {token for tokens, _ in FakeTransport.sent for token in tokens}
+        self.assertNotIn(f'token-{self.pemicu.pk}', terkirim)
+        self.assertIn('ALARM DARURAT', FakeTransport.sent[0][1]['title'])
+
+    def test_gagal_dicoba_ulang_dan_token_invalid_dinonaktifkan(self):
+        self.picu_alarm()
+        gagal, invalid = f'token-{self.rekan[0].pk}', f'token-{self.rekan[1].pk}'
+        FakeTransport.fail_tokens = {gagal}
+        FakeTransport.invalid_tokens = {invalid}
+        run_pending_jobs()
+
+        job = NotificationJob.objects.get()
+        self.assertEqual((job.status, job.sent_count, job.payload['tokens']), ('pending', 1, [gagal]))
+        self.assertGreater(job.available_at, timezone.now())
+        self.assertFalse(DeviceToken.objects.get(token=invalid).is_active)
+        # Belum waktunya dicoba ulang
+        self.assertEqual(claim_jobs(), [])
+
+        FakeTransport.reset()
+        NotificationJob.objects.update(available_at=timezone.now())
+        run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.sent_count, job.attempts), ('done', 2, 2))
+        self.assertEqual(FakeTransport.sent[0][0], [gagal])
+
+    def test_job_worker_mati_diklaim_ulang(self):
+        self.picu_alarm()
+        self.assertEqual(len(claim_jobs()), 1)
+        # Sedang diproses worker lain
+        self.assertEqual(claim_jobs(), [])
+        NotificationJob.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(claim_jobs()), 1)
+        self.assertEqual(NotificationJob.objects.get().attempts, 2)
+
+    @override_settings(NOTIFICATION_MAX_ATTEMPTS=2)
+    def test_job_yang_terus_error_dibatasi(self):
+        self.picu_alarm()
+        with mock.patch('core.notifications.recipient_tokens', side_effect=RuntimeError('db putus')), \
+                self.assertLogs('core.notifications', 'ERROR'):
+            run_pending_jobs()
+            job = NotificationJob.objects.get()
+            self.assertEqual((job.status, job.attempts, job.last_error), ('pending', 1, 'db putus'))
+            NotificationJob.objects.update(available_at=timezone.now())
+            run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertEqual(claim_jobs(), [])
+
+        # Lease habis pada percobaan terakhir (worker mati) juga tidak diklaim lagi
+        NotificationJob.objects.update(status='processing', locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim_jobs(), [])
+        self.assertEqual(NotificationJob.objects.get().status, 'failed')
+
+    def test_worker_tetap_berjalan_saat_putaran_error(self):
+        self.picu_alarm()
+        with mock.patch('core.management.commands.run_notification_worker.run_pending_jobs',
+                        side_effect=[RuntimeError('db putus'), 1, 0]), \
+                mock.patch('core.management.commands.run_notification_worker.time.sleep'), \
+                self.assertLogs('core.management.commands.run_notification_worker', 'ERROR'):
+            output = io.StringIO()
+            call_command('run_notification_worker', '--claim-limit', '5', '--max-jobs', '1', stdout=output)
+        self.assertIn('1 job notifikasi', output.getvalue())
+
+    def test_registrasi_token_perangkat(self):
+        response = self.api.post('/api/devices/', {'token': 'baru', 'platform': 'ios'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        # Perangkat yang sama login sebagai petugas lain
+        lain = APIClient()
+        lain.force_authenticate(self.rekan[0])
+        self.assertEqual(lain.post('/api/devices/', {'token': 'baru'}, format='json').status_code, 200)
+        self.assertEqual(DeviceToken.objects.get(token='baru').user, self.rekan[0])
+
+        self.assertEqual(len(self.api.get('/api/devices/').data), 1)
+        self.assertEqual(self.api.delete('/api/devices/baru/').status_code, 404)
+        self.assertEqual(lain.delete('/api/devices/baru/').status_code, 204)
+
+
+class MetricsMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics_registry.reset()
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='rahasia123',
+            is_admin=True, is_petugas=False
+        )
+        self.petugas = buat_petugas(1)
+        buat_presensi(self.petugas)
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def test_metrik_per_nama_url(self):
+        for _ in range(3):
+            self.api.get('/api/admin/presensi/')
+        data = metrics_registry.snapshot()['admin-presensi-list']
+        self.assertEqual(data['count'], 3)
+        self.assertGreater(data['queries'][0.5], 0)
+        self.assertGreater(data['render_sum'], 0)
+        self.assertGreaterEqual(data['latency'][0.99], data['latency'][0.5])
+
+        response = self.api.get('/api/admin/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('satgas_request_latency_seconds_count{view="admin-presensi-list"} 3', body)
+        self.assertIn('satgas_request_queries{view="admin-presensi-list",quantile="0.99"}', body)
+        self.assertIn('satgas_request_serialize_seconds_total{view="admin-presensi-list"}', body)
+
+    def test_waktu_serializer_dipisah_dari_render(self):
+        to_representation = serializers.Serializer.to_representation
+
+        def lambat(serializer, instance):
+            time.sleep(0.05)
+            return to_representation(serializer, instance)
+
+        with mock.patch.object(serializers.Serializer, 'to_representation', lambat):
+            self.api.get('/api/admin/presensi/')
+        data = metrics_registry.snapshot()['admin-presensi-list']
+        self.assertGreaterEqual(data['serialize_sum'], 0.05)
+        self.assertLess(data['render_sum'], 0.05)
+
+    async def test_request_asgi_terukur(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get('/api/admin/presensi/')
+        self.assertEqual(response.status_code, 200)
+        data = metrics_registry.snapshot()['admin-presensi-list']
+        self.assertEqual(data['count'], 1)
+        self.assertGreater(data['queries'][0.5], 0)
+        self.assertGreater(data['serialize_sum'], 0)
+
+    def test_endpoint_hanya_untuk_admin(self):
+        api = APIClient()
+        api.force_authenticate(self.petugas)
+        self.assertEqual(api.get('/api/admin/metrics/').status_code, 403)
+
+    @override_settings(REQUEST_METRICS_SLOW_QUERY_MS=0, REQUEST_METRICS_MAX_QUERIES=0)
+    def test_query_lambat_dicatat_dengan_asal(self):
+        with self.assertLogs('core.metrics', level='WARNING') as logs:
+            self.api.get('/api/admin/laporan/harian/')
+        output = '\n'.join(logs.output)
+        self.assertIn('Query lambat', output)
+        self.assertIn('core/rekap.py', output)
+        self.assertIn('admin/laporan/harian/', output)
+
+
+class JWTKlaimPeranTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        revocations.reset()
+        self.petugas = buat_petugas(1)
+        buat_presensi(self.petugas)
+
+    def tearDown(self):
+        revocations.reset()
+
+    def login(self):
+        response = self.client.post('/api/token/', {'email': 'petugas1@example.com', 'password': 'rahasia123'})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def get(self, url, access):
+        return self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def token_lama(self, access):
+        # Token yang terbit satu menit lalu (klaim iat hanya beresolusi detik)
+        token = AccessToken(access)
+        token['iat'] -= 60
+        return str(token)
+
+    @override_settings(LIVE_TRACK_BACKGROUND_FLUSH=False)
+    def test_request_tanpa_query_user(self):
+        access = self.login()['access']
+        self.petugas.refresh_from_db()
+        self.assertIsNotNone(self.petugas.last_login)
+
+        # Request pertama memuat daftar pencabutan; berikutnya tanpa query autentikasi
+        self.get('/api/presensi/', access)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.get('/api/presensi/', access)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertFalse(any(
+            'FROM "core_user"' in q['sql'] or 'core_tokenrevocation' in q['sql'] for q in ctx.captured_queries
+        ))
+
+        # Field di luar klaim tetap tersedia, dimuat sekali saat dibutuhkan
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.get('/api/user/profile/', access)
+        self.assertEqual(response.data['first_name'], 'Petugas1')
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        # Ping lokasi tidak menyentuh database sama sekali
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/location/ping/', {
+                'latitude': '-6.2', 'longitude': '106.8',
+            }, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        live_store.reset()
+
+    def test_nonaktif_dan_perubahan_peran_mencabut_token(self):
+        tokens = self.login()
+        self.assertEqual(self.get('/api/admin/metrics/', tokens['access']).status_code, 403)
+
+        # Jadi admin: token lama dicabut, refresh (pada detik yang sama) memberi klaim baru
+        self.petugas.is_admin = True
+        self.petugas.save()
+        self.assertEqual(self.get('/api/presensi/', self.token_lama(tokens['access'])).status_code, 401)
+        refreshed = self.client.post('/api/token/refresh/', {'refresh': tokens['refresh']}).data
+        self.assertEqual(self.get('/api/admin/metrics/', refreshed['access']).status_code, 200)
+
+        self.petugas.is_active = False
+        self.petugas.save()
+        self.assertEqual(self.get('/api/presensi/', self.token_lama(refreshed['access'])).status_code, 401)
+        response = self.client.post('/api/token/refresh/', {'refresh': refreshed['refresh']})
+        self.assertEqual(response.status_code, 401)
+
+    def test_patch_profil_tidak_menulis_ulang_peran_dari_token(self):
+        self.petugas.is_admin = True
+        self.petugas.save()
+        TokenRevocation.objects.all().delete()
+        revocations.reset()
+        access = self.login()['access']
+
+        # Diturunkan lagi; pencabutan tidak terlihat (mis. dicatat sebelum token terbit)
+        User.objects.filter(pk=self.petugas.pk).update(is_admin=False, is_active=False)
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        response = api.patch('/api/user/profile/', {'first_name': 'Baru'}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.petugas.refresh_from_db()
+        self.assertEqual(
+            (self.petugas.first_name, self.petugas.is_admin, self.petugas.is_active), ('Baru', False, False)
+        )
+
+    def test_pencabutan_dari_proses_lain(self):
+        access = self.token_lama(self.login()['access'])
+        self.assertEqual(self.get('/api/presensi/', access).status_code, 200)
+        # Dicabut oleh proses lain: hanya barisnya di database yang ada
+        TokenRevocation.objects.create(user_id=self.petugas.pk, revoked_at=timezone.now())
+        self.assertEqual(self.get('/api/presensi/', access).status_code, 200)
+        # Setelah interval muat ulang berlalu
+        revocations._loaded_at -= REVOCATION_REFRESH_SECONDS
+        self.assertEqual(self.get('/api/presensi/', access).status_code, 401)
+
+
+class DatabaseConfigTest(TestCase):
+    def test_profil_dari_environment(self):
+        from SatgasKeamananAPI.database import database_config
+
+        sqlite = database_config(None, '/data/db.sqlite3')
+        self.assertEqual((sqlite['NAME'], sqlite['OPTIONS']['transaction_mode']), ('/data/db.sqlite3', 'IMMEDIATE'))
+        self.assertEqual(database_config('sqlite:////srv/satgas.sqlite3')['NAME'], '/srv/satgas.sqlite3')
+
+        postgres = database_config('postgres://satgas:p%40ss@db:5432/satgas?sslmode=require', environ={})
+        self.assertEqual(
+            (postgres['ENGINE'], postgres['USER'], postgres['PASSWORD'], postgres['HOST'], postgres['PORT']),
+            ('django.db.backends.postgresql', 'satgas', 'p@ss', 'db', '5432')
+        )
+        # Pool hanya jika diminta eksplisit
+        self.assertEqual(postgres['OPTIONS'], {'sslmode': 'require'})
+        self.assertEqual(postgres['CONN_MAX_AGE'], 60)
+
+        dengan_pool = database_config('postgres://db/satgas', environ={'DB_POOL': '1', 'DB_CONN_MAX_AGE': '120'})
+        self.assertEqual(dengan_pool['OPTIONS'], {'pool': True})
+        self.assertEqual(dengan_pool['CONN_MAX_AGE'], 0)
+        self.assertEqual(
+            database_config('postgres://db/satgas', environ={'DB_CONN_MAX_AGE': '120'})['CONN_MAX_AGE'], 120
+        )
+        self.assertEqual(database_config('mysql://u:p@db/satgas', environ={})['CONN_MAX_AGE'], 60)
+        with self.assertRaises(ValueError):
+            database_config('oracle://db/satgas')
+
+    def test_sqlite_memakai_wal(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("khusus SQLite")
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class PenyimpananMediaTest(TestCase):
+    def setUp(self):
+        self.petugas = buat_petugas(1)
+        self.api = APIClient()
+        self.api.force_authenticate(self.petugas)
+
+    def test_nama_berdasarkan_hash_dan_deduplikasi(self):
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        from .storage import is_content_addressed
+
+        pertama = default_storage.save('laporan_photos/JPEG_1.jpg', ContentFile(b'isi foto'))
+        kedua = default_storage.save('laporan_photos/JPEG_retry.JPG', ContentFile(b'isi foto'))
+        self.assertEqual(pertama, kedua)
+        self.assertTrue(is_content_addressed(pertama))
+        self.assertRegex(pertama, r'^laporan_photos/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.jpg$')
+        folder = os.path.dirname(default_storage.path(pertama))
+        self.assertEqual(os.listdir(folder), [os.path.basename(pertama)])
+
+    def test_retry_presensi_tidak_menghapus_foto_pertama(self):
+        data = lambda: {'latitude': '-6.200000', 'longitude': '106.816666', 'selfie_photo': buat_gambar()}
+        self.assertEqual(self.api.post('/api/presensi/', data(), format='multipart').status_code, 201)
+        self.assertEqual(self.api.post('/api/presensi/', data(), format='multipart').status_code, 400)
+        presensi = Presensi.objects.get()
+        self.assertTrue(os.path.exists(presensi.selfie_photo.path))
+
+    def test_migrasi_file_lama(self):
+        lama = os.path.join(TEST_MEDIA_ROOT, 'user_petugas1@example.com')
+        os.makedirs(lama, exist_ok=True)
+        with open(os.path.join(lama, 'profile.jpg'), 'wb') as handle:
+            handle.write(b'foto profil')
+        User.objects.filter(pk=self.petugas.pk).update(profile_picture='user_petugas1@example.com/profile.jpg')
+        presensi = buat_presensi(self.petugas, selfie_photo='presensi_photos/hilang.jpg')
+
+        output = io.StringIO()
+        call_command('migrate_media_storage', stdout=output, stderr=io.StringIO())
+        self.assertIn('1 file dipindahkan', output.getvalue())
+
+        self.petugas.refresh_from_db()
+        self.assertTrue(self.petugas.profile_picture.name.startswith('profile_pictures/'))
+        with self.petugas.profile_picture.open('rb') as handle:
+            self.assertEqual(handle.read(), b'foto profil')
+        self.assertFalse(os.path.exists(lama))
+        # File yang tidak ada dibiarkan apa adanya
+        presensi.refresh_from_db()
+        self.assertEqual(presensi.selfie_photo.name, 'presensi_photos/hilang.jpg')
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class MediaTerproteksiTest(TestCase):
+    def setUp(self):
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+
+        self.pemilik = buat_petugas(1)
+        self.lain = buat_petugas(2)
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='rahasia123', is_admin=True, is_petugas=False
+        )
+        self.isi = b'0123456789' * 10
+        name = default_storage.save('presensi_photos/selfie.jpg', ContentFile(self.isi))
+        buat_presensi(self.pemilik, selfie_photo=name)
+        self.url = f'/media/{name}'
+
+    def get(self, user, **headers):
+        api = APIClient()
+        if user:
+            api.force_authenticate(user)
+        return api.get(self.url, **headers)
+
+    def test_hanya_pemilik_dan_admin(self):
+        response = self.get(self.pemilik)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.isi)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.get(self.admin).status_code, 200)
+        self.assertEqual(self.get(self.lain).status_code, 404)
+        self.assertIn(self.get(None).status_code, (401, 403))
+        self.assertEqual(self.get(self.admin, HTTP_ACCEPT='image/webp').status_code, 200)
+
+    def test_range_dan_conditional_get(self):
+        etag = self.get(self.pemilik)['ETag']
+        self.assertEqual(self.get(self.pemilik, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        response = self.get(self.pemilik, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(b''.join(response.streaming_content), self.isi[10:20])
+        self.assertEqual(b''.join(self.get(self.pemilik, HTTP_RANGE='bytes=-5').streaming_content), self.isi[-5:])
+        self.assertEqual(self.get(self.pemilik, HTTP_RANGE='bytes=500-').status_code, 416)
+        # If-Range yang tidak cocok: kirim file utuh
+        self.assertEqual(self.get(self.pemilik, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"lama"').status_code, 200)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_x_accel_redirect(self):
+        response = self.get(self.pemilik)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.url[len('/media/'):])
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+
+
+@override_settings(LIVE_TRACK_BACKGROUND_FLUSH=False, LIVE_TRACK_SAMPLE_SECONDS=60)
+class LiveLocationTest(TestCase):
+    def setUp(self):
+        live_store.reset()
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='rahasia123', is_admin=True, is_petugas=False
+        )
+        self.admin_api = APIClient()
+        self.admin_api.force_authenticate(self.admin)
+        self.andi, self.budi = buat_petugas(1), buat_petugas(2)
+
+    def tearDown(self):
+        live_store.reset()
+
+    def ping(self, petugas, lat, lon, detik_lalu=0):
+        api = APIClient()
+        api.force_authenticate(petugas)
+        recorded = (timezone.now() - timedelta(seconds=detik_lalu)).isoformat()
+        return api.post('/api/location/ping/', {
+            'latitude': lat, 'longitude': lon, 'accuracy': 8, 'recorded_at': recorded
+        }, format='json')
+
+    def test_ping_tanpa_query_dan_riwayat_di_down_sample(self):
+        with CaptureQueriesContext(connection) as ctx:
+            for detik in range(300, 0, -10):
+                self.assertEqual(self.ping(self.andi, -6.2, 106.8, detik_lalu=detik).status_code, 204)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        # Ping yang lebih tua dari posisi terakhir diabaikan
+        self.ping(self.andi, -7.0, 107.0, detik_lalu=3600)
+
+        # 30 ping dalam 5 menit di tempat yang sama -> satu titik per menit
+        self.assertEqual(live_store.flush(), 5)
+        self.assertEqual(LocationTrack.objects.filter(petugas=self.andi).count(), 5)
+        self.assertEqual(live_store.flush(), 0)
+
+        # Berpindah jauh: langsung dicatat
+        self.ping(self.andi, -6.21, 106.8)
+        self.assertEqual(live_store.flush(), 1)
+
+    def test_flush_membuang_petugas_terhapus(self):
+        hilang = buat_petugas(3)
+        live_store.record(self.andi.pk, -6.2, 106.8)
+        live_store.record(hilang.pk, -6.2, 106.8)
+        hilang.delete()
+        with self.assertLogs('core.tracking', level='WARNING'):
+            self.assertEqual(live_store.flush(), 1)
+        # Tidak dikembalikan ke antrean: flush berikutnya kosong
+        self.assertEqual(live_store.flush(), 0)
+        self.assertEqual(list(LocationTrack.objects.values_list('petugas_id', flat=True)), [self.andi.pk])
+
+    @override_settings(LIVE_TRACK_MAX_PENDING=3)
+    def test_antrean_riwayat_dibatasi(self):
+        with self.assertLogs('core.tracking', level='WARNING'):
+            for menit in range(5, 0, -1):
+                live_store.record(self.andi.pk, -6.2, 106.8, recorded_at=time.time() - menit * 60)
+        self.assertEqual(live_store.flush(), 3)
+        # Yang dibuang adalah titik tertua
+        oldest = LocationTrack.objects.order_by('timestamp').first().timestamp
+        self.assertGreater(oldest, timezone.now() - timedelta(minutes=3, seconds=30))
+
+    def test_live_map_dengan_viewport(self):
+        self.ping(self.andi, -6.2, 106.8)
+        self.ping(self.budi, -6.9, 107.6)
+        # Petugas yang ping-nya diterima proses lain hanya terlihat dari riwayat di database
+        lain = buat_petugas(3)
+        LocationTrack.objects.create(petugas=lain, timestamp=timezone.now(), latitude='-6.190000', longitude='106.810000')
+
+        response = self.admin_api.get('/api/admin/live-map/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 3)
+
+        response = self.admin_api.get('/api/admin/live-map/?bbox=-6.3,106.7,-6.1,106.9')
+        self.assertEqual({o['petugas_id'] for o in response.data['officers']}, {self.andi.pk, lain.pk})
+        self.assertEqual(self.admin_api.get('/api/admin/live-map/?bbox=1,2,3').status_code, 400)
+
+        api = APIClient()
+        api.force_authenticate(self.andi)
+        self.assertEqual(api.get('/api/admin/live-map/').status_code, 403)
+
+
+class PencarianLaporanTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='rahasia123', is_admin=True, is_petugas=False
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+        self.petugas = buat_petugas(1)
+
+    def buat_laporan(self, note, location_note='Pos Utama'):
+        return Laporan.objects.create(
+            petugas=self.petugas, latitude='-6.2', longitude='106.8',
+            location_note=location_note, note=note, photo='laporan_photos/test.jpg'
+        )
+
+    def cari(self, q):
+        return [laporan.pk for laporan in search_laporan(Laporan.objects.all(), q)]
+
+    def test_index_ikut_insert_update_delete(self):
+        laporan = self.buat_laporan('Pintu gerbang belakang tidak terkunci')
+        self.buat_laporan('Lampu parkir mati', location_note='Gerbang Utama')
+        self.assertEqual(len(self.cari('gerbang')), 2)
+        # Kata terakhir dicocokkan sebagai awalan
+        self.assertEqual(self.cari('pintu gerb'), [laporan.pk])
+
+        laporan.note = 'Pagar rusak'
+        laporan.save()
+        self.assertEqual(self.cari('pintu'), [])
+        self.assertEqual(self.cari('pagar'), [laporan.pk])
+
+        # Update massal tanpa signal tetap ter-index lewat trigger
+        Laporan.objects.filter(pk=laporan.pk).update(note='Kaca pecah')
+        self.assertEqual(self.cari('kaca'), [laporan.pk])
+
+        laporan.delete()
+        self.assertEqual(self.cari('kaca'), [])
+
+    def test_urut_relevansi_dan_highlight_aman(self):
+        sekali = self.buat_laporan('Laporan patroli malam, pintu gudang aman dan lampu menyala normal')
+        dua_kali = self.buat_laporan('Pintu <b>gerbang</b> rusak', location_note='Gerbang Barat')
+
+        response = self.api.get('/api/admin/laporan/', {'q': 'gerbang'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data['results']], [dua_kali.pk])
+        highlight = response.data['results'][0]['highlight']
+        self.assertEqual(highlight['note'], 'Pintu &lt;b&gt;<mark>gerbang</mark>&lt;/b&gt; rusak')
+        self.assertEqual(highlight['location_note'], '<mark>Gerbang</mark> Barat')
+
+        self.buat_laporan('Pintu pintu pintu terbuka')
+        results = self.api.get('/api/admin/laporan/', {'q': 'pintu'}).data['results']
+        self.assertEqual(results[-1]['id'], sekali.pk)
+        self.assertEqual(results, sorted(results, key=lambda item: item['rank']))
+
+    def test_input_bukan_sintaks_fts(self):
+        self.buat_laporan('Pintu gerbang rusak')
+        for q in ['pintu OR', '"gerbang', 'NEAR(pintu', 'note:pintu*', '-', '"pintu gerbang"']:
+            response = self.api.get('/api/admin/laporan/', {'q': q})
+            self.assertEqual(response.status_code, 200, q)
+        self.assertEqual(self.cari('"gerbang pintu"'), [])
+        self.assertEqual(len(self.cari('"pintu gerbang"')), 1)
+
+    def test_halaman_tanpa_count(self):
+        for nomor in range(5):
+            self.buat_laporan(f'Pintu gerbang {nomor}')
+        first = self.api.get('/api/admin/laporan/', {'q': 'gerbang', 'page_size': 3})
+        self.assertEqual(len(first.data['results']), 3)
+        self.assertIsNone(first.data['previous'])
+        second = self.api.get(first.data['next'])
+        self.assertEqual(len(second.data['results']), 2)
+        self.assertIsNone(second.data['next'])
+
+    def test_halaman_web_dengan_pencarian(self):
+        self.buat_laporan('Pintu gerbang rusak')
+        self.buat_laporan('Lampu mati')
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('web-laporan-list'), {'q': 'gerbang'})
+        self.assertEqual(len(response.context['laporan_list']), 1)
+        self.assertContains(response, '<mark>gerbang</mark>')
+
+    def test_daftar_alarm_web_mengabaikan_q(self):
+        # Index FTS hanya untuk Laporan; id alarm tidak boleh dicocokkan ke rowid laporan
+        self.buat_laporan('Pintu gerbang rusak')
+        alarm = EmergencyAlarm.objects.create(
+            petugas=self.petugas, category='maling', latitude='-6.2', longitude='106.8'
+        )
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('web-alarm-list'), {'q': 'gerbang'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item.pk for item in response.context['alarm_list']], [alarm.pk])
+
+    def test_trigger_dipasang_ulang(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER core_laporan_fts_ai')
+        self.assertTrue(ensure_fts(connection))
+        self.assertFalse(ensure_fts(connection))
+        laporan = self.buat_laporan('Kebocoran air')
+        self.assertEqual(self.cari('kebocoran'), [laporan.pk])
+
+
+@override_settings(
+    NOTIFICATION_TRANSPORT='core.notifications.FakeTransport',
+    ALARM_ESCALATION_STEPS=[(60, 'renotify'), (120, 'raise_severity'), (180, 'page_supervisors')],
+    ALARM_EXPIRE_AFTER=600,
+)
+class EskalasiAlarmTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        FakeTransport.reset()
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='rahasia123', is_admin=True, is_petugas=False
+        )
+        self.pemicu, self.rekan = buat_petugas(1), buat_petugas(2)
+        for user in (self.admin, self.pemicu, self.rekan):
+            DeviceToken.objects.create(user=user, token=f'token-{user.pk}')
+
+    def picu_alarm(self):
+        api = APIClient()
+        api.force_authenticate(self.pemicu)
+        response = api.post('/api/alarm/', {
+            'category': 'maling', 'latitude': '-6.200000', 'longitude': '106.800000'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        alarm = EmergencyAlarm.objects.get(pk=response.data['id'])
+        return alarm, FakeClock(alarm.timestamp)
+
+    def test_eskalasi_bertahap_lalu_kedaluwarsa(self):
+        alarm, clock = self.picu_alarm()
+        scheduler = EscalationScheduler(clock)
+        self.assertEqual(scheduler.tick(), 0)
+        self.assertEqual(len(scheduler), 1)
+
+        clock.advance(seconds=61)
+        self.assertEqual(scheduler.tick(), 1)
+        alarm.refresh_from_db()
+        self.assertEqual((alarm.escalation_level, alarm.severity), (1, 'normal'))
+        self.assertEqual(NotificationJob.objects.filter(kind='alarm_escalated').count(), 1)
+
+        clock.advance(seconds=60)
+        scheduler.tick()
+        alarm.refresh_from_db()
+        self.assertEqual(alarm.severity, 'high')
+
+        clock.advance(seconds=60)
+        scheduler.tick()
+        page = NotificationJob.objects.get(kind='alarm_page')
+        self.assertEqual(page.payload['audience'], 'admin')
+        NotificationJob.objects.exclude(pk=page.pk).delete()
+        run_pending_jobs()
+        self.assertEqual(FakeTransport.sent[0][0], [f'token-{self.admin.pk}'])
+
+        # Tidak ada langkah lagi sampai kedaluwarsa
+        self.assertEqual(scheduler.next_deadline(), alarm.timestamp + timedelta(seconds=600))
+        clock.advance(seconds=420)
+        self.assertEqual(scheduler.tick(), 1)
+        alarm.refresh_from_db()
+        self.assertEqual(alarm.status, 'expired')
+        self.assertIsNone(alarm.next_escalation_at)
+        self.assertEqual(len(scheduler), 0)
+
+    def test_eskalasi_menginvalidasi_stats_dan_menerbitkan_event(self):
+        alarm, clock = self.picu_alarm()
+        scheduler = EscalationScheduler(clock)
+        scheduler.tick()
+        self.assertEqual(get_dashboard_stats()['active_alarms'], 1)
+        version = get_stats_version()
+
+        clock.advance(seconds=3600)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(scheduler.tick(), 1)
+        self.assertGreater(get_stats_version(), version)
+        self.assertEqual(get_dashboard_stats()['active_alarms'], 0)
+        event = AlarmEvent.objects.latest('pk')
+        self.assertEqual((event.data['id'], event.data['transition']), (alarm.pk, 'expired'))
+
+    def test_tenggat_terlewat_diproses_dalam_satu_tick(self):
+        alarm, clock = self.picu_alarm()
+        scheduler = EscalationScheduler(clock)
+        clock.advance(seconds=200)
+        self.assertEqual(scheduler.tick(), 3)
+        alarm.refresh_from_db()
+        self.assertEqual((alarm.escalation_level, alarm.severity), (3, 'high'))
+
+        # Scheduler mati lebih lama dari batas: langsung kedaluwarsa tanpa notifikasi ulang
+        alarm2 = EmergencyAlarm.objects.create(
+            petugas=self.rekan, category='medis', latitude='-6.2', longitude='106.8',
+            next_escalation_at=initial_deadline(),
+        )
+        clock.advance(seconds=3600)
+        jobs = NotificationJob.objects.count()
+        self.assertEqual(scheduler.tick(), 2)
+        self.assertEqual(NotificationJob.objects.count(), jobs)
+        self.assertEqual(set(EmergencyAlarm.objects.values_list('status', flat=True)), {'expired'})
+        self.assertEqual(EmergencyAlarm.objects.get(pk=alarm2.pk).escalation_level, 0)
+
+    def test_run_tetap_berjalan_saat_tick_gagal(self):
+        alarm, clock = self.picu_alarm()
+
+        class SchedulerGagalSekali(EscalationScheduler):
+            ticks = 0
+
+            def tick(self):
+                self.ticks += 1
+                if self.ticks == 1:
+                    raise RuntimeError("database tidak tersedia")
+                return super().tick()
+
+        scheduler = SchedulerGagalSekali(clock)
+        clock.advance(seconds=61)
+        with self.assertLogs('core.escalation', level='ERROR'):
+            scheduler.run(poll_interval=1, stop=lambda: scheduler.ticks >= 2)
+        alarm.refresh_from_db()
+        self.assertEqual(alarm.escalation_level, 1)
+
+    def test_acknowledge_web_hanya_menulis_field_acknowledge(self):
+        alarm, clock = self.picu_alarm()
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(reverse('web-alarm-detail', args=[alarm.pk]), {'action': 'acknowledge'})
+        update = next(q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "core_emergencyalarm"'))
+        self.assertIn('"acknowledged_at"', update)
+        self.assertNotIn('"escalation_level"', update)
+        self.assertNotIn('"severity"', update)
+
+    def test_acknowledge_menghentikan_eskalasi(self):
+        alarm, clock = self.picu_alarm()
+        scheduler = EscalationScheduler(clock)
+        scheduler.tick()
+
+        api = APIClient()
+        api.force_authenticate(self.admin)
+        response = api.post(f'/api/alarm/{alarm.pk}/acknowledge/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.data['acknowledged_at'])
+
+        clock.advance(seconds=300)
+        self.assertEqual(scheduler.tick(), 0)
+        self.assertFalse(NotificationJob.objects.exclude(kind='alarm_created').exists())
+        clock.advance(seconds=301)
+        self.assertEqual(scheduler.tick(), 1)
+        alarm.refresh_from_db()
+        self.assertEqual(alarm.status, 'expired')
+
+        # Alarm yang diselesaikan admin tidak lagi dipantau
+        self.client.force_login(self.admin)
+        lain = EmergencyAlarm.objects.create(
+            petugas=self.rekan, category='medis', latitude='-6.2', longitude='106.8',
+            next_escalation_at=initial_deadline(),
+        )
+        scheduler.tick()
+        self.client.post(reverse('web-alarm-detail', args=[lain.pk]), {'status': 'handled'})
+        lain.refresh_from_db()
+        self.assertIsNone(lain.next_escalation_at)
+        clock.advance(seconds=600)
+        self.assertEqual(scheduler.tick(), 0)
+
+    def test_tick_tidak_scan_tabel_alarm(self):
+        for nomor in range(30):
+            EmergencyAlarm.objects.create(
+                petugas=self.rekan, category='maling', latitude='-6.2', longitude='106.8', status='handled'
+            )
+        alarm, clock = self.picu_alarm()
+        scheduler = EscalationScheduler(clock)
+        scheduler.tick()
+        self.assertEqual(len(scheduler), 1)
+
+        # Tanpa tenggat jatuh tempo: satu query kecil untuk alarm baru
+        clock.advance(seconds=10)
+        with CaptureQueriesContext(connection) as ctx:
+            scheduler.tick()
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn('"id" >', ctx.captured_queries[0]['sql'])
+
+
+class HeatmapAnalitikTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='rahasia123', is_admin=True, is_petugas=False
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+        self.petugas = buat_petugas(1)
+        self.today = timezone.localdate()
+        # Senin pekan lalu
+        self.senin = self.today - timedelta(days=self.today.weekday() + 7)
+
+    def pada(self, obj, hari, jam):
+        # timestamp auto_now_add: geser lewat update() (tanpa signal)
+        waktu = day_bounds(hari)[0] + timedelta(hours=jam, minutes=15)
+        type(obj).objects.filter(pk=obj.pk).update(timestamp=waktu)
+        obj.refresh_from_db()
+        return obj
+
+    def buat_laporan(self, hari, jam, latitude='-6.200000', longitude='106.816666', priority='medium'):
+        laporan = Laporan.objects.create(
+            petugas=self.petugas, latitude=latitude, longitude=longitude, location_note='Pos',
+            note='Cek', photo='laporan_photos/test.jpg', priority=priority,
+        )
+        return self.pada(laporan, hari, jam)
+
+    def buat_alarm(self, hari, jam, category='kebakaran'):
+        alarm = EmergencyAlarm.objects.create(
+            petugas=self.petugas, category=category, latitude='-6.200000', longitude='106.816666', status='handled'
+        )
+        return self.pada(alarm, hari, jam)
+
+    def heatmap(self, **params):
+        response = self.api.get('/api/admin/analytics/heatmap/', {
+            'start': self.senin.isoformat(), 'end': self.today.isoformat(), **params
+        })
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def test_binning_hari_jam_dan_sel(self):
+        self.buat_laporan(self.senin, 8)
+        self.buat_laporan(self.senin, 8, priority='high')
+        self.buat_laporan(self.senin + timedelta(days=2), 22, latitude='-7.250000', longitude='112.750000')
+        self.buat_alarm(self.senin + timedelta(days=6), 0)
+
+        data = self.heatmap()
+        self.assertEqual(data['total'], 4)
+        self.assertEqual(data['matrix'][0][8], 2)
+        self.assertEqual(data['matrix'][2][22], 1)
+        self.assertEqual(data['matrix'][6][0], 1)
+        self.assertEqual(data['cell_count'], 2)
+        jakarta = data['cells'][0]
+        self.assertEqual((jakarta['count'], len(jakarta['cell'])), (3, 6))
+        self.assertEqual((jakarta['hours'][8], jakarta['weekdays'][0], jakarta['weekdays'][6]), (2, 2, 1))
+        self.assertAlmostEqual(jakarta['latitude'], -6.2, places=2)
+
+        # Filter kategori/prioritas, hari, jam dan presisi
+        self.assertEqual(self.heatmap(category='laporan')['total'], 3)
+        self.assertEqual(self.heatmap(category='kebakaran,maling')['total'], 1)
+        self.assertEqual(self.heatmap(priority='high')['total'], 1)
+        self.assertEqual(self.heatmap(weekday=2)['total'], 1)
+        self.assertEqual(self.heatmap(hour=8)['total'], 2)
+        self.assertEqual(len(self.heatmap(precision=3)['cells'][0]['cell']), 3)
+        self.assertEqual(len(self.heatmap(limit=1)['cells']), 1)
+
+    def test_rollup_disimpan_dan_dipakai_ulang(self):
+        laporan = self.buat_laporan(self.senin, 10)
+        self.buat_laporan(self.today, 0)
+
+        self.heatmap()
+        self.assertTrue(IncidentRollupDay.objects.filter(date=self.senin).exists())
+        # Hari ini tidak disimpan
+        self.assertFalse(IncidentRollupDay.objects.filter(date=self.today).exists())
+        self.assertEqual(IncidentDayRollup.objects.get().total, 1)
+
+        # Rollup sudah lengkap: hanya baca rollup + data mentah hari ini
+        with CaptureQueriesContext(connection) as ctx:
+            data = incident_heatmap(self.senin, self.today)
+        self.assertEqual(data['total'], 2)
+        self.assertFalse(any('INSERT' in query['sql'] for query in ctx.captured_queries))
+
+        # Hapus insiden hari lalu: hari itu dihitung ulang
+        laporan.delete()
+        self.assertFalse(IncidentRollupDay.objects.filter(date=self.senin).exists())
+        self.assertEqual(self.heatmap()['total'], 1)
+        self.assertFalse(IncidentDayRollup.objects.exists())
+
+    def test_rollup_bentrok_dengan_proses_lain(self):
+        self.buat_laporan(self.senin, 10)
+        self.buat_laporan(self.senin + timedelta(days=1), 11)
+
+        def proses_lain_lebih_dulu(start, end):
+            # Proses lain commit rollup yang sama; penulisan di proses ini bentrok
+            build_rollups(start, end)
+            raise IntegrityError('UNIQUE constraint failed')
+
+        with mock.patch('core.analytics.build_rollups', side_effect=proses_lain_lebih_dulu):
+            data = incident_heatmap(self.senin, self.today)
+        # Dihitung dari data mentah, rollup proses lain tidak ikut terhitung dua kali
+        self.assertEqual(data['total'], 2)
+        self.assertEqual(incident_heatmap(self.senin, self.today)['total'], 2)
+
+    def test_rebuild_command(self):
+        self.buat_laporan(self.senin, 3)
+        call_command('rebuild_incident_rollups', days=30, stdout=io.StringIO())
+        self.assertEqual(IncidentRollupDay.objects.count(), 30)
+        self.assertEqual(IncidentDayRollup.objects.get(date=self.senin).total, 1)
+
+    def test_parameter_salah_dan_izin(self):
+        for params in (
+            {'start': '2025-13-01'}, {'start': self.today.isoformat(), 'end': self.senin.isoformat()},
+            {'start': '2020-01-01'}, {'precision': 9}, {'weekday': 7}, {'hour': 'x'},
+        ):
+            response = self.api.get('/api/admin/analytics/heatmap/', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.data)
+
+        self.api.force_authenticate(self.petugas)
+        self.assertEqual(self.api.get('/api/admin/analytics/heatmap/').status_code, 403)
+
+
+class JadwalShiftTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='rahasia123', is_admin=True, is_petugas=False
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+        self.andi, self.budi, self.citra = buat_petugas(1), buat_petugas(2), buat_petugas(3)
+        self.today = timezone.localdate()
+        self.awal = Shift.objects.create(name='Dini', start_time='00:00', end_time='08:00', late_after_minutes=0)
+        self.akhir = Shift.objects.create(name='Malam', start_time='23:59', end_time='07:00')
+
+    def jadwal(self, petugas, shift, hari='setiap', **extra):
+        response = self.api.post('/api/admin/shift-schedules/', dict({
+            'petugas': petugas.pk, 'shift': shift.pk, 'weekdays': hari,
+            'valid_from': (self.today - timedelta(days=7)).isoformat(),
+        }, **extra), format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def presensi_api(self, petugas):
+        api = APIClient()
+        api.force_authenticate(petugas)
+        return api.post('/api/presensi/', {
+            'latitude': '-6.2', 'longitude': '106.8', 'selfie_photo': buat_gambar(),
+        }, format='multipart')
+
+    def test_daftar_shift_jadwal_dan_pengecualian(self):
+        response = self.api.get('/api/admin/shifts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['name'] for item in response.data], ['Dini', 'Malam'])
+
+        lama = self.jadwal(self.andi, self.awal, valid_from=(self.today - timedelta(days=30)).isoformat())
+        baru = self.jadwal(self.budi, self.akhir)
+        response = self.api.get('/api/admin/shift-schedules/', {'page_size': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data['results']], [baru['id']])
+        response = self.api.get(response.data['next'])
+        self.assertEqual([item['id'] for item in response.data['results']], [lama['id']])
+        response = self.api.get('/api/admin/shift-schedules/', {'petugas': self.andi.pk})
+        self.assertEqual([item['id'] for item in response.data['results']], [lama['id']])
+
+        ShiftException.objects.create(petugas=self.andi, date=self.today, note='cuti')
+        response = self.api.get('/api/admin/shift-exceptions/', {'date': self.today.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_tanpa_jadwal_semua_petugas_ditunggu(self):
+        response = self.api.get('/api/admin/laporan/harian/')
+        self.assertEqual(response.data['total_petugas'], 3)
+        self.assertIsNone(response.data['data'][0]['shift'])
+        self.assertEqual(get_dashboard_stats()['belum_hadir'], 3)
+
+    def test_jadwal_berulang_dan_pengecualian(self):
+        self.assertEqual(self.jadwal(self.andi, self.awal)['weekdays'], WEEKDAY_NAMES)
+        hari_lain = WEEKDAY_NAMES[(self.today.weekday() + 1) % 7]
+        self.jadwal(self.budi, self.awal, hari_lain)
+        self.jadwal(self.citra, self.akhir)
+
+        response = self.api.get('/api/admin/laporan/harian/')
+        self.assertEqual(
+            {item['email']: item['shift']['name'] for item in response.data['data']},
+            {self.andi.email: 'Dini', self.citra.email: 'Malam'},
+        )
+        self.assertEqual(RosterDay.objects.get(date=self.today).expected, 2)
+        stats = get_dashboard_stats()
+        self.assertEqual((stats['terjadwal_today'], stats['belum_hadir']), (2, 2))
+
+        # Citra cuti hari ini, Budi menggantikan dengan shift Malam
+        ShiftException.objects.create(petugas=self.citra, date=self.today, note='Cuti')
+        ShiftException.objects.create(petugas=self.budi, date=self.today, shift=self.akhir)
+        # Penanda dihapus, index dibangun ulang saat dibaca
+        self.assertFalse(RosterDay.objects.filter(date=self.today).exists())
+        response = self.api.get('/api/admin/laporan/harian/')
+        self.assertEqual(
+            {item['email']: item['shift']['name'] for item in response.data['data']},
+            {self.andi.email: 'Dini', self.budi.email: 'Malam'},
+        )
+
+        # Petugas nonaktif keluar dari roster
+        self.andi.is_active = False
+        self.andi.save()
+        self.assertEqual(self.api.get('/api/admin/laporan/harian/').data['total_petugas'], 1)
+
+    @override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+    def test_deteksi_terlambat(self):
+        self.jadwal(self.andi, self.awal)
+        self.jadwal(self.budi, self.akhir)
+
+        self.assertEqual(self.presensi_api(self.andi).data['terlambat_menit'], 1 + (
+            timezone.now() - day_bounds(self.today)[0]
+        ).seconds // 60)
+        self.assertEqual(self.presensi_api(self.budi).data['terlambat_menit'], 0)
+        # Tidak terjadwal: tidak dinilai
+        self.assertIsNone(self.presensi_api(self.citra).data['terlambat_menit'])
+
+        self.assertEqual(get_daily_summary(self.today).terlambat, 1)
+        rebuild_daily_summaries(self.today, self.today)
+        self.assertEqual(get_daily_summary(self.today).terlambat, 1)
+        response = self.api.get('/api/admin/laporan/harian/')
+        self.assertEqual(response.data['petugas_terlambat'], 1)
+        self.assertEqual(response.data['petugas_belum_hadir'], 0)
+
+    def test_index_dibaca_dengan_query_tetap(self):
+        def petugas_baru(nomor_list):
+            return User.objects.bulk_create([
+                User(email=f'petugas{nomor}@example.com', first_name=f'Petugas{nomor}') for nomor in nomor_list
+            ])
+
+        for petugas in petugas_baru(range(4, 24)):
+            self.jadwal(petugas, self.awal)
+        self.api.get('/api/admin/laporan/harian/')
+        with CaptureQueriesContext(connection) as sedikit:
+            self.api.get('/api/admin/laporan/harian/')
+        for petugas in petugas_baru(range(24, 64)):
+            self.jadwal(petugas, self.akhir)
+        self.api.get('/api/admin/laporan/harian/')
+        with CaptureQueriesContext(connection) as banyak:
+            response = self.api.get('/api/admin/laporan/harian/')
+        self.assertEqual(response.data['total_petugas'], 60)
+        self.assertEqual(len(banyak.captured_queries), len(sedikit.captured_queries))
+        # Jadwal tidak dievaluasi ulang setelah index ada
+        self.assertFalse(any('core_shiftschedule' in q['sql'] for q in banyak.captured_queries))
+
+    def test_import_massal_csv(self):
+        petugas = User.objects.bulk_create([
+            User(email=f'petugas{nomor}@example.com', first_name=f'Petugas{nomor}') for nomor in range(10, 310)
+        ])
+        baris = ['email,shift,hari,mulai,sampai'] + [
+            f'{p.email},{"Dini" if i % 2 else "malam"},senin-jumat,{self.today.isoformat()},' for i, p in enumerate(petugas)
+        ]
+        berkas = SimpleUploadedFile('roster.csv', '\n'.join(baris).encode(), content_type='text/csv')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.post('/api/admin/roster/import/', {'file': berkas}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 300)
+        self.assertLess(len(ctx.captured_queries), 15)
+        self.assertEqual(ShiftSchedule.objects.filter(weekdays=0b0011111).count(), 300)
+
+        # Satu baris salah: tidak ada yang disimpan
+        response = self.api.post('/api/admin/roster/import/', {'rows': [
+            {'email': self.andi.email, 'shift': 'Dini', 'hari': 'senin', 'mulai': self.today.isoformat()},
+            {'email': 'x@example.com', 'shift': 'Dini', 'hari': 'libur', 'mulai': '2025-02-30'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['errors']), 1)
+        self.assertTrue(response.data['errors'][0].startswith('Baris 3'))
+        self.assertFalse(ShiftSchedule.objects.filter(petugas=self.andi).exists())
+
+        # replace: jadwal lama diakhiri sehari sebelum jadwal baru
+        besok = self.today + timedelta(days=1)
+        response = self.api.post('/api/admin/roster/import/', {'replace': True, 'rows': [
+            {'email': petugas[0].email, 'shift': 'Dini', 'hari': 'sabtu,minggu', 'mulai': besok.isoformat()},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        lama, baru = ShiftSchedule.objects.filter(petugas=petugas[0]).order_by('valid_from')
+        self.assertEqual((lama.valid_until, baru.weekdays), (self.today, 0b1100000))
+
+        self.api.force_authenticate(self.andi)
+        self.assertEqual(self.api.post('/api/admin/roster/import/', {'rows': []}, format='json').status_code, 403)
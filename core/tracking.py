@@ -0,0 +1,215 @@
+# core/tracking.py
+"""
+Pelacakan posisi petugas secara langsung.
+
+Ping dari aplikasi (tiap beberapa detik) hanya memperbarui posisi terakhir per
+petugas di memori proses, tanpa query. Riwayatnya di-down-sample (paling
+sering satu titik per LIVE_TRACK_SAMPLE_SECONDS, atau lebih cepat jika
+berpindah jauh) lalu ditulis massal ke LocationTrack oleh thread latar setiap
+LIVE_TRACK_FLUSH_SECONDS. Antrean dibatasi LIVE_TRACK_MAX_PENDING titik (yang
+tertua dibuang) agar database yang bermasalah tidak menghabiskan memori.
+
+Snapshot peta (/api/admin/live-map/) menggabungkan posisi di memori dengan
+titik riwayat terbaru di database, sehingga petugas yang ping-nya diterima
+proses server lain tetap tampil (dengan jeda paling lama satu interval sampel).
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .geo import haversine_km
+from .models import LocationTrack, User
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_SECONDS = 60
+DEFAULT_FLUSH_SECONDS = 10
+# Titik disimpan lebih cepat dari interval sampel jika petugas berpindah sejauh ini
+SAMPLE_DISTANCE_KM = 0.2
+# Posisi yang lebih tua dari ini tidak ditampilkan di peta
+DEFAULT_MAX_AGE = timedelta(minutes=15)
+FLUSH_BATCH_SIZE = 1000
+DEFAULT_MAX_PENDING = 50_000
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class LivePosition:
+    __slots__ = ('latitude', 'longitude', 'accuracy', 'recorded_at')
+
+    def __init__(self, latitude, longitude, accuracy, recorded_at):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.accuracy = accuracy
+        # epoch detik (float), lebih ringkas dari datetime
+        self.recorded_at = recorded_at
+
+
+class LiveLocationStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest = {}
+        # petugas_id -> LivePosition terakhir yang masuk antrean riwayat
+        self._sampled = {}
+        self._pending = deque()
+        self._flusher = None
+
+    def reset(self):
+        with self._lock:
+            self._latest = {}
+            self._sampled = {}
+            self._pending = deque()
+
+    def record(self, petugas_id, latitude, longitude, accuracy=None, recorded_at=None):
+        """Simpan ping; mengembalikan False jika lebih tua dari posisi yang sudah ada."""
+        position = LivePosition(float(latitude), float(longitude), accuracy, recorded_at or time.time())
+        with self._lock:
+            current = self._latest.get(petugas_id)
+            if current is not None and position.recorded_at < current.recorded_at:
+                return False
+            self._latest[petugas_id] = position
+
+            sampled = self._sampled.get(petugas_id)
+            if sampled is None or position.recorded_at - sampled.recorded_at >= _setting(
+                'LIVE_TRACK_SAMPLE_SECONDS', DEFAULT_SAMPLE_SECONDS
+            ) or haversine_km(sampled.latitude, sampled.longitude, position.latitude, position.longitude) >= SAMPLE_DISTANCE_KM:
+                self._sampled[petugas_id] = position
+                self._pending.append((petugas_id, position))
+                self._trim_pending()
+        self._ensure_flusher()
+        return True
+
+    def latest(self, max_age=DEFAULT_MAX_AGE):
+        cutoff = time.time() - max_age.total_seconds()
+        with self._lock:
+            return {pk: pos for pk, pos in self._latest.items() if pos.recorded_at >= cutoff}
+
+    def _trim_pending(self):
+        # Dipanggil dengan _lock dipegang
+        overflow = len(self._pending) - _setting('LIVE_TRACK_MAX_PENDING', DEFAULT_MAX_PENDING)
+        if overflow > 0:
+            for _ in range(overflow):
+                self._pending.popleft()
+            logger.warning("Antrean riwayat posisi penuh, %d titik tertua dibuang", overflow)
+
+    def flush(self):
+        """Tulis antrean riwayat ke LocationTrack; mengembalikan jumlah baris."""
+        with self._lock:
+            pending, self._pending = self._pending, deque()
+        if not pending:
+            return 0
+
+        try:
+            tracks = self._build_tracks(pending)
+            with transaction.atomic():
+                LocationTrack.objects.bulk_create(tracks, batch_size=FLUSH_BATCH_SIZE)
+        except IntegrityError:
+            # Data bermasalah (mis. petugas terhapus di tengah flush): tulis satu per
+            # satu dan buang baris yang gagal agar tidak memblokir antrean selamanya
+            return self._save_each(tracks)
+        except Exception:
+            # Database tidak tersedia: kembalikan ke antrean (tetap dibatasi), dicoba lagi nanti
+            with self._lock:
+                self._pending.extendleft(reversed(pending))
+                self._trim_pending()
+            raise
+        return len(tracks)
+
+    def _build_tracks(self, pending):
+        # Petugas yang sudah dihapus: FK-nya tidak valid dan akan menggagalkan seluruh batch
+        known = set(User.objects.filter(pk__in={pk for pk, _ in pending}).values_list('pk', flat=True))
+        tracks = [
+            LocationTrack(
+                petugas_id=petugas_id,
+                timestamp=datetime.fromtimestamp(pos.recorded_at, tz=dt_timezone.utc),
+                latitude=Decimal(f'{pos.latitude:.6f}'),
+                longitude=Decimal(f'{pos.longitude:.6f}'),
+                accuracy=pos.accuracy,
+            )
+            for petugas_id, pos in pending if petugas_id in known
+        ]
+        if len(tracks) < len(pending):
+            logger.warning("%d titik riwayat posisi dari petugas yang tidak dikenal dibuang", len(pending) - len(tracks))
+        return tracks
+
+    def _save_each(self, tracks):
+        saved = 0
+        for track in tracks:
+            try:
+                with transaction.atomic():
+                    track.save()
+            except IntegrityError:
+                logger.warning("Titik riwayat posisi petugas %s dibuang", track.petugas_id, exc_info=True)
+            else:
+                saved += 1
+        return saved
+
+    def _ensure_flusher(self):
+        if self._flusher is not None or not _setting('LIVE_TRACK_BACKGROUND_FLUSH', True):
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run_flusher, name='live-track-flusher', daemon=True)
+                self._flusher.start()
+                atexit.register(self._flush_quietly)
+
+    def _flush_quietly(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Gagal menulis riwayat posisi petugas")
+        finally:
+            close_old_connections()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(_setting('LIVE_TRACK_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS))
+            self._flush_quietly()
+
+
+store = LiveLocationStore()
+
+
+def live_snapshot(bbox=None, max_age=DEFAULT_MAX_AGE):
+    """
+    {petugas_id: LivePosition} petugas yang posisinya cukup baru, opsional
+    dibatasi viewport (south, west, north, east).
+    """
+    positions = {}
+    # Titik riwayat terbaru dari database (ping yang diterima proses lain)
+    since = timezone.now() - max_age
+    newer = LocationTrack.objects.filter(petugas=OuterRef('petugas'), timestamp__gt=OuterRef('timestamp'))
+    rows = (
+        LocationTrack.objects.filter(timestamp__gte=since).filter(~Exists(newer))
+        .values_list('petugas_id', 'latitude', 'longitude', 'accuracy', 'timestamp')
+    )
+    for petugas_id, lat, lon, accuracy, ts in rows:
+        positions[petugas_id] = LivePosition(float(lat), float(lon), accuracy, ts.timestamp())
+
+    for petugas_id, position in store.latest(max_age).items():
+        current = positions.get(petugas_id)
+        if current is None or position.recorded_at >= current.recorded_at:
+            positions[petugas_id] = position
+
+    if bbox:
+        south, west, north, east = bbox
+        positions = {
+            pk: pos for pk, pos in positions.items()
+            if south <= pos.latitude <= north and (
+                west <= pos.longitude <= east if west <= east
+                # Viewport melewati antimeridian
+                else pos.longitude >= west or pos.longitude <= east
+            )
+        }
+    return positions
@@ -9,8 +9,20 @@ from .views import (
     AdminPresensiViewSet,
     AdminLaporanViewSet,
     HarianPresensiReportView,
+    BulananPresensiReportView,
     DashboardStatsAPIView,
-    EmergencyAlarmViewSet # Import Baru
+    ExportAPIView,
+    MetricsAPIView,
+    LocationPingView,
+    LiveMapView,
+    AnalyticsHeatmapView,
+    ShiftViewSet,
+    ShiftScheduleViewSet,
+    ShiftExceptionViewSet,
+    RosterImportView,
+    EmergencyAlarmViewSet, # Import Baru
+    DeviceTokenViewSet,
+    SyncBatchView
 )
 
 router = DefaultRouter()
@@ -19,6 +31,7 @@ router = DefaultRouter()
 router.register(r'presensi', PresensiViewSet, basename='presensi')
 router.register(r'laporan', LaporanViewSet, basename='laporan')
 router.register(r'alarm', EmergencyAlarmViewSet, basename='alarm') # Endpoint Alarm
+router.register(r'devices', DeviceTokenViewSet, basename='devices') # Token push notification
 
 
 # Endpoint Admin → Data Petugas
@@ -28,6 +41,11 @@ router.register(r'admin/petugas', PetugasViewSet, basename='admin-petugas')
 router.register(r'admin/presensi', AdminPresensiViewSet, basename='admin-presensi')
 router.register(r'admin/laporan', AdminLaporanViewSet, basename='admin-laporan')
 
+# Endpoint Admin → Shift & jadwal petugas
+router.register(r'admin/shifts', ShiftViewSet, basename='admin-shifts')
+router.register(r'admin/shift-schedules', ShiftScheduleViewSet, basename='admin-shift-schedules')
+router.register(r'admin/shift-exceptions', ShiftExceptionViewSet, basename='admin-shift-exceptions')
+
 
 urlpatterns = [
     # Admin: Dashboard Stats (Untuk Mobile)
@@ -43,7 +61,39 @@ urlpatterns = [
         HarianPresensiReportView.as_view(),
         name='harian-presensi-report'
     ),
+
+    # Admin: matriks presensi bulanan
+    path(
+        'admin/laporan/bulanan/',
+        BulananPresensiReportView.as_view(),
+        name='bulanan-presensi-report'
+    ),
     
+    # Admin: export CSV/XLSX, mis. admin/export/presensi.csv?start=2025-01-01&end=2025-12-31
+    path(
+        'admin/export/<str:kind>.<str:file_format>',
+        ExportAPIView.as_view(),
+        name='admin-export'
+    ),
+
+    # Admin: metrik request (format Prometheus)
+    path('admin/metrics/', MetricsAPIView.as_view(), name='admin-metrics'),
+
+    # Admin: peta posisi petugas terkini
+    path('admin/live-map/', LiveMapView.as_view(), name='admin-live-map'),
+
+    # Admin: heatmap insiden per sel/hari/jam
+    path('admin/analytics/heatmap/', AnalyticsHeatmapView.as_view(), name='admin-analytics-heatmap'),
+
+    # Admin: import jadwal shift massal (CSV)
+    path('admin/roster/import/', RosterImportView.as_view(), name='admin-roster-import'),
+
+    # Petugas: ping posisi selama shift
+    path('location/ping/', LocationPingView.as_view(), name='location-ping'),
+
+    # Petugas: sinkronisasi batch dari antrean offline
+    path('sync/', SyncBatchView.as_view(), name='sync-batch'),
+
     # User endpoints
     path('user/profile/', UserProfileView.as_view(), name='user-profile'), 
     path('user/register/', RegisterUserView.as_view(), name='user-register'),
@@ -1,7 +1,8 @@
 # core/views.py
 from rest_framework import viewsets, permissions, status, serializers
+from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 
@@ -9,25 +10,68 @@ from rest_framework.permissions import AllowAny
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
+import json
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Sum
+from django.http import HttpResponse
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
 from django.utils.dateparse import parse_date
 
-from .models import User, Presensi, Laporan, EmergencyAlarm
+from .models import User, Presensi, Laporan, EmergencyAlarm, DeviceToken, Shift, ShiftSchedule, ShiftException
 from .serializers import (
     PetugasDetailSerializer,
     AdminPresensiSerializer,
     AdminLaporanSerializer,
+    AdminLaporanSearchSerializer,
     PresensiSerializer,
     LaporanSerializer,
     EmailTokenObtainPairSerializer,
+    RoleTokenRefreshSerializer,
     UserSerializer,
     PetugasStatusPresensiSerializer,
+    PetugasRekapBulananSerializer,
     UpdateProfileSerializer,
-    EmergencyAlarmSerializer
+    EmergencyAlarmSerializer,
+    DeviceTokenSerializer,
+    LocationPingSerializer,
+    ShiftSerializer,
+    ShiftScheduleSerializer,
+    ShiftExceptionSerializer
+)
+from .alarm_stream import publish_alarm_change
+from .analytics import (
+    incident_heatmap, CELL_PRECISION, MIN_PRECISION, MAX_RANGE_DAYS, DEFAULT_CELL_LIMIT, MAX_CELL_LIMIT,
+)
+from .geofence import apply_geofence
+from .export import export_response, ExportError
+from .escalation import acknowledge_alarm, initial_deadline
+from .dispatch import nearest_officers, laporan_nearby, NEARBY_OFFICER_LIMIT, LAPORAN_RADIUS_KM, MAX_RADIUS_KM
+from .images import schedule_image_processing
+from .media import serve_media
+from .metrics import render_prometheus
+from .notifications import enqueue_alarm_notification
+from .pagination import (
+    PetugasCursorPagination, SearchPagination, ShiftExceptionCursorPagination, ShiftScheduleCursorPagination,
+)
+from .search import parse_query, search_laporan
+from .stats import get_dashboard_stats, get_stats_version, dashboard_stats_etag
+from .storage import release_file
+from .sync import ingest_batch, SyncError
+from .tracking import store as live_store, live_snapshot
+from .roster import apply_roster, import_roster, parse_roster_csv, RosterImportError
+from .rekap import (
+    parse_month,
+    rekap_presensi_bulanan,
+    rekap_presensi_harian,
+    record_presensi_created,
+    record_laporan_created,
+    record_alarm_created,
 )
 
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 
 class RegisterUserView(APIView):
@@ -91,36 +135,37 @@ class DashboardStatsAPIView(APIView):
     permission_classes = [IsAdmin]
 
     def get(self, request):
-        today = timezone.localdate()
-        
-        total_petugas = User.objects.filter(is_petugas=True).count()
-        
-        hadir_today = Presensi.objects.filter(
-            timestamp__date=today, 
-            status_validasi='hadir'
-        ).values('petugas').distinct().count()
-        
-        belum_hadir = total_petugas - hadir_today
-        laporan_baru = Laporan.objects.filter(timestamp__date=today).count()
+        # ETag dari versi cache: dashboard yang tidak berubah dijawab 304 cukup dengan
+        # satu lookup versi; versi yang sama dipakai untuk data agar keduanya cocok
+        version = get_stats_version()
+        etag = dashboard_stats_etag(version)
+        if etag in request.headers.get('If-None-Match', ''):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
 
-        recent_presensi_qs = Presensi.objects.select_related('petugas').order_by('-timestamp')[:5]
-        recent_presensi_data = AdminPresensiSerializer(recent_presensi_qs, many=True, context={'request': request}).data
-
-        open_laporan_qs = Laporan.objects.select_related('petugas').filter(status='lapor').order_by('-timestamp')[:5]
-        open_laporan_data = AdminLaporanSerializer(open_laporan_qs, many=True, context={'request': request}).data
-        
-        # Tambahan: Jumlah alarm aktif
-        active_alarms = EmergencyAlarm.objects.filter(status='active').count()
+        stats = get_dashboard_stats(version)
+        context = {'request': request}
 
         return Response({
-            'total_petugas': total_petugas,
-            'hadir_today': hadir_today,
-            'belum_hadir': belum_hadir,
-            'laporan_baru': laporan_baru,
-            'recent_presensi': recent_presensi_data,
-            'open_laporan': open_laporan_data,
-            'active_alarms': active_alarms 
-        })
+            'total_petugas': stats['total_petugas'],
+            'terjadwal_today': stats['terjadwal_today'],
+            'hadir_today': stats['hadir_today'],
+            'belum_hadir': stats['belum_hadir'],
+            'terlambat_today': stats['terlambat_today'],
+            'laporan_baru': stats['laporan_baru'],
+            'recent_presensi': AdminPresensiSerializer(stats['recent_presensi'], many=True, context=context).data,
+            'open_laporan': AdminLaporanSerializer(stats['open_laporan'], many=True, context=context).data,
+            'active_alarms': stats['active_alarms'] 
+        }, headers={'ETag': etag, 'Cache-Control': 'private, no-cache'})
+
+class ExportAPIView(APIView):
+    """Unduh riwayat presensi/laporan/alarm sebagai CSV/XLSX (streaming), filter start/end/status."""
+    permission_classes = [IsAdmin]
+
+    def get(self, request, kind, file_format):
+        try:
+            return export_response(kind, file_format, request.query_params)
+        except ExportError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
 # ============================================
 # 3. VIEWS LAINNYA
@@ -130,24 +175,52 @@ class PetugasViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.filter(is_petugas=True).order_by('email')
     serializer_class = PetugasDetailSerializer
     permission_classes = [IsAdmin]
+    pagination_class = PetugasCursorPagination
 
 
 class AdminPresensiViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Presensi.objects.all().order_by('-timestamp')
+    queryset = Presensi.objects.select_related('petugas').order_by('-timestamp')
     serializer_class = AdminPresensiSerializer
     permission_classes = [IsAdmin]
 
 
-class AdminLaporanViewSet(viewsets.ModelViewSet):
-    queryset = Laporan.objects.all().order_by('-timestamp')
+class AdminLaporanViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    `?q=pintu gerbang`: pencarian teks note/location_note, urut relevansi (core/search.py).
+
+    Hanya baca: laporan dibuat oleh Petugas, dan perubahan status lewat panel
+    admin (web_views) yang ikut memperbarui DailyAttendanceSummary.
+    """
+    queryset = Laporan.objects.select_related('petugas').order_by('-timestamp')
     serializer_class = AdminLaporanSerializer
     permission_classes = [IsAdmin]
 
-    def create(self, request, *args, **kwargs):
-        return Response(
-            {'detail': 'Laporan hanya bisa dibuat oleh Petugas.'},
-            status=status.HTTP_403_FORBIDDEN
-        )
+    @property
+    def search_query(self):
+        if self.action != 'list':
+            return ''
+        return self.request.query_params.get('q', '').strip()
+
+    @property
+    def paginator(self):
+        if self.search_query and not hasattr(self, '_paginator'):
+            self._paginator = SearchPagination()
+        return super().paginator
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.search_query:
+            queryset = search_laporan(queryset, self.search_query)
+        return queryset
+
+    def get_serializer_class(self):
+        return AdminLaporanSearchSerializer if self.search_query else super().get_serializer_class()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.search_query:
+            context['search_terms'] = parse_query(self.search_query)
+        return context
 
 
 class PresensiViewSet(viewsets.ModelViewSet):
@@ -158,21 +231,50 @@ class PresensiViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.is_admin:
-            return Presensi.objects.all().order_by('-timestamp')
+            return Presensi.objects.select_related('petugas').order_by('-timestamp')
         if user.is_petugas:
-            return Presensi.objects.filter(petugas=user).order_by('-timestamp')
+            return Presensi.objects.select_related('petugas').filter(petugas=user).order_by('-timestamp')
         return Presensi.objects.none()
 
     def perform_create(self, serializer):
         if not self.request.user.is_petugas:
             raise permissions.exceptions.PermissionDenied("Hanya Petugas yang dapat membuat presensi.")
 
-        today = timezone.localdate()
-
-        if Presensi.objects.filter(petugas=self.request.user, timestamp__date=today).exists():
+        # Satu presensi per hari dijaga constraint (petugas, tanggal), tanpa query cek dulu
+        presensi = Presensi(petugas=self.request.user, **serializer.validated_data)
+        apply_geofence(presensi)
+        apply_roster(presensi)
+        try:
+            with transaction.atomic():
+                presensi.save()
+                record_presensi_created(presensi)
+                schedule_image_processing(presensi, 'selfie_photo', 'selfie_thumbnail')
+        except IntegrityError:
+            # Retry dengan foto identik menunjuk ke file yang sama dengan presensi pertama
+            release_file(presensi, 'selfie_photo')
             raise serializers.ValidationError("Anda sudah melakukan presensi harian hari ini.")
 
-        serializer.save(petugas=self.request.user)
+        serializer.instance = presensi
+
+
+class MetricsAPIView(APIView):
+    """Metrik request per endpoint dalam format teks Prometheus."""
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class ProtectedMediaView(APIView):
+    """File media (/media/...) untuk pemiliknya atau admin; sesi web maupun JWT."""
+    permission_classes = [IsAuthenticated]
+
+    def perform_content_negotiation(self, request, force=False):
+        # Client gambar mengirim Accept: image/*, bukan JSON
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, path):
+        return serve_media(request, path)
 
 
 class HarianPresensiReportView(APIView):
@@ -189,7 +291,7 @@ class HarianPresensiReportView(APIView):
             else:
                 return Response({'error': 'Format tanggal salah. Gunakan YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
 
-        petugas_queryset = User.objects.filter(is_petugas=True).order_by('email')
+        petugas_list = rekap_presensi_harian(target_date)
         
         serializer_context = {
             'request': request,
@@ -197,7 +299,7 @@ class HarianPresensiReportView(APIView):
         }
         
         serializer = PetugasStatusPresensiSerializer(
-            petugas_queryset, 
+            petugas_list, 
             many=True, 
             context=serializer_context
         )
@@ -205,16 +307,45 @@ class HarianPresensiReportView(APIView):
         data = serializer.data
         total_petugas = len(data)
         hadir = sum(1 for p in data if p.get('has_presensi_today'))
+        terlambat = sum(1 for p in data if (p.get('last_presensi') or {}).get('terlambat_menit'))
 
         return Response({
             'report_date': target_date.isoformat(),
             'total_petugas': total_petugas,
             'petugas_hadir': hadir,
             'petugas_belum_hadir': total_petugas - hadir,
+            'petugas_terlambat': terlambat,
             'data': data
         })
 
 
+class BulananPresensiReportView(APIView):
+    """Matriks presensi petugas x tanggal untuk satu bulan (?month=YYYY-MM)."""
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        today = timezone.localdate()
+        month_str = request.query_params.get('month')
+        year, month = today.year, today.month
+
+        if month_str:
+            parsed = parse_month(month_str)
+            if not parsed:
+                return Response({'error': 'Format bulan salah. Gunakan YYYY-MM'}, status=status.HTTP_400_BAD_REQUEST)
+            year, month = parsed
+
+        rekap = rekap_presensi_bulanan(year, month)
+        return Response({
+            'month': f'{year}-{month:02d}',
+            'days': [day.isoformat() for day in rekap['days']],
+            'total_petugas': len(rekap['petugas']),
+            'daily_totals': [
+                dict(item, date=item['date'].isoformat()) for item in rekap['daily_totals']
+            ],
+            'data': PetugasRekapBulananSerializer(rekap['petugas'], many=True).data,
+        })
+
+
 class LaporanViewSet(viewsets.ModelViewSet):
     serializer_class = LaporanSerializer
     permission_classes = [IsAuthenticated]
@@ -223,56 +354,402 @@ class LaporanViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.is_admin:
-            return Laporan.objects.all().order_by('-timestamp')
+            return Laporan.objects.select_related('petugas').order_by('-timestamp')
         if user.is_petugas:
-            return Laporan.objects.filter(petugas=user).order_by('-timestamp')
+            return Laporan.objects.select_related('petugas').filter(petugas=user).order_by('-timestamp')
         return Laporan.objects.none()
 
     def perform_create(self, serializer):
         if not self.request.user.is_petugas:
             raise permissions.exceptions.PermissionDenied("Hanya Petugas yang dapat membuat laporan.")
 
-        serializer.save(petugas=self.request.user)
+        with transaction.atomic():
+            laporan = serializer.save(petugas=self.request.user)
+            record_laporan_created(laporan)
+            schedule_image_processing(laporan, 'photo', 'photo_thumbnail')
+
+class SyncBatchView(APIView):
+    """
+    Terima banyak Presensi/Laporan sekaligus dari antrean offline aplikasi.
+
+    Multipart: field `records` berisi JSON list, tiap record punya `type`
+    (presensi/laporan), `client_id` unik, data form biasa, dan nama part file
+    pada `selfie_photo`/`photo`.
+    """
+    permission_classes = [IsPetugas]
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
+
+    def post(self, request):
+        records = request.data.get('records')
+        if isinstance(records, str):
+            try:
+                records = json.loads(records)
+            except ValueError:
+                return Response({'error': 'records bukan JSON yang valid.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            results = ingest_batch(request.user, records, request.FILES)
+        except SyncError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'created': sum(1 for r in results if r['status'] == 'created'),
+            'duplicate': sum(1 for r in results if r['status'] == 'duplicate'),
+            'error': sum(1 for r in results if r['status'] == 'error'),
+            'results': results,
+        })
 
 # ============================================
 # 4. EMERGENCY ALARM VIEWSET
 # ============================================
+ALARM_COOLDOWN = timedelta(minutes=3)
+
 class EmergencyAlarmViewSet(viewsets.ModelViewSet):
     serializer_class = EmergencyAlarmSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         # Allow filtering by status
-        queryset = EmergencyAlarm.objects.all().order_by('-timestamp')
+        queryset = EmergencyAlarm.objects.select_related('petugas').order_by('-timestamp')
         status_param = self.request.query_params.get('status')
         if status_param:
             queryset = queryset.filter(status=status_param)
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        # Polling bersyarat: satu query agregat, 304 jika daftar tidak berubah
+        state = self.get_queryset().order_by().aggregate(
+            total=Count('id'), max_id=Max('id'), sum_id=Sum('id'), last_resolved=Max('resolved_at'),
+            last_escalated=Max('escalated_at'), last_acknowledged=Max('acknowledged_at'),
+        )
+        etag = '"alarm-{total}-{max_id}-{sum_id}-{resolved}-{escalated}-{acknowledged}"'.format(
+            resolved=state['last_resolved'].timestamp() if state['last_resolved'] else 0,
+            escalated=state['last_escalated'].timestamp() if state['last_escalated'] else 0,
+            acknowledged=state['last_acknowledged'].timestamp() if state['last_acknowledged'] else 0,
+            total=state['total'], max_id=state['max_id'], sum_id=state['sum_id'],
+        )
+        if etag in request.headers.get('If-None-Match', ''):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
+
     def perform_create(self, serializer):
         user = self.request.user
         
-        # 1. Cooldown Check (3 menit)
-        three_minutes_ago = timezone.now() - timedelta(minutes=3)
-        recent_alarm = EmergencyAlarm.objects.filter(
-            petugas=user, 
-            timestamp__gte=three_minutes_ago
-        ).first()
-
-        if recent_alarm:
-             raise serializers.ValidationError({"detail": "Mohon tunggu 3 menit sebelum memicu alarm lagi."})
+        # 1. Cooldown Check (3 menit): cache.add hanya penyaring cepat di proses ini,
+        #    penentunya alarm terakhir petugas di database (di bawah)
+        cooldown_key = f'alarm-cooldown:{user.pk}'
+        cooldown_error = serializers.ValidationError({"detail": "Mohon tunggu 3 menit sebelum memicu alarm lagi."})
+        if not cache.add(cooldown_key, timezone.now().isoformat(), ALARM_COOLDOWN.total_seconds()):
+             raise cooldown_error
 
         # 2. Save Alarm
-        serializer.save(petugas=user)
-        
-        # 3. TODO: Trigger Push Notification (FCM) logic here
-        # Untuk simulasi, kita anggap notifikasi dikirim oleh client/server trigger
+        try:
+            with transaction.atomic():
+                # Kunci baris petugas agar request paralel di worker lain menunggu di sini
+                # (SQLite: transaksi IMMEDIATE sudah serial)
+                list(User.objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True))
+                last_alarm = EmergencyAlarm.objects.filter(petugas_id=user.pk).order_by('-timestamp').values_list(
+                    'timestamp', flat=True
+                ).first()
+                remaining = last_alarm and ALARM_COOLDOWN - (timezone.now() - last_alarm)
+                if remaining and remaining.total_seconds() > 0:
+                    cache.set(cooldown_key, last_alarm.isoformat(), remaining.total_seconds())
+                    raise cooldown_error
+
+                # Tenggat eskalasi pertama; dipantau run_alarm_escalation
+                alarm = serializer.save(petugas=user, next_escalation_at=initial_deadline())
+                record_alarm_created(alarm)
+                publish_alarm_change(alarm, 'created')
+                # 3. Push notification: hanya masuk antrean, dikirim oleh run_notification_worker
+                enqueue_alarm_notification(alarm)
+        except serializers.ValidationError:
+            raise
+        except Exception:
+            # Alarm gagal tersimpan: jangan kunci petugas selama cooldown
+            cache.delete(cooldown_key)
+            raise
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAdmin])
+    def acknowledge(self, request, pk=None):
+        """Admin menanggapi alarm: eskalasi berhenti, status tetap aktif sampai diselesaikan."""
+        alarm = self.get_object()
+        if alarm.status != 'active':
+            return Response({'error': 'Alarm sudah tidak aktif.'}, status=status.HTTP_400_BAD_REQUEST)
+        if alarm.acknowledged_at is None:
+            acknowledge_alarm(alarm, request.user)
+            with transaction.atomic():
+                alarm.save(update_fields=['acknowledged_at', 'acknowledged_by', 'next_escalation_at'])
+                publish_alarm_change(alarm, 'acknowledged')
+        return Response(self.get_serializer(alarm).data)
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAdmin])
+    def nearby(self, request, pk=None):
+        """Petugas terdekat (berdasarkan presensi terakhir) dan laporan terbaru di sekitar alarm."""
+        alarm = self.get_object()
+        try:
+            limit = min(max(int(request.query_params.get('limit', NEARBY_OFFICER_LIMIT)), 1), 50)
+            radius = min(max(float(request.query_params.get('radius', LAPORAN_RADIUS_KM)), 0.1), MAX_RADIUS_KM)
+        except ValueError:
+            return Response({'error': 'limit dan radius harus berupa angka.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        context = self.get_serializer_context()
+        officers, searched_km = nearest_officers(
+            alarm.latitude, alarm.longitude, limit=limit, exclude_petugas=alarm.petugas_id
+        )
+        laporan = laporan_nearby(alarm.latitude, alarm.longitude, radius_km=radius)
+
+        return Response({
+            'alarm': EmergencyAlarmSerializer(alarm, context=context).data,
+            'search_radius_km': searched_km,
+            'officers': [
+                {
+                    'petugas_id': presensi.petugas_id,
+                    'petugas_name': presensi.petugas.first_name,
+                    'phone_number': presensi.petugas.phone_number,
+                    'distance_km': round(distance, 3),
+                    'last_presensi': AdminPresensiSerializer(presensi, context=context).data,
+                }
+                for distance, presensi in officers
+            ],
+            'laporan_radius_km': radius,
+            'laporan': [
+                dict(AdminLaporanSerializer(item, context=context).data, distance_km=round(distance, 3))
+                for distance, item in laporan
+            ],
+        })
+
+
+# ============================================
+# 5. DEVICE TOKEN (PUSH NOTIFICATION)
+# ============================================
+class DeviceTokenViewSet(viewsets.ModelViewSet):
+    """Registrasi token FCM perangkat milik user yang login."""
+    serializer_class = DeviceTokenSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = None
+    http_method_names = ['get', 'post', 'delete']
+    lookup_field = 'token'
+    lookup_value_regex = '[^/]+'
+
+    def get_queryset(self):
+        return DeviceToken.objects.filter(user=self.request.user).order_by('-last_seen_at')
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # Upsert: token yang sama bisa dikirim ulang setiap aplikasi dibuka, atau
+        # berpindah user ketika perangkat dipakai bergantian
+        device, created = DeviceToken.objects.update_or_create(
+            token=serializer.validated_data['token'],
+            defaults={
+                'user': request.user,
+                'platform': serializer.validated_data.get('platform', 'android'),
+                'is_active': True,
+            },
+        )
+        return Response(
+            self.get_serializer(device).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+
+# ============================================
+# 6. LIVE LOCATION
+# ============================================
+class LocationPingView(APIView):
+    """Ping posisi petugas (tiap beberapa detik selama shift). Tanpa query database."""
+    permission_classes = [IsPetugas]
+
+    def post(self, request):
+        serializer = LocationPingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        recorded_at = data.get('recorded_at')
+        live_store.record(
+            request.user.pk, data['latitude'], data['longitude'], data.get('accuracy'),
+            recorded_at.timestamp() if recorded_at else None
+        )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class LiveMapView(APIView):
+    """Posisi terakhir petugas, opsional dibatasi viewport ?bbox=south,west,north,east."""
+    permission_classes = [IsAdmin]
+    MAX_AGE_LIMIT = 24 * 3600
+
+    def get(self, request):
+        bbox = None
+        try:
+            if request.query_params.get('bbox'):
+                bbox = [float(value) for value in request.query_params['bbox'].split(',')]
+                if len(bbox) != 4 or bbox[0] > bbox[2]:
+                    raise ValueError
+            max_age = min(max(int(request.query_params.get('max_age', 900)), 1), self.MAX_AGE_LIMIT)
+        except ValueError:
+            return Response(
+                {'error': 'bbox harus south,west,north,east dan max_age berupa detik.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        positions = live_snapshot(bbox, timedelta(seconds=max_age))
+        petugas = {
+            pk: (first_name, last_name, phone_number)
+            for pk, first_name, last_name, phone_number in User.objects.filter(
+                pk__in=list(positions), is_active=True
+            ).values_list('pk', 'first_name', 'last_name', 'phone_number')
+        }
+        now = timezone.now().timestamp()
+        officers = []
+        for pk, position in positions.items():
+            if pk not in petugas:
+                continue
+            first_name, last_name, phone_number = petugas[pk]
+            officers.append({
+                'petugas_id': pk,
+                'petugas_name': f'{first_name} {last_name}'.strip(),
+                'phone_number': phone_number,
+                'latitude': round(position.latitude, 6),
+                'longitude': round(position.longitude, 6),
+                'accuracy': position.accuracy,
+                'recorded_at': datetime.fromtimestamp(position.recorded_at, tz=timezone.get_current_timezone()),
+                'age_seconds': max(int(now - position.recorded_at), 0),
+            })
+        officers.sort(key=lambda item: item['petugas_name'])
+        return Response({'count': len(officers), 'max_age': max_age, 'officers': officers})
+
+
+# ============================================
+# 7. ANALYTICS
+# ============================================
+class AnalyticsHeatmapView(APIView):
+    """
+    Heatmap insiden per sel geohash x hari x jam.
+    ?start=&end= (YYYY-MM-DD, default 30 hari terakhir), ?category=laporan,fire
+    ?priority=high, ?precision=3-6, ?weekday=0-6 (0 = Senin), ?hour=0-23, ?limit=
+    """
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        params = request.query_params
+        today = timezone.localdate()
+        try:
+            end = parse_date(params['end']) if params.get('end') else today
+            start = parse_date(params['start']) if params.get('start') else end and end - timedelta(days=29)
+            if start is None or end is None:
+                raise ValueError
+        except ValueError:
+            return Response({'error': 'Format tanggal salah. Gunakan YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end or (end - start).days >= MAX_RANGE_DAYS:
+            return Response(
+                {'error': f'Rentang tanggal harus start <= end dan paling lama {MAX_RANGE_DAYS} hari.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            precision = int(params.get('precision', CELL_PRECISION))
+            weekday = int(params['weekday']) if params.get('weekday') else None
+            hour = int(params['hour']) if params.get('hour') else None
+            limit = int(params.get('limit', DEFAULT_CELL_LIMIT))
+            if not MIN_PRECISION <= precision <= CELL_PRECISION:
+                raise ValueError
+            if (weekday is not None and not 0 <= weekday <= 6) or (hour is not None and not 0 <= hour <= 23):
+                raise ValueError
+        except ValueError:
+            return Response(
+                {'error': f'precision {MIN_PRECISION}-{CELL_PRECISION}, weekday 0-6, hour 0-23 dan limit harus angka.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(incident_heatmap(
+            start, end,
+            categories=[value for value in params.get('category', '').split(',') if value],
+            priorities=[value for value in params.get('priority', '').split(',') if value],
+            precision=precision, weekday=weekday, hour=hour,
+            limit=min(max(limit, 1), MAX_CELL_LIMIT),
+        ))
+
+
+# ============================================
+# 8. SHIFT & ROSTER
+# ============================================
+class ShiftViewSet(viewsets.ModelViewSet):
+    queryset = Shift.objects.order_by('start_time', 'name')
+    serializer_class = ShiftSerializer
+    permission_classes = [IsAdmin]
+    # Data master kecil: dikirim utuh tanpa halaman
+    pagination_class = None
+
+
+class ShiftScheduleViewSet(viewsets.ModelViewSet):
+    """Jadwal berulang; ?petugas=<id> untuk jadwal satu petugas."""
+    serializer_class = ShiftScheduleSerializer
+    permission_classes = [IsAdmin]
+    pagination_class = ShiftScheduleCursorPagination
+
+    def get_queryset(self):
+        queryset = ShiftSchedule.objects.all()
+        if self.request.query_params.get('petugas', '').isdigit():
+            queryset = queryset.filter(petugas_id=self.request.query_params['petugas'])
+        return queryset
+
+
+class ShiftExceptionViewSet(viewsets.ModelViewSet):
+    """Libur/cuti/ganti shift per tanggal; ?date=YYYY-MM-DD atau ?petugas=<id>."""
+    serializer_class = ShiftExceptionSerializer
+    permission_classes = [IsAdmin]
+    pagination_class = ShiftExceptionCursorPagination
+
+    def get_queryset(self):
+        queryset = ShiftException.objects.all()
+        try:
+            target_date = parse_date(self.request.query_params.get('date', ''))
+        except ValueError:
+            target_date = None
+        if target_date:
+            queryset = queryset.filter(date=target_date)
+        if self.request.query_params.get('petugas', '').isdigit():
+            queryset = queryset.filter(petugas_id=self.request.query_params['petugas'])
+        return queryset
+
+
+class RosterImportView(APIView):
+    """
+    Import jadwal banyak petugas sekaligus: multipart `file` (CSV kolom
+    email,shift,hari,mulai,sampai) atau JSON {"rows": [...]}. `replace=1`
+    mengakhiri jadwal lama petugas yang diimport.
+    """
+    permission_classes = [IsAdmin]
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
+
+    def post(self, request):
+        replace = str(request.data.get('replace', '')).lower() in ('1', 'true', 'ya')
+        try:
+            if 'file' in request.FILES:
+                rows = parse_roster_csv(request.FILES['file'].read())
+            elif isinstance(request.data.get('rows'), list):
+                rows = request.data['rows']
+                if not all(isinstance(row, dict) for row in rows):
+                    raise RosterImportError("Setiap baris harus berupa object.")
+            else:
+                raise RosterImportError("Kirim file CSV atau rows.")
+            created = import_roster(rows, replace=replace)
+        except RosterImportError as exc:
+            return Response({'error': str(exc), 'errors': exc.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'created': created}, status=status.HTTP_201_CREATED)
 
 
 class EmailTokenObtainPairView(TokenObtainPairView):
     serializer_class = EmailTokenObtainPairSerializer
 
 
+class RoleTokenRefreshView(TokenRefreshView):
+    serializer_class = RoleTokenRefreshSerializer
+
+
 class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser] 
@@ -283,10 +760,14 @@ class UserProfileView(APIView):
 
     # PATCH: Gunakan UpdateProfileSerializer agar validasi email tidak konflik
     def patch(self, request):
-        user = request.user
+        # User asli dari database, bukan TokenUser yang status & perannya dari klaim token
+        user = User.objects.get(pk=request.user.pk)
         serializer = UpdateProfileSerializer(user, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                if 'profile_picture' in serializer.validated_data:
+                    schedule_image_processing(user, 'profile_picture', 'profile_thumbnail')
             
             # Kembalikan data user lengkap (termasuk email) setelah update
             return Response(UserSerializer(user).data)
@@ -5,12 +5,15 @@ from .web_views import (
     DashboardView,
     WebPetugasListView, 
     WebRekapHarianView, 
+    WebRekapBulananView,
     WebPresensiListView,
     WebPresensiDetailView,
     WebLaporanListView,
     WebLaporanDetailView,
     WebAlarmListView,
     WebAlarmDetailView,
+    WebExportView,
+    alarm_stream_view,
     logout_view
 )
 
@@ -22,6 +25,7 @@ urlpatterns = [
     # Petugas & Rekap
     path('dashboard/petugas/', WebPetugasListView.as_view(), name='web-petugas-list'),
     path('dashboard/rekap-harian/', WebRekapHarianView.as_view(), name='web-rekap-harian'),
+    path('dashboard/rekap-bulanan/', WebRekapBulananView.as_view(), name='web-rekap-bulanan'),
 
     # Presensi
     path('dashboard/presensi/', WebPresensiListView.as_view(), name='web-presensi-list'),
@@ -34,6 +38,10 @@ urlpatterns = [
     # Alarm
     path('dashboard/alarm/', WebAlarmListView.as_view(), name='web-alarm-list'),
     path('dashboard/alarm/<int:pk>/', WebAlarmDetailView.as_view(), name='web-alarm-detail'),
+    path('dashboard/alarm/stream/', alarm_stream_view, name='web-alarm-stream'),
+
+    # Export
+    path('dashboard/export/<str:kind>.<str:file_format>', WebExportView.as_view(), name='web-export'),
 
     # Authentication
     path('accounts/login/', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
@@ -1,12 +1,29 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.views.generic import TemplateView, ListView, DetailView
+from django.views.generic import TemplateView, ListView, DetailView, View
 from django.utils import timezone
 from django.contrib import messages
+from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Count, Q
 from django.contrib.auth import logout # Import Logout
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse
 from .models import User, Presensi, Laporan, EmergencyAlarm
 from .serializers import PetugasStatusPresensiSerializer 
+from .stats import get_dashboard_stats
+from .search import parse_query, search_laporan, highlights
+from .escalation import acknowledge_alarm, escalation_deadline
+from .export import export_response, ExportError
+from .alarm_stream import alarm_event_stream, parse_last_event_id, publish_alarm_change
+from .rekap import (
+    filter_on_date,
+    parse_month,
+    rekap_presensi_bulanan,
+    rekap_presensi_harian,
+    record_presensi_status_change,
+    record_laporan_status_change,
+)
 
 # --- VIEW KHUSUS LOGOUT (GET Support) ---
 def logout_view(request):
@@ -25,20 +42,10 @@ class DashboardView(LoginRequiredMixin, AdminRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         today = timezone.localdate()
 
-        context['total_petugas'] = User.objects.filter(is_petugas=True).count()
-        
-        context['hadir_today'] = Presensi.objects.filter(
-            timestamp__date=today, 
-            status_validasi='hadir'
-        ).values('petugas').distinct().count()
-        
-        context['belum_hadir'] = context['total_petugas'] - context['hadir_today']
-        context['laporan_baru'] = Laporan.objects.filter(timestamp__date=today).count()
+        # Statistik bersama dengan API (cache berversi, lihat stats.py)
+        context.update(get_dashboard_stats())
         context['today'] = today
 
-        context['recent_presensi'] = Presensi.objects.select_related('petugas').order_by('-timestamp')[:5]
-        context['open_laporan'] = Laporan.objects.select_related('petugas').filter(status='lapor').order_by('-timestamp')[:5]
-
         return context
 
 # --- VIEW BARU: DAFTAR PETUGAS ---
@@ -66,11 +73,14 @@ class WebRekapHarianView(LoginRequiredMixin, AdminRequiredMixin, TemplateView):
         else:
             target_date = timezone.localdate()
 
-        petugas_queryset = User.objects.filter(is_petugas=True).order_by('first_name')
+        petugas_list = rekap_presensi_harian(
+            target_date,
+            User.objects.filter(is_petugas=True).order_by('first_name')
+        )
         
         # Gunakan Serializer yang sudah kita buat untuk API agar logicnya konsisten
         serializer = PetugasStatusPresensiSerializer(
-            petugas_queryset, 
+            petugas_list, 
             many=True, 
             context={'target_date': target_date}
         )
@@ -81,6 +91,27 @@ class WebRekapHarianView(LoginRequiredMixin, AdminRequiredMixin, TemplateView):
         return context
 
 
+class WebRekapBulananView(LoginRequiredMixin, AdminRequiredMixin, TemplateView):
+    template_name = 'core/rekap_bulanan.html'
+    # Matriks 31 kolom per petugas; dipaginasi agar render template tetap cepat
+    paginate_by = 50
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        today = timezone.localdate()
+        year, month = parse_month(self.request.GET.get('month')) or (today.year, today.month)
+
+        paginator = Paginator(User.objects.filter(is_petugas=True).order_by('first_name', 'pk'), self.paginate_by)
+        page_obj = paginator.get_page(self.request.GET.get('page'))
+
+        rekap = rekap_presensi_bulanan(year, month, page_obj.object_list)
+        context.update(rekap)
+        context['page_obj'] = page_obj
+        context['selected_month'] = f'{year}-{month:02d}'
+        return context
+
+
 class WebPresensiListView(LoginRequiredMixin, AdminRequiredMixin, ListView):
     model = Presensi
     template_name = 'core/presensi_list.html'
@@ -92,7 +123,7 @@ class WebPresensiListView(LoginRequiredMixin, AdminRequiredMixin, ListView):
         
         date_str = self.request.GET.get('date')
         if date_str:
-            queryset = queryset.filter(timestamp__date=date_str)
+            queryset = filter_on_date(queryset, date_str)
             
         return queryset
 
@@ -111,8 +142,13 @@ class WebPresensiDetailView(LoginRequiredMixin, AdminRequiredMixin, DetailView):
         new_status = request.POST.get('status_validasi')
         
         if new_status in ['hadir', 'tidak_hadir', 'diluar_lokasi']:
+            old_status = presensi.status_validasi
             presensi.status_validasi = new_status
-            presensi.save()
+            # Keputusan admin tidak ditimpa evaluasi ulang geofence
+            presensi.validasi_manual = True
+            with transaction.atomic():
+                presensi.save()
+                record_presensi_status_change(presensi, old_status)
             messages.success(request, f"Status validasi presensi berhasil diubah menjadi {new_status.replace('_', ' ').title()}")
         
         return redirect('web-presensi-detail', pk=presensi.id)
@@ -133,7 +169,12 @@ class WebLaporanListView(LoginRequiredMixin, AdminRequiredMixin, ListView):
         # UPDATE: Tambahkan Filter Tanggal
         date_str = self.request.GET.get('date')
         if date_str:
-            queryset = queryset.filter(timestamp__date=date_str)
+            queryset = filter_on_date(queryset, date_str)
+
+        # Pencarian teks (index FTS), hasil urut relevansi
+        q = self.request.GET.get('q', '').strip()
+        if q:
+            queryset = search_laporan(queryset, q)
             
         return queryset
 
@@ -141,6 +182,11 @@ class WebLaporanListView(LoginRequiredMixin, AdminRequiredMixin, ListView):
         context = super().get_context_data(**kwargs)
         context['current_status'] = self.request.GET.get('status', 'all')
         context['selected_date'] = self.request.GET.get('date', '')
+        context['search_query'] = self.request.GET.get('q', '').strip()
+        if context['search_query']:
+            terms = parse_query(context['search_query'])
+            for item in context['laporan_list']:
+                item.search_highlight = highlights(item, terms)
         return context
 
 class WebLaporanDetailView(LoginRequiredMixin, AdminRequiredMixin, DetailView):
@@ -153,8 +199,11 @@ class WebLaporanDetailView(LoginRequiredMixin, AdminRequiredMixin, DetailView):
         new_status = request.POST.get('status')
         
         if new_status in ['lapor', 'ditanggapi', 'selesai']:
+            old_status = laporan.status
             laporan.status = new_status
-            laporan.save()
+            with transaction.atomic():
+                laporan.save()
+                record_laporan_status_change(laporan, old_status)
             messages.success(request, f"Status laporan berhasil diubah menjadi {new_status.upper()}")
         
         return redirect('web-laporan-detail', pk=laporan.id)
@@ -174,8 +223,8 @@ class WebAlarmListView(LoginRequiredMixin, AdminRequiredMixin, ListView):
         
         date_str = self.request.GET.get('date')
         if date_str:
-            queryset = queryset.filter(timestamp__date=date_str)
-            
+            queryset = filter_on_date(queryset, date_str)
+
         return queryset
 
     def get_context_data(self, **kwargs):
@@ -192,13 +241,54 @@ class WebAlarmDetailView(LoginRequiredMixin, AdminRequiredMixin, DetailView):
     def post(self, request, *args, **kwargs):
         alarm = self.get_object()
         new_status = request.POST.get('status')
-        
-        if new_status in ['active', 'handled', 'false_alarm']:
+
+        if request.POST.get('action') == 'acknowledge' and alarm.status == 'active':
+            # Menghentikan eskalasi (core/escalation.py) tanpa menutup alarm. Hanya field
+            # acknowledge yang ditulis agar level/severity dari scheduler tidak tertimpa
+            acknowledge_alarm(alarm, request.user)
+            with transaction.atomic():
+                alarm.save(update_fields=['acknowledged_at', 'acknowledged_by', 'next_escalation_at'])
+                publish_alarm_change(alarm, 'acknowledged')
+            messages.success(request, "Alarm ditanggapi, eskalasi dihentikan.")
+        elif new_status in ['active', 'handled', 'false_alarm']:
             alarm.status = new_status
             if new_status != 'active':
                 alarm.resolved_at = timezone.now()
                 alarm.resolved_by = request.user
-            alarm.save()
+            alarm.next_escalation_at = escalation_deadline(alarm)
+            with transaction.atomic():
+                alarm.save(update_fields=['status', 'resolved_at', 'resolved_by', 'next_escalation_at'])
+                publish_alarm_change(alarm, new_status)
             messages.success(request, f"Status alarm berhasil diubah menjadi {new_status.upper()}")
         
         return redirect('web-alarm-detail', pk=alarm.id)
+
+
+# --- EXPORT CSV/XLSX (filter sama dengan halaman daftar: date/start/end, status) ---
+class WebExportView(LoginRequiredMixin, AdminRequiredMixin, View):
+    def get(self, request, kind, file_format):
+        try:
+            return export_response(kind, file_format, request.GET)
+        except ExportError as exc:
+            return HttpResponseBadRequest(str(exc))
+
+
+# --- STREAM ALARM (Server-Sent Events, butuh server ASGI) ---
+async def alarm_stream_view(request):
+    user = await request.auser()
+    if not (user.is_authenticated and user.is_admin):
+        return HttpResponseForbidden()
+    if not isinstance(request, ASGIRequest):
+        # Di bawah WSGI stream menahan satu thread worker per panel; panel kembali ke polling
+        return HttpResponse("Stream alarm butuh server ASGI.", status=503)
+
+    last_event_id = parse_last_event_id(
+        request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    )
+    response = StreamingHttpResponse(
+        alarm_event_stream(last_event_id),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Jangan di-buffer oleh nginx
+    return response